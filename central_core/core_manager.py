@@ -9,7 +9,11 @@ class ModuleInterface:
         raise NotImplementedError("Метод process должен быть реализован в модуле.")
 
 class CoreManager:
-    def __init__(self):
+    def __init__(self, headless: bool = False):
+        # Headless-режим: все боты и фоновые задачи в одном event loop (central_core/server.py),
+        # модули не запускают собственные потоки
+        self.headless = headless
+
         # Зарегистрированные модули
         self.modules: dict[str, ModuleInterface] = {}
 
@@ -70,16 +74,19 @@ class CoreManager:
         while True:
             await asyncio.sleep(1)
 
-def initialize_core() -> CoreManager:
+def initialize_core(headless: bool = False) -> CoreManager:
     """
     Инициализирует центральное ядро проекта.
     Здесь можно зарегистрировать необходимые модули и выполнить стартовые операции.
 
+    Аргументы:
+        headless (bool): Запуск без GUI, в одном event loop (см. central_core/server.py).
+
     Возвращает:
         CoreManager: Экземпляр центрального ядра.
     """
     logger.info("Инициализация центрального ядра началась.")
-    core_manager = CoreManager()
+    core_manager = CoreManager(headless=headless)
 
     # Пример регистрации модуля:
     # from modules.example import ExampleModule
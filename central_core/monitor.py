@@ -12,12 +12,21 @@ from datetime import datetime
 from core.logger import logger
 from central_core.core_manager import CoreManager
 from central_core.notifications import format_alert, send_notification
+from modules.bot.utils.rate_limiter import rate_limiter
+from core.database.database import get_pool_stats
+from modules.bot.ordering_middleware import get_update_stats
+from modules.bot.services.prefetch_service import page_prefetcher
+from modules.bot.services.membership_cache import membership_cache
+from modules.bot.services.post_ingestion import post_ingestion
 
 # Пороговые значения для мониторинга
 THRESHOLDS = {
     "queue_size": 100,
     "active_tasks": 500,
     "error_count": 50,
+    "outbound_queued": 1000,
+    "db_checked_out": 50,
+    "updates_waiting": 500,
 }
 
 def get_metrics(core_manager: CoreManager) -> dict:
@@ -28,15 +37,34 @@ def get_metrics(core_manager: CoreManager) -> dict:
         core_manager (CoreManager): Менеджер задач центрального ядра.
 
     Returns:
-        dict: Метрики, включая количество задач, ошибок, зарегистрированных модулей и использование памяти.
+        dict: Метрики, включая количество задач, ошибок, зарегистрированных модулей, использование памяти
+              очереди входящих апдейтов и исходящих запросов к Telegram, состояние пулов соединений с БД.
     """
     memory = psutil.virtual_memory()
+    lanes = rate_limiter.get_stats()
+    pools = get_pool_stats()
+    updates = get_update_stats()
     return {
         "queue_size": core_manager.queue.qsize() if hasattr(core_manager, "queue") else 0,
         "active_tasks": getattr(core_manager, "active_tasks", 0),
         "registered_modules": len(core_manager.modules),
         "error_count": getattr(core_manager, "error_count", 0),
         "memory_usage": memory.percent,
+        # Очереди исходящих запросов к Telegram по полосам приоритета
+        "outbound_lanes": lanes,
+        "outbound_queued": sum(lane["queued"] for bot_lanes in lanes.values() for lane in bot_lanes.values()),
+        # Пулы соединений с БД по event loop
+        "db_pools": pools,
+        "db_checked_out": sum(pool["checked_out"] for pool in pools.values()),
+        # Очереди входящих апдейтов по диспетчерам
+        "updates": updates,
+        "updates_waiting": sum(dp["waiting"] for dp in updates.values()),
+        # Предвыборка страниц ленты: кэш и попадания
+        "feed_prefetch": page_prefetcher.get_stats(),
+        # Кэш статусов get_chat_member
+        "membership_cache": membership_cache.get_stats(),
+        # Очередь сохранения новых постов
+        "post_ingestion": post_ingestion.get_stats(),
     }
 
 def log_metrics(metrics: dict) -> None:
@@ -0,0 +1,197 @@
+"""
+central_core/server.py
+
+Headless-режим проекта «Бот-2» (python run_bot.py --headless).
+
+Бот «Лента», бот «Профиль», задачи планировщика (core/scheduler.py) и цикл мониторинга
+работают в одном event loop (uvloop, если установлен) без GUI:
+- один движок БД и пул соединений (core/database/database.py хранит движок на event loop);
+- один клиент Redis;
+- одна HTTP-сессия aiohttp на оба бота (и общий ограничитель исходящих запросов).
+
+С флагом --workers N апдейты обрабатываются в N отдельных процессах (central_core/workers.py),
+а этот процесс только получает их, запускает планировщик и мониторинг.
+С флагом --webhook апдейты принимаются HTTP-сервером (central_core/webhook.py) вместо long polling.
+
+Остановка по SIGINT/SIGTERM: поллинг обоих ботов, планировщик, фоновые задачи,
+затем запись накопленных счётчиков, закрытие HTTP-сессии, Redis и пула соединений.
+"""
+
+import asyncio
+import signal
+from typing import Coroutine
+
+from aiogram import Bot, Dispatcher
+
+from core.config import settings
+from core.logger import get_logger
+from core.database.database import init_db, dispose_engine
+from core.redis import close_redis_client
+from central_core.core_manager import CoreManager
+from central_core.monitor import monitor_loop
+from error_handler import handle_error
+
+logger = get_logger()
+
+
+def install_signal_handlers(stop_event: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: Ctrl+C приходит как KeyboardInterrupt и отменяет основную задачу
+            pass
+
+
+async def _stop_polling(dispatchers: list[Dispatcher], tasks: list[asyncio.Task]) -> None:
+    for dp in dispatchers:
+        try:
+            await dp.stop_polling()
+        except RuntimeError:
+            # Поллинг уже завершён (или апдейты получает ingress)
+            pass
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def shutdown(core_manager: CoreManager, bot: Bot, dispatchers: list[Dispatcher], tasks: list[asyncio.Task]) -> None:
+    """
+    Порядок остановки: сначала перестаём принимать апдейты и запускать задачи,
+    затем сохраняем накопленное и закрываем соединения.
+    """
+    from core.scheduler import scheduler
+    from modules.bot.services.counter_buffer import counter_buffer
+    from modules.bot.services.post_ingestion import post_ingestion
+
+    logger.info("Остановка headless-сервера...")
+    await _stop_polling(dispatchers, tasks)
+
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+
+    background = list(core_manager.active_tasks)
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+
+    steps = (
+        ("запись новых постов", post_ingestion.drain),
+        ("запись счётчиков постов", counter_buffer.flush),
+        ("закрытие HTTP-сессии ботов", bot.session.close),
+        ("закрытие клиента Redis", close_redis_client),
+        ("закрытие пула соединений с БД", dispose_engine),
+    )
+    for name, step in steps:
+        try:
+            await step()
+        except Exception as e:
+            logger.error(f"Ошибка при остановке ({name}): {e}")
+            handle_error(e, "HeadlessServer", f"Ошибка при остановке: {name}")
+    logger.info("Headless-сервер остановлен.")
+
+
+async def serve(core_manager: CoreManager, workers: int = 0, webhook: bool = False) -> None:
+    """
+    Запускает оба бота, планировщик и мониторинг в текущем event loop
+    и ждёт сигнала остановки (или завершения поллинга одного из ботов).
+
+    При workers > 0 апдейты не обрабатываются здесь, а передаются
+    процессам-воркерам через Redis Streams (central_core/workers.py).
+    При webhook=True апдейты принимает HTTP-сервер (central_core/webhook.py), а не long polling.
+    """
+    from modules.bot import bot_module_instance
+    from modules.profile import create_profile_bot
+    from core.scheduler import start_scheduler
+
+    if not bot_module_instance:
+        logger.error("Глобальный объект бот-модуля не инициализирован, сервер не запущен.")
+        return
+
+    await init_db()
+
+    bot = bot_module_instance.bot
+    profile_bot, profile_dp = create_profile_bot(session=bot.session)
+    dispatchers = [bot_module_instance.dp, profile_dp]
+
+    stop_event = asyncio.Event()
+    install_signal_handlers(stop_event)
+
+    await start_scheduler(profile_bot)
+    core_manager.schedule_background_task(monitor_loop, core_manager)
+
+    webhook_server = None
+    if webhook:
+        from central_core.webhook import WebhookServer
+        webhook_server = WebhookServer(
+            {"lenta": (bot, bot_module_instance.dp), "profile": (profile_bot, profile_dp)}, workers
+        )
+        polling = [asyncio.create_task(webhook_server.serve(), name="webhook")]
+    elif workers:
+        from central_core.workers import ingress_loop
+        polling = [
+            asyncio.create_task(ingress_loop(bot, bot_module_instance.dp, "lenta", workers), name="ingress:lenta"),
+            asyncio.create_task(ingress_loop(profile_bot, profile_dp, "profile", workers), name="ingress:profile"),
+        ]
+    else:
+        # Сессия общая, поэтому поллинг её не закрывает — это делает shutdown
+        polling = [
+            asyncio.create_task(
+                bot_module_instance.dp.start_polling(bot, handle_signals=False, close_bot_session=False),
+                name="polling:lenta"
+            ),
+            asyncio.create_task(
+                profile_dp.start_polling(profile_bot, handle_signals=False, close_bot_session=False),
+                name="polling:profile"
+            ),
+        ]
+    stopper = asyncio.create_task(stop_event.wait(), name="stop-signal")
+    logger.info("Headless-сервер запущен: боты 'Лента' и 'Профиль', планировщик и мониторинг в одном event loop.")
+
+    try:
+        done, _ = await asyncio.wait([*polling, stopper], return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task is not stopper and not task.cancelled() and task.exception():
+                logger.error(f"Поллинг {task.get_name()} завершился с ошибкой: {task.exception()}")
+    finally:
+        stopper.cancel()
+        if webhook_server is not None:
+            await webhook_server.stop(polling[0])
+        await shutdown(core_manager, bot, dispatchers, polling)
+
+
+def run_loop(main: Coroutine) -> None:
+    """
+    Запускает корутину в новом event loop (uvloop, если установлен и включён USE_UVLOOP).
+    """
+    if settings.USE_UVLOOP:
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning("uvloop не установлен, используется стандартный event loop.")
+        else:
+            uvloop.run(main)
+            return
+    asyncio.run(main)
+
+
+def run_server(core_manager: CoreManager, workers: int = 0, webhook: bool = False) -> None:
+    """
+    Точка входа headless-режима. При workers > 0 дополнительно запускает процессы-воркеры
+    и останавливает их после остановки сервера.
+    """
+    processes = []
+    if workers:
+        from central_core.workers import spawn_workers
+        processes = spawn_workers(workers)
+    try:
+        run_loop(serve(core_manager, workers, webhook))
+    finally:
+        if processes:
+            from central_core.workers import stop_workers
+            stop_workers(processes)
+
+
+__all__ = ["install_signal_handlers", "shutdown", "serve", "run_loop", "run_server"]
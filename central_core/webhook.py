@@ -0,0 +1,136 @@
+"""
+central_core/webhook.py
+
+Webhook-режим (python run_bot.py --webhook): оба бота на одном HTTP-сервере (FastAPI + uvicorn).
+
+- путь бота: {WEBHOOK_PATH}/{имя бота} ("lenta", "profile");
+- у каждого бота свой секрет (заголовок X-Telegram-Bot-Api-Secret-Token);
+- allowed_updates — только типы апдейтов, которые обрабатывают роутеры диспетчера;
+- ответ 200 отправляется сразу, апдейт обрабатывается фоновой задачей
+  (в режиме --workers N — записывается в Redis Streams для воркеров).
+
+Без WEBHOOK_BASE_URL webhook в Telegram не регистрируется — сервер можно проверить локально,
+отправляя записанные апдейты POST-запросом с нужным секретом.
+"""
+
+import asyncio
+import hmac
+import secrets
+
+import uvicorn
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import FastAPI, Request, Response
+
+from core.config import settings
+from core.logger import get_logger
+from core.redis import get_redis_client
+from error_handler import handle_error
+
+logger = get_logger()
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Сколько ждать завершения фоновых обработчиков при остановке
+_DRAIN_TIMEOUT = 30
+
+
+class WebhookServer:
+    """
+    HTTP-сервер webhook'ов для нескольких ботов.
+
+    Args:
+        bots (dict[str, tuple[Bot, Dispatcher]]): бот и диспетчер по имени (часть пути)
+        workers (int): > 0 — апдейты передаются процессам-воркерам через Redis Streams
+    """
+
+    def __init__(self, bots: dict[str, tuple[Bot, Dispatcher]], workers: int = 0):
+        self.bots = bots
+        self.workers = workers
+        configured = {"lenta": settings.WEBHOOK_SECRET_LENTA, "profile": settings.WEBHOOK_SECRET_PROFILE}
+        # Секрет не задан — генерируется при запуске (webhook регистрируется заново при каждом старте)
+        self.secrets = {name: configured.get(name) or secrets.token_urlsafe(32) for name in bots}
+        self._background: set[asyncio.Task] = set()
+        self._server: uvicorn.Server | None = None
+        self.app = self._create_app()
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+
+        @app.post(f"{settings.WEBHOOK_PATH}/{{bot_name}}")
+        async def webhook(bot_name: str, request: Request) -> Response:
+            if bot_name not in self.bots:
+                return Response(status_code=404)
+            if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secrets[bot_name]):
+                return Response(status_code=403)
+
+            bot, dp = self.bots[bot_name]
+            try:
+                update = Update.model_validate(await request.json(), context={"bot": bot})
+            except Exception as e:
+                logger.warning(f"Webhook '{bot_name}': некорректный апдейт: {e}")
+                return Response(status_code=400)
+
+            if self.workers:
+                # Ответ только после записи в Redis — иначе Telegram не повторит доставку
+                from central_core.workers import publish_updates
+                await publish_updates(await get_redis_client(), bot_name, [update], self.workers)
+            else:
+                task = asyncio.create_task(self._feed(bot_name, bot, dp, update))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return Response(status_code=200)
+
+        return app
+
+    async def _feed(self, bot_name: str, bot: Bot, dp: Dispatcher, update: Update) -> None:
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки апдейта {update.update_id} ('{bot_name}'): {e}")
+            handle_error(e, "WebhookServer", f"Ошибка обработки апдейта {update.update_id}")
+
+    async def set_webhooks(self) -> None:
+        if not settings.WEBHOOK_BASE_URL:
+            logger.warning("WEBHOOK_BASE_URL не задан — webhook в Telegram не регистрируется (локальный режим).")
+            for name in self.bots:
+                logger.info(f"Webhook '{name}': {settings.WEBHOOK_PATH}/{name}, секрет {self.secrets[name]}")
+            return
+        for name, (bot, dp) in self.bots.items():
+            url = f"{settings.WEBHOOK_BASE_URL.rstrip('/')}{settings.WEBHOOK_PATH}/{name}"
+            allowed_updates = dp.resolve_used_update_types()
+            await bot.set_webhook(url=url, secret_token=self.secrets[name], allowed_updates=allowed_updates)
+            logger.info(f"Webhook '{name}' зарегистрирован: {url}, типы апдейтов: {allowed_updates}")
+
+    async def serve(self) -> None:
+        """
+        Регистрирует webhook'и и обслуживает HTTP-запросы до вызова stop().
+        """
+        await self.set_webhooks()
+        config = uvicorn.Config(
+            self.app,
+            host=settings.WEBHOOK_HOST,
+            port=settings.WEBHOOK_PORT,
+            lifespan="off",
+            access_log=False,
+            log_level="warning",
+        )
+        self._server = uvicorn.Server(config)
+        logger.info(f"Webhook-сервер слушает {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}.")
+        await self._server.serve()
+
+    async def stop(self, task: asyncio.Task) -> None:
+        """
+        Останавливает приём запросов и дожидается фоновых обработчиков.
+        Webhook в Telegram не удаляется: апдейты копятся на стороне Telegram до следующего запуска.
+        """
+        if self._server is not None:
+            self._server.should_exit = True
+        await asyncio.gather(task, return_exceptions=True)
+        if self._background:
+            _, pending = await asyncio.wait(set(self._background), timeout=_DRAIN_TIMEOUT)
+            for background in pending:
+                background.cancel()
+
+
+__all__ = ["SECRET_HEADER", "WebhookServer"]
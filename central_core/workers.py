@@ -0,0 +1,394 @@
+"""
+central_core/workers.py
+
+Режим воркеров (python run_bot.py --workers N).
+
+Ingress (процесс headless-сервера) получает апдейты обоих ботов long polling'ом
+(или через webhook, см. central_core/webhook.py) и складывает их в Redis Streams — по потоку на бота и шард: {prefix}:{bot}:{shard}.
+Шард — from_user.id % N (для апдейтов без пользователя — chat.id), поэтому все апдейты
+одного пользователя попадают в один воркер и обрабатываются строго по порядку.
+
+Воркеры — отдельные процессы (run_bot.py --workers N --worker i), читают свой шард
+через consumer group и передают апдейты в диспетчеры ботов (dp.feed_update).
+Повторно доставленный апдейт (перезапуск ingress до подтверждения offset, повтор из pending)
+отсекается по update_id: на время обработки ставится короткая отметка (SET NX,
+UPDATE_CLAIM_TTL_SECONDS), а отметка «обработан» (UPDATE_DEDUP_TTL_SECONDS) — только после
+успешного feed_update. Апдейт, на котором воркер упал, после истечения короткой отметки
+обрабатывается заново.
+
+Внутри шарда апдейты разных пользователей обрабатываются параллельно (до UPDATE_CONCURRENCY),
+апдейты одного пользователя — по очереди (ключ update_shard_key). Записи подтверждаются (XACK)
+в порядке потока и только после обработки. Упавший апдейт повторяется на месте (с паузой,
+следующие апдейты пользователя ждут), после UPDATE_MAX_ATTEMPTS попыток переносится
+в поток {prefix}:{bot}:dead. При остановке неподтверждённые записи остаются в pending
+и дочитываются следующим запуском.
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+from collections import deque
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import GetUpdates
+from aiogram.types import Update
+from redis.exceptions import ResponseError
+
+from core.config import settings
+from core.logger import get_logger
+from core.redis import get_redis_client
+from central_core.core_manager import CoreManager
+from error_handler import handle_error
+
+logger = get_logger()
+
+# Время ожидания новых записей в потоке (мс) — между ожиданиями воркер проверяет сигнал остановки
+_READ_BLOCK_MS = 1000
+# Сколько прочитанных, но не подтверждённых записей шарда держать в работе
+_MAX_UNACKED = 1000
+_POLLING_TIMEOUT = 10
+
+
+def update_shard_key(update: Update) -> int:
+    """
+    Ключ шардирования апдейта: id пользователя, иначе id чата, иначе update_id.
+    """
+    try:
+        event = update.event
+    except Exception:
+        # Тип апдейта, неизвестный этой версии aiogram
+        return update.update_id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+def stream_name(bot_name: str, shard: int) -> str:
+    return f"{settings.UPDATE_STREAM_PREFIX}:{bot_name}:{shard}"
+
+
+async def publish_updates(client, bot_name: str, updates: list[Update], workers: int) -> None:
+    """
+    Записывает апдейты в потоки шардов одним pipeline.
+    """
+    pipe = client.pipeline(transaction=False)
+    for update in updates:
+        pipe.xadd(
+            stream_name(bot_name, update_shard_key(update) % workers),
+            {"update": update.model_dump_json(exclude_unset=True)},
+            maxlen=settings.UPDATE_STREAM_MAXLEN,
+            approximate=True,
+        )
+    await pipe.execute()
+
+
+async def ingress_loop(bot: Bot, dp: Dispatcher, bot_name: str, workers: int) -> None:
+    """
+    Long polling бота с публикацией апдейтов в потоки шардов.
+    Offset сдвигается только после записи пачки в Redis.
+    """
+    client = await get_redis_client()
+    allowed_updates = dp.resolve_used_update_types()
+    offset = None
+    delay = 1.0
+    logger.info(f"Ingress '{bot_name}': апдейты распределяются по {workers} воркерам.")
+
+    while True:
+        try:
+            kwargs = {}
+            if bot.session.timeout:
+                kwargs["request_timeout"] = int(bot.session.timeout + _POLLING_TIMEOUT)
+            updates = await bot(
+                GetUpdates(offset=offset, timeout=_POLLING_TIMEOUT, allowed_updates=allowed_updates),
+                **kwargs
+            )
+            delay = 1.0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ingress '{bot_name}': ошибка получения апдейтов: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+            continue
+
+        if not updates:
+            continue
+
+        try:
+            await publish_updates(client, bot_name, updates, workers)
+        except Exception as e:
+            # Offset не сдвигаем — Telegram отдаст эти апдейты повторно, дубли отсекут воркеры
+            logger.error(f"Ingress '{bot_name}': не удалось записать апдейты в Redis: {e}")
+            handle_error(e, "UpdateIngress", "Ошибка записи апдейтов в Redis")
+            await asyncio.sleep(delay)
+            continue
+        offset = updates[-1].update_id + 1
+
+
+async def _process_entry(client, bot: Bot, dp: Dispatcher, bot_name: str, update: Update) -> bool:
+    """
+    Обрабатывает апдейт, если он ещё не обработан и не обрабатывается другим процессом.
+
+    Returns:
+        bool: False — апдейт занят (отметка обработки ещё действует)
+
+    Ошибка обработчика пробрасывается (см. _handle_entry).
+    """
+    done_key = f"{settings.UPDATE_STREAM_PREFIX}:done:{bot_name}:{update.update_id}"
+    claim_key = f"{settings.UPDATE_STREAM_PREFIX}:claim:{bot_name}:{update.update_id}"
+    if await client.exists(done_key):
+        logger.debug(f"Апдейт {update.update_id} ('{bot_name}') уже обработан, пропускаем.")
+        return True
+    if not await client.set(claim_key, os.getpid(), nx=True, ex=settings.UPDATE_CLAIM_TTL_SECONDS):
+        logger.warning(f"Апдейт {update.update_id} ('{bot_name}') уже в обработке, откладываем.")
+        return False
+    try:
+        await dp.feed_update(bot, update)
+    except BaseException:
+        # Снимаем отметку, чтобы повторная доставка апдейта могла его обработать
+        await client.delete(claim_key)
+        raise
+    await client.set(done_key, 1, ex=settings.UPDATE_DEDUP_TTL_SECONDS)
+    await client.delete(claim_key)
+    return True
+
+
+async def _pause(stop_event: asyncio.Event, seconds: float) -> None:
+    """
+    Пауза, прерываемая сигналом остановки.
+    """
+    try:
+        await asyncio.wait_for(stop_event.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _dead_letter(client, bot_name: str, raw: str, error: Exception) -> None:
+    await client.xadd(
+        f"{settings.UPDATE_STREAM_PREFIX}:{bot_name}:dead",
+        {"update": raw, "error": str(error)[:500]},
+        maxlen=settings.UPDATE_STREAM_MAXLEN, approximate=True,
+    )
+
+
+async def _handle_entry(
+    client, bot: Bot, dp: Dispatcher, bot_name: str, update: Update, raw: str,
+    previous: asyncio.Future | None, semaphore: asyncio.Semaphore, stop_event: asyncio.Event
+) -> bool:
+    """
+    Обрабатывает апдейт после предыдущего апдейта того же пользователя (previous), повторяя его
+    на месте: пока он не обработан или не перенесён в поток dead, следующие апдейты пользователя ждут.
+
+    Returns:
+        bool: True — запись можно подтвердить; False — остановка, запись остаётся в pending
+    """
+    if previous is not None:
+        await asyncio.wait([previous])
+    async with semaphore:
+        return await _handle_in_order(client, bot, dp, bot_name, update, raw, stop_event)
+
+
+async def _handle_in_order(
+    client, bot: Bot, dp: Dispatcher, bot_name: str, update: Update, raw: str, stop_event: asyncio.Event
+) -> bool:
+    attempt = 0
+    while not stop_event.is_set():
+        try:
+            if await _process_entry(client, bot, dp, bot_name, update):
+                return True
+            # Отметка обработки прошлого запуска ещё действует
+            await _pause(stop_event, 1)
+            continue
+        except Exception as e:
+            attempt += 1
+            logger.error(f"Ошибка обработки апдейта {update.update_id} ('{bot_name}'), попытка {attempt}: {e}")
+            handle_error(e, "UpdateWorker", f"Ошибка обработки апдейта {update.update_id} ({bot_name})")
+            if attempt < settings.UPDATE_MAX_ATTEMPTS:
+                await _pause(stop_event, min(2 ** attempt, 30))
+                continue
+            error = e
+            break
+    else:
+        return False
+
+    while not stop_event.is_set():
+        try:
+            await _dead_letter(client, bot_name, raw, error)
+            logger.error(f"Апдейт {update.update_id} ('{bot_name}') не обработан за {attempt} попыток, перенесён в поток dead.")
+            return True
+        except Exception as e:
+            logger.error(f"Не удалось перенести апдейт {update.update_id} ('{bot_name}') в поток dead: {e}")
+            await _pause(stop_event, 1)
+    return False
+
+
+async def _ack_completed(client, stream: str, group: str, window: deque) -> None:
+    """
+    Подтверждает обработанные записи по порядку потока — до первой незавершённой.
+    """
+    entry_ids = []
+    for entry_id, future in window:
+        if not future.done() or future.cancelled() or future.exception() is not None or not future.result():
+            break
+        entry_ids.append(entry_id)
+    if not entry_ids:
+        return
+    try:
+        await client.xack(stream, group, *entry_ids)
+    except Exception as e:
+        # Записи остаются в окне и подтверждаются следующим вызовом
+        logger.error(f"Не удалось подтвердить записи {stream}: {e}")
+        return
+    for _ in entry_ids:
+        window.popleft()
+
+
+async def consume_shard(bot: Bot, dp: Dispatcher, bot_name: str, shard: int, stop_event: asyncio.Event) -> None:
+    """
+    Обрабатывает поток шарда: апдейты разных пользователей параллельно, одного — по порядку.
+    Сначала дочитываются неподтверждённые записи прошлого запуска, затем новые.
+    """
+    client = await get_redis_client()
+    stream = stream_name(bot_name, shard)
+    group = f"{settings.UPDATE_STREAM_PREFIX}-workers"
+    consumer = f"worker-{shard}"
+    try:
+        await client.xgroup_create(stream, group, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(settings.UPDATE_CONCURRENCY)
+    # (entry_id, задача) в порядке потока — для подтверждения по порядку
+    window: deque[tuple[str, asyncio.Future]] = deque()
+    # Последняя задача пользователя: следующий его апдейт ждёт её завершения
+    tails: dict[int, asyncio.Future] = {}
+
+    def schedule(entry_id: str, fields: dict) -> asyncio.Future:
+        raw = (fields or {}).get("update")
+        try:
+            update = Update.model_validate_json(raw, context={"bot": bot})
+        except Exception as e:
+            # Запись удалена из потока (MAXLEN) или не от ingress
+            logger.error(f"Воркер {shard} ('{bot_name}'): некорректная запись {entry_id}: {e}")
+            future = loop.create_future()
+            future.set_result(True)
+            return future
+
+        key = update_shard_key(update)
+        task = asyncio.create_task(
+            _handle_entry(client, bot, dp, bot_name, update, raw, tails.get(key), semaphore, stop_event)
+        )
+        tails[key] = task
+        task.add_done_callback(lambda _: tails.pop(key) if tails.get(key) is task else None)
+        return task
+
+    last_id = "0"
+    try:
+        while not stop_event.is_set():
+            await _ack_completed(client, stream, group, window)
+            if len(window) >= _MAX_UNACKED:
+                await asyncio.wait([window[0][1]], timeout=_READ_BLOCK_MS / 1000)
+                continue
+            try:
+                response = await client.xreadgroup(group, consumer, {stream: last_id}, count=100, block=_READ_BLOCK_MS)
+            except Exception as e:
+                logger.error(f"Воркер {shard} ('{bot_name}'): ошибка чтения потока: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            entries = response[0][1] if response else []
+            if not entries:
+                # pending прошлого запуска разобраны — дальше только новые записи
+                last_id = ">"
+                continue
+
+            for entry_id, fields in entries:
+                if last_id != ">":
+                    last_id = entry_id
+                window.append((entry_id, schedule(entry_id, fields)))
+    finally:
+        # Начатые апдейты дорабатываются; повторы прерываются, их записи остаются в pending
+        await asyncio.gather(*(future for _, future in window), return_exceptions=True)
+        await _ack_completed(client, stream, group, window)
+
+
+async def serve_worker(core_manager: CoreManager, shard: int, workers: int) -> None:
+    """
+    Процесс-воркер: обрабатывает шард shard из workers для обоих ботов.
+    """
+    from modules.bot import bot_module_instance
+    from modules.profile import create_profile_bot
+    from modules.bot.utils.rate_limiter import rate_limiter
+    from central_core.server import install_signal_handlers, shutdown
+
+    if not bot_module_instance:
+        logger.error("Глобальный объект бот-модуля не инициализирован, воркер не запущен.")
+        return
+
+    # Глобальный лимит бота делится между процессами; лимиты чатов — нет (чат живёт в одном шарде)
+    rate_limiter.set_global_rps(max(1.0, settings.TELEGRAM_GLOBAL_RPS / workers))
+
+    bot = bot_module_instance.bot
+    profile_bot, profile_dp = create_profile_bot(session=bot.session)
+
+    stop_event = asyncio.Event()
+    install_signal_handlers(stop_event)
+
+    consumers = [
+        asyncio.create_task(consume_shard(bot, bot_module_instance.dp, "lenta", shard, stop_event), name=f"shard:lenta:{shard}"),
+        asyncio.create_task(consume_shard(profile_bot, profile_dp, "profile", shard, stop_event), name=f"shard:profile:{shard}"),
+    ]
+    logger.info(f"Воркер {shard}/{workers} запущен (pid {os.getpid()}).")
+    try:
+        await asyncio.gather(*consumers)
+    finally:
+        stop_event.set()
+        await shutdown(core_manager, bot, [], consumers)
+
+
+def run_worker(core_manager: CoreManager, shard: int, workers: int) -> None:
+    from central_core.server import run_loop
+    run_loop(serve_worker(core_manager, shard, workers))
+
+
+def spawn_workers(workers: int) -> list[subprocess.Popen]:
+    """
+    Запускает процессы-воркеры: run_bot.py --workers N --worker i.
+    """
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run_bot.py")
+    processes = [
+        subprocess.Popen([sys.executable, script, "--workers", str(workers), "--worker", str(shard)])
+        for shard in range(workers)
+    ]
+    logger.info(f"Запущено воркеров: {workers}.")
+    return processes
+
+
+def stop_workers(processes: list[subprocess.Popen], timeout: float = 30) -> None:
+    """
+    Останавливает воркеры (SIGTERM, по истечении timeout — kill).
+    Необработанные записи остаются в потоках и будут обработаны после перезапуска.
+    """
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+    for process in processes:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"Воркер pid {process.pid} не завершился за {timeout} сек., принудительная остановка.")
+            process.kill()
+
+
+__all__ = [
+    "update_shard_key", "stream_name", "publish_updates", "ingress_loop", "consume_shard",
+    "serve_worker", "run_worker", "spawn_workers", "stop_workers",
+]
@@ -28,6 +28,12 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
 
+    # Пул соединений с БД (на каждый event loop)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
+
     REDIS_HOST: str
     REDIS_PORT: str
     REDIS_DB: str
@@ -36,6 +42,72 @@ class Settings(BaseSettings):
 
     DEBUG: bool = False
 
+    # Хранилище просмотренных постов и реакций: "memory" или "redis"
+    SEEN_STORE_BACKEND: str = "memory"
+    SEEN_STORE_TTL_SECONDS: int = 3600
+    SEEN_STORE_MAX_USERS: int = 100_000
+
+    # Отложенная запись счётчиков постов (просмотры, клики, реакции)
+    COUNTER_FLUSH_INTERVAL_MS: int = 1000
+    COUNTER_FLUSH_MAX_EVENTS: int = 500
+
+    # Пакетное сохранение новых постов каналов (channel_post)
+    POST_INGEST_FLUSH_INTERVAL_MS: int = 500
+    POST_INGEST_MAX_BATCH: int = 200
+    POST_INGEST_MAX_ATTEMPTS: int = 10
+    POST_INGEST_MAX_PENDING: int = 10_000
+
+    # Предвыборка следующей страницы ленты (кнопка «Ещё»)
+    PREFETCH_TTL_SECONDS: int = 120
+    PREFETCH_MAX_USERS: int = 10_000
+
+    # Участие в каналах: пары (пользователь, канал) старше MEMBERSHIP_MAX_AGE_HOURS перепроверяются
+    MEMBERSHIP_MAX_AGE_HOURS: int = 24
+    MEMBERSHIP_RECONCILE_MINUTES: int = 30
+    MEMBERSHIP_RECONCILE_BATCH: int = 2000
+    MEMBERSHIP_CHECK_CONCURRENCY: int = 8
+    # Кэш статусов get_chat_member: подписан / не подписан, число пар (chat_id, user_id)
+    MEMBERSHIP_CACHE_TTL_SECONDS: int = 600
+    MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS: int = 120
+    MEMBERSHIP_CACHE_MAX_ENTRIES: int = 200_000
+
+    # Пул кандидатов для случайных слотов ленты
+    RANDOM_POOL_SIZE: int = 5000
+    RANDOM_POOL_REFRESH_SECONDS: int = 300
+
+    # Лимиты исходящих запросов к Telegram API (на каждого бота)
+    TELEGRAM_GLOBAL_RPS: float = 30
+    TELEGRAM_CHAT_RPS: float = 1
+    TELEGRAM_CHAT_BURST: int = 20
+    TELEGRAM_GROUP_PER_MINUTE: int = 20
+    TELEGRAM_MAX_RETRIES: int = 3
+    TELEGRAM_LANE_AGING_SECONDS: float = 5
+
+    # Одновременно обрабатываемые апдейты (на диспетчер); апдейты одного пользователя — по очереди
+    UPDATE_CONCURRENCY: int = 64
+    # Повторный запрос страницы ленты раньше этого интервала отбрасывается
+    FEED_DEBOUNCE_SECONDS: float = 1.5
+
+    # Headless-режим (run_bot.py --headless): uvloop, если установлен
+    USE_UVLOOP: bool = True
+
+    # Режим воркеров (run_bot.py --workers N): апдейты через Redis Streams
+    UPDATE_STREAM_PREFIX: str = "updates"
+    UPDATE_STREAM_MAXLEN: int = 100_000
+    UPDATE_DEDUP_TTL_SECONDS: int = 86_400
+    # Отметка «апдейт в обработке»: после падения воркера апдейт снова доступен через это время
+    UPDATE_CLAIM_TTL_SECONDS: int = 120
+    # Попыток обработки апдейта, после которых он переносится в поток {prefix}:{bot}:dead
+    UPDATE_MAX_ATTEMPTS: int = 3
+
+    # Webhook-режим (run_bot.py --webhook); пустой секрет генерируется при запуске
+    WEBHOOK_BASE_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_SECRET_LENTA: str = ""
+    WEBHOOK_SECRET_PROFILE: str = ""
+
     class Config:
         env_file = "config.env"
         env_file_encoding = "utf-8"
@@ -16,24 +16,34 @@ class CRUDBase:
     def __init__(self, model):
         self.model = model
 
-    async def create(self, session, data: dict):
+    async def create(self, session, data: dict, commit: bool = True):
+        """
+        commit=False — только flush: транзакцией управляет владелец сессии.
+        """
         try:
             logger.debug(f"Создание объекта {self.model.__name__} с данными: {data}")
             instance = self.model(**data)
             session.add(instance)
-            await session.commit()
-            await session.refresh(instance)
+            await self._finish(session, commit, instance)
             logger.debug(f"Объект {self.model.__name__} создан успешно.")
             return instance
         except Exception as e:
             logger.error(f"Ошибка создания объекта {self.model.__name__} с данными {data}: {e}")
             raise
 
+    @staticmethod
+    async def _finish(session, commit: bool, instance) -> None:
+        if commit:
+            await session.commit()
+            await session.refresh(instance)
+        else:
+            await session.flush()
+
     async def get(self, session, primary_key):
         instance = await session.get(self.model, primary_key)
         return instance
 
-    async def update(self, session, primary_key, update_data: dict):
+    async def update(self, session, primary_key, update_data: dict, commit: bool = True):
         try:
             logger.debug(f"Обновление объекта {self.model.__name__} с id {primary_key} данными: {update_data}")
             instance = await self.get(session, primary_key)
@@ -42,20 +52,22 @@ class CRUDBase:
                 return None
             for key, value in update_data.items():
                 setattr(instance, key, value)
-            await session.commit()
-            await session.refresh(instance)
+            await self._finish(session, commit, instance)
             logger.debug(f"Объект {self.model.__name__} с id {primary_key} успешно обновлен.")
             return instance
         except Exception as e:
             logger.error(f"Ошибка обновления объекта {self.model.__name__} с id {primary_key}: {update_data} | {e}")
             raise
 
-    async def delete(self, session, primary_key):
+    async def delete(self, session, primary_key, commit: bool = True):
         try:
             instance = await self.get(session, primary_key)
             if instance:
                 await session.delete(instance)
-                await session.commit()
+                if commit:
+                    await session.commit()
+                else:
+                    await session.flush()
                 logger.debug(f"Объект {self.model.__name__} с id {primary_key} успешно удален.")
             return instance
         except Exception as e:
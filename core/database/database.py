@@ -6,7 +6,9 @@
 
 from typing import AsyncGenerator
 import asyncio
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import threading
+import weakref
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from core.config import settings
 from core.logger import get_logger
 import sqlalchemy.exc
@@ -20,42 +22,117 @@ DATABASE_URL = (
     f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 )
 
-# Глобальные переменные
-engine = None
-async_session_factory = None
-engine_loop = None
+# Движки по event loop: пул asyncpg-соединений привязан к циклу, в котором создан.
+# Каждый поток со своим циклом (бот, профиль-бот, GUI) получает собственный движок,
+# вместо пересоздания одного глобального при каждом переключении цикла.
+_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[AsyncEngine, async_sessionmaker]]" = (
+    weakref.WeakKeyDictionary()
+)
+_engines_lock = threading.Lock()
+
+
+def _create_engine() -> AsyncEngine:
+    return create_async_engine(
+        DATABASE_URL,
+        echo=False,
+        future=True,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+
 
-def initialize_engine():
-    global engine, async_session_factory, engine_loop
+def _loop_entry() -> tuple[AsyncEngine, async_sessionmaker]:
     current_loop = asyncio.get_running_loop()
+    entry = _engines.get(current_loop)
+    if entry is not None:
+        return entry
 
-    if engine is None or engine_loop != current_loop:
-        try:
-            logger.info(f"Создаётся новый движок БД в loop id: {id(current_loop)}")
-            engine = create_async_engine(
-                DATABASE_URL,
-                echo=False,
-                future=True,
-                pool_pre_ping=True,
-                pool_recycle=3600
-            )
-            async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
-            engine_loop = current_loop
-            logger.info("Движок базы данных успешно инициализирован.")
-        except sqlalchemy.exc.SQLAlchemyError as e:
-            logger.error(f"Ошибка подключения к базе данных: {e}")
-            handle_error(e, "DatabaseModule", "Ошибка при подключении к базе данных")
-            raise ConnectionError("Не удалось установить соединение с базой данных.")
-    else:
-        logger.debug(f"Используется существующий движок БД, созданный в loop id: {id(engine_loop)}")
-
-async def get_database() -> AsyncGenerator[AsyncSession, None]:
+    with _engines_lock:
+        entry = _engines.get(current_loop)
+        if entry is None:
+            try:
+                logger.info(f"Создаётся движок БД для loop id: {id(current_loop)}")
+                engine = _create_engine()
+                entry = (engine, async_sessionmaker(engine, expire_on_commit=False))
+                _engines[current_loop] = entry
+                logger.info("Движок базы данных успешно инициализирован.")
+            except sqlalchemy.exc.SQLAlchemyError as e:
+                logger.error(f"Ошибка подключения к базе данных: {e}")
+                handle_error(e, "DatabaseModule", "Ошибка при подключении к базе данных")
+                raise ConnectionError("Не удалось установить соединение с базой данных.")
+    return entry
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Движок БД текущего event loop (создаётся при первом обращении).
+    """
+    return _loop_entry()[0]
+
+
+def initialize_engine() -> None:
+    _loop_entry()
+
+
+async def dispose_engine() -> None:
+    """
+    Закрывает пул соединений текущего event loop.
+    Вызывается при остановке цикла (завершение поллинга, потока профиль-бота и т.п.).
+    """
+    current_loop = asyncio.get_running_loop()
+    with _engines_lock:
+        entry = _engines.pop(current_loop, None)
+    if entry is not None:
+        await entry[0].dispose()
+        logger.info(f"Движок БД для loop id: {id(current_loop)} закрыт.")
+
+
+def get_pool_stats() -> dict:
+    """
+    Состояние пулов соединений по event loop: размер, свободные, занятые, overflow.
+    """
+    with _engines_lock:
+        entries = list(_engines.items())
+    stats = {}
+    for loop, (engine, _) in entries:
+        pool = engine.pool
+        stats[id(loop)] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+    return stats
+
+
+async def release_connection(session: AsyncSession) -> None:
+    """
+    Фиксирует транзакцию сессии и возвращает соединение в пул.
+
+    Вызывается перед сетевыми вызовами (отправка постов, запросы к Telegram API),
+    чтобы соединение не простаивало в открытой транзакции. Сессией можно
+    пользоваться дальше: соединение берётся из пула при следующем запросе.
+    """
+    if session.in_transaction():
+        await session.commit()
+
+
+async def get_database(session: AsyncSession | None = None) -> AsyncGenerator[AsyncSession, None]:
     """
     Асинхронный генератор сессий для работы с базой данных.
+
+    Если передана session — отдаёт её (транзакцией управляет владелец сессии),
+    иначе открывает новую.
     """
-    initialize_engine()
+    if session is not None:
+        yield session
+        return
+
     try:
-        async with async_session_factory() as session:
+        async with _loop_entry()[1]() as session:
             yield session
     except sqlalchemy.exc.SQLAlchemyError as e:
         logger.error(f"Ошибка работы с сессией базы данных: {e}")
@@ -67,7 +144,7 @@ from core.database.models import Base
 
 async def init_db():
     try:
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
         logger.info("Инициализация таблиц завершена.")
     except sqlalchemy.exc.SQLAlchemyError as e:
@@ -77,12 +154,15 @@ async def init_db():
 
 # ✅ Ленивый безопасный доступ к сессии
 def get_async_session():
-    initialize_engine()
-    return async_session_factory()
+    return _loop_entry()[1]()
 
 if __name__ == "__main__":
+    async def _init_and_dispose():
+        await init_db()
+        await dispose_engine()
+
     try:
-        asyncio.run(init_db())
+        asyncio.run(_init_and_dispose())
     except Exception as e:
         logger.error(f"Ошибка при запуске инициализации базы данных: {e}")
         handle_error(e, "DatabaseModule", "Ошибка при запуске инициализации базы данных")
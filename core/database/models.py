@@ -1,7 +1,7 @@
 import datetime
 from sqlalchemy import (
     Column, Integer, String, DateTime, Text, BigInteger,
-    UniqueConstraint, ForeignKey
+    UniqueConstraint, ForeignKey, Index, func
 )
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship, declarative_base
@@ -22,6 +22,8 @@ class User(Base):
     interests = Column(ARRAY(String), nullable=True)
     subscription_status = Column(String, default="free")
 
+    # Устарели и не обновляются (данные на момент миграции e5b7c2a9d4f1): подписки хранятся
+    # в user_channel_subscriptions (UserChannelSubscription). Не читать; колонки будут удалены.
     subscribed_channels = Column(ARRAY(BigInteger), default=list, nullable=True)
     managed_channels = Column(ARRAY(BigInteger), default=list, nullable=True)
 
@@ -67,12 +69,18 @@ class Channel(Base):
 
     admin_user_ids = Column(ARRAY(BigInteger), default=list)
 
+    # Статус бота в канале: администратор получает апдейты chat_member. NULL — ещё не известен
+    bot_status = Column(String(20), nullable=True)
+
     def __repr__(self):
         return f"<Channel(channel_id={self.channel_id}, channel_name={self.channel_name})>"
 
 class Post(Base):
     __tablename__ = 'posts'
-    __table_args__ = (UniqueConstraint('channel_id', 'message_id', name='uix_channel_message'),)
+    __table_args__ = (
+        UniqueConstraint('channel_id', 'message_id', name='uix_channel_message'),
+        Index('ix_posts_channel_id_id', 'channel_id', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     channel_id = Column(BigInteger, nullable=False)
@@ -115,6 +123,42 @@ class Interest(Base):
     def __repr__(self):
         return f"<Interest(interest_id={self.interest_id}, interest_name={self.interest_name})>"
 
+Index('uix_interests_name_lower', func.lower(Interest.interest_name), unique=True)
+
+class PostInterest(Base):
+    __tablename__ = 'post_interests'
+    __table_args__ = (
+        Index('ix_post_interests_interest_post', 'interest_id', 'post_id'),
+    )
+
+    post_id = Column(Integer, ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    interest_id = Column(Integer, ForeignKey('interests.interest_id', ondelete='CASCADE'), primary_key=True)
+
+    def __repr__(self):
+        return f"<PostInterest(post_id={self.post_id}, interest_id={self.interest_id})>"
+
+class UserChannelSubscription(Base):
+    """
+    Текущие подписки: пользователь — участник (member) или администратор (administrator, creator) канала,
+    и время последней проверки статуса (checked_at IS NULL — пара ещё не проверялась).
+    Первичный ключ ведёт от пользователя к каналам, индекс (channel_id, user_id) — от канала к подписчикам.
+    Отписки не хранятся: пара удаляется.
+    """
+    __tablename__ = 'user_channel_subscriptions'
+    __table_args__ = (
+        Index('ix_user_channel_subscriptions_channel_id_user_id', 'channel_id', 'user_id'),
+        Index('ix_user_channel_subscriptions_checked_at', 'checked_at'),
+    )
+
+    user_id = Column(BigInteger, ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    channel_id = Column(BigInteger, ForeignKey('channels.channel_id', ondelete='CASCADE'), primary_key=True)
+    role = Column(String(20), nullable=False, default="member")
+    checked_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UserChannelSubscription(user_id={self.user_id}, channel_id={self.channel_id}, role={self.role})>"
+
 class UserState(Base):
     __tablename__ = 'user_state'
 
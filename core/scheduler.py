@@ -9,19 +9,33 @@ from core.database import get_database
 from error_handler import handle_error
 from sqlalchemy.future import select
 from core.database.models import Channel, PremiumUser
-from modules.monitoring.inactivity_monitor import check_inactive_users
 
 from aiogram import Bot
 from modules.profile.config import TELEGRAM_PROFILE_TOKEN
+from modules.bot.utils.rate_limiter import setup_rate_limiter, outbound_priority, Lane
+from modules.bot.services.membership_service import reconcile_memberships
+from modules.bot import get_bot as get_lenta_bot
 
 import logging
 import asyncio
 
 logger = logging.getLogger("scheduler")
 
+try:
+    from modules.monitoring.inactivity_monitor import check_inactive_users
+except ImportError as e:
+    # Монитор бездействия ещё не доведён (нет хранения id сообщений) — планировщик работает без него
+    check_inactive_users = None
+    logger.warning(f"Монитор бездействия недоступен: {e}")
+
 scheduler = AsyncIOScheduler()
 
-async def start_scheduler():
+# Бот 'Профиль' для уведомлений администраторам каналов (в headless-режиме — общий с сервером)
+_profile_bot: Bot | None = None
+
+async def start_scheduler(profile_bot: Bot | None = None):
+    global _profile_bot
+    _profile_bot = profile_bot
     try:
         scheduler_interval = settings.SCHEDULER_INTERVAL_HOURS
 
@@ -40,16 +54,22 @@ async def start_scheduler():
             IntervalTrigger(minutes=5),
         )
 
-        scheduler.add_job(
-            check_inactive_users,
-            IntervalTrigger(minutes=10),
-        )
+        if check_inactive_users is not None:
+            scheduler.add_job(
+                check_inactive_users,
+                IntervalTrigger(minutes=10),
+            )
 
         scheduler.add_job(
             reset_channel_limits,
             CronTrigger(day=1, hour=0, minute=0),
         )
 
+        scheduler.add_job(
+            reconcile_channel_memberships,
+            IntervalTrigger(minutes=settings.MEMBERSHIP_RECONCILE_MINUTES),
+        )
+
         scheduler.add_job(
             check_channel_limits,
             IntervalTrigger(hours=6),  # 🔄 проверяем каждые 6 часов
@@ -85,6 +105,16 @@ async def update_interests_for_all_users():
     except Exception as e:
         handle_error(e, "UpdateInterests", "Ошибка при обновлении интересов")
 
+async def reconcile_channel_memberships():
+    try:
+        bot = get_lenta_bot()
+        if bot is None:
+            return
+        await reconcile_memberships(bot)
+    except Exception as e:
+        handle_error(e, "ReconcileMemberships", "Ошибка при сверке участия в каналах")
+        logger.error(f"Ошибка при сверке участия в каналах: {e}")
+
 async def reset_channel_limits():
     try:
         async for session in get_database():
@@ -100,33 +130,37 @@ async def reset_channel_limits():
         logger.error(f"Ошибка при сбросе лимитов: {e}")
 
 async def check_channel_limits():
+    bot = _profile_bot or setup_rate_limiter(Bot(token=TELEGRAM_PROFILE_TOKEN))
     try:
-        bot = Bot(token=TELEGRAM_PROFILE_TOKEN)
-        async for session in get_database():
-            result = await session.execute(select(Channel))
-            channels = result.scalars().all()
-
-            for channel in channels:
-                if channel.monthly_views_left is not None and channel.monthly_views_left < 100:
-                    admins = channel.admin_user_ids or []
-                    for admin_id in admins:
-                        try:
-                            await bot.send_message(
-                                chat_id=admin_id,
-                                text=(
-                                    f"📊 <b>Уведомление</b>\n\n"
-                                    f"У канала <b>{channel.channel_name}</b> осталось "
-                                    f"<b>{channel.monthly_views_left}</b> бесплатных показов.\n\n"
-                                    f"Чтобы продолжить появляться в ленте, вы можете:\n"
-                                    f"— Подписаться на премиум\n"
-                                    f"— Пригласить друзей по рефералке\n\n"
-                                    f"<b>Ваш профиль:</b> /profile"
-                                ),
-                                parse_mode="HTML"
-                            )
-                        except Exception as err:
-                            logger.warning(f"⚠️ Не удалось отправить уведомление администратору {admin_id}: {err}")
+        with outbound_priority(Lane.BULK):
+            async for session in get_database():
+                result = await session.execute(select(Channel))
+                channels = result.scalars().all()
+
+                for channel in channels:
+                    if channel.monthly_views_left is not None and channel.monthly_views_left < 100:
+                        admins = channel.admin_user_ids or []
+                        for admin_id in admins:
+                            try:
+                                await bot.send_message(
+                                    chat_id=admin_id,
+                                    text=(
+                                        f"📊 <b>Уведомление</b>\n\n"
+                                        f"У канала <b>{channel.channel_name}</b> осталось "
+                                        f"<b>{channel.monthly_views_left}</b> бесплатных показов.\n\n"
+                                        f"Чтобы продолжить появляться в ленте, вы можете:\n"
+                                        f"— Подписаться на премиум\n"
+                                        f"— Пригласить друзей по рефералке\n\n"
+                                        f"<b>Ваш профиль:</b> /profile"
+                                    ),
+                                    parse_mode="HTML"
+                                )
+                            except Exception as err:
+                                logger.warning(f"⚠️ Не удалось отправить уведомление администратору {admin_id}: {err}")
 
     except Exception as e:
         handle_error(e, "CheckChannelLimits", "Ошибка при проверке лимитов")
         logger.error(f"Ошибка при проверке лимитов каналов: {e}")
+    finally:
+        if bot is not _profile_bot:
+            await bot.session.close()
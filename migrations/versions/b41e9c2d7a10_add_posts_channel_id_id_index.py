@@ -0,0 +1,28 @@
+"""add posts channel_id id index
+
+Revision ID: b41e9c2d7a10
+Revises: 73659cce0457
+Create Date: 2026-10-18 18:05:12.417305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e9c2d7a10'
+down_revision: Union[str, None] = '73659cce0457'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_posts_channel_id_id', 'posts', ['channel_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_channel_id_id', table_name='posts')
@@ -0,0 +1,80 @@
+"""add post interests
+
+Revision ID: c7d2e9f4a1b3
+Revises: b41e9c2d7a10
+Create Date: 2026-10-18 19:12:40.881204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e9f4a1b3'
+down_revision: Union[str, None] = 'b41e9c2d7a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Та же нормализация, что в interest_service.normalize_interests:
+# name.strip().lstrip("#").strip().lower()
+_STRIP = r"regexp_replace({}, '^\s+|\s+$', '', 'g')"
+_NORMALIZED_TAG = "lower(" + _STRIP.format("ltrim(" + _STRIP.format("t") + ", '#')") + ")"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Убираем дубли интересов (без учёта регистра), чтобы создать уникальный индекс
+    op.execute("""
+        DELETE FROM interests a
+        USING interests b
+        WHERE lower(a.interest_name) = lower(b.interest_name)
+          AND a.interest_id > b.interest_id
+    """)
+    op.create_index(
+        'uix_interests_name_lower', 'interests', [sa.text('lower(interest_name)')], unique=True
+    )
+
+    op.create_table(
+        'post_interests',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('interest_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['interest_id'], ['interests.interest_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id', 'interest_id'),
+    )
+    op.create_index(
+        'ix_post_interests_interest_post', 'post_interests', ['interest_id', 'post_id'], unique=False
+    )
+
+    # Перенос тегов из posts.interests (строка через запятую)
+    op.execute(f"""
+        CREATE TEMPORARY TABLE _post_tags AS
+        SELECT DISTINCT p.id AS post_id, {_NORMALIZED_TAG} AS name
+        FROM posts p
+        CROSS JOIN LATERAL unnest(string_to_array(p.interests, ',')) AS t
+        WHERE p.interests IS NOT NULL
+          AND {_NORMALIZED_TAG} <> ''
+    """)
+    op.execute("""
+        INSERT INTO interests (interest_name)
+        SELECT DISTINCT name FROM _post_tags
+        ON CONFLICT ((lower(interest_name))) DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO post_interests (post_id, interest_id)
+        SELECT t.post_id, i.interest_id
+        FROM _post_tags t
+        JOIN interests i ON lower(i.interest_name) = t.name
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute("DROP TABLE _post_tags")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_interests_interest_post', table_name='post_interests')
+    op.drop_table('post_interests')
+    op.drop_index('uix_interests_name_lower', table_name='interests')
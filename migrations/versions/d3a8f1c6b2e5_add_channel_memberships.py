@@ -0,0 +1,54 @@
+"""add channel memberships
+
+Revision ID: d3a8f1c6b2e5
+Revises: c7d2e9f4a1b3
+Create Date: 2026-10-18 21:04:37.512908
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a8f1c6b2e5'
+down_revision: Union[str, None] = 'c7d2e9f4a1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'channel_memberships',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('channel_id', sa.BigInteger(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('checked_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['channel_id'], ['channels.channel_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'channel_id'),
+    )
+    op.create_index('ix_channel_memberships_checked_at', 'channel_memberships', ['checked_at'], unique=False)
+    # Статус бота в канале (из my_chat_member); NULL — ещё не известен, его уточнит сверка
+    op.add_column('channels', sa.Column('bot_status', sa.String(length=20), nullable=True))
+
+    # Известные подписки из массивов users — как непроверенные пары (checked_at IS NULL),
+    # их первыми перепроверит фоновая сверка
+    op.execute("""
+        INSERT INTO channel_memberships (user_id, channel_id, status)
+        SELECT u.user_id, c.channel_id,
+               CASE WHEN c.channel_id = ANY(coalesce(u.managed_channels, '{}')) THEN 'administrator' ELSE 'member' END
+        FROM users u
+        CROSS JOIN LATERAL unnest(coalesce(u.subscribed_channels, '{}') || coalesce(u.managed_channels, '{}')) AS s(channel_id)
+        JOIN channels c ON c.channel_id = s.channel_id
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('channels', 'bot_status')
+    op.drop_index('ix_channel_memberships_checked_at', table_name='channel_memberships')
+    op.drop_table('channel_memberships')
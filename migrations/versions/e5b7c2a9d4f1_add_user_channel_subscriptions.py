@@ -0,0 +1,68 @@
+"""add user channel subscriptions
+
+Revision ID: e5b7c2a9d4f1
+Revises: d3a8f1c6b2e5
+Create Date: 2026-10-18 22:17:52.304119
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7c2a9d4f1'
+down_revision: Union[str, None] = 'd3a8f1c6b2e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Подписки — пары channel_memberships, где пользователь участник или администратор.
+    # Таблица не дублируется, а переименовывается: статус становится ролью, остальные пары
+    # (left, kicked, unknown) удаляются
+    op.execute("""
+        DELETE FROM channel_memberships
+        WHERE status NOT IN ('member', 'administrator', 'creator')
+    """)
+    op.rename_table('channel_memberships', 'user_channel_subscriptions')
+    op.alter_column('user_channel_subscriptions', 'status', new_column_name='role')
+    op.add_column(
+        'user_channel_subscriptions',
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False)
+    )
+    op.execute("ALTER TABLE user_channel_subscriptions RENAME CONSTRAINT channel_memberships_pkey TO user_channel_subscriptions_pkey")
+    op.execute("ALTER TABLE user_channel_subscriptions RENAME CONSTRAINT channel_memberships_user_id_fkey TO user_channel_subscriptions_user_id_fkey")
+    op.execute("ALTER TABLE user_channel_subscriptions RENAME CONSTRAINT channel_memberships_channel_id_fkey TO user_channel_subscriptions_channel_id_fkey")
+    op.execute("ALTER INDEX ix_channel_memberships_checked_at RENAME TO ix_user_channel_subscriptions_checked_at")
+    op.create_index(
+        'ix_user_channel_subscriptions_channel_id_user_id',
+        'user_channel_subscriptions', ['channel_id', 'user_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Массивы users восстанавливаются из таблицы подписок
+    op.execute("""
+        UPDATE users u
+        SET subscribed_channels = coalesce((
+                SELECT array_agg(s.channel_id ORDER BY s.channel_id)
+                FROM user_channel_subscriptions s WHERE s.user_id = u.user_id
+            ), '{}'),
+            managed_channels = coalesce((
+                SELECT array_agg(s.channel_id ORDER BY s.channel_id)
+                FROM user_channel_subscriptions s
+                WHERE s.user_id = u.user_id AND s.role IN ('administrator', 'creator')
+            ), '{}')
+    """)
+    op.drop_index('ix_user_channel_subscriptions_channel_id_user_id', table_name='user_channel_subscriptions')
+    op.execute("ALTER INDEX ix_user_channel_subscriptions_checked_at RENAME TO ix_channel_memberships_checked_at")
+    op.execute("ALTER TABLE user_channel_subscriptions RENAME CONSTRAINT user_channel_subscriptions_channel_id_fkey TO channel_memberships_channel_id_fkey")
+    op.execute("ALTER TABLE user_channel_subscriptions RENAME CONSTRAINT user_channel_subscriptions_user_id_fkey TO channel_memberships_user_id_fkey")
+    op.execute("ALTER TABLE user_channel_subscriptions RENAME CONSTRAINT user_channel_subscriptions_pkey TO channel_memberships_pkey")
+    op.drop_column('user_channel_subscriptions', 'updated_at')
+    op.alter_column('user_channel_subscriptions', 'role', new_column_name='status')
+    op.rename_table('user_channel_subscriptions', 'channel_memberships')
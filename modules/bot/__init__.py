@@ -15,6 +15,13 @@ from aiogram.client.default import DefaultBotProperties
 from core.logger import get_logger
 from core.config import settings
 from .activity_middleware import ActivityMiddleware
+from .db_middleware import DbSessionMiddleware
+from .ordering_middleware import UpdateOrderingMiddleware
+from .single_flight_middleware import SingleFlightMiddleware, FEED_REQUESTS
+from modules.bot.services.counter_buffer import counter_buffer
+from modules.bot.services.post_ingestion import post_ingestion
+from modules.bot.utils.rate_limiter import setup_rate_limiter
+from core.database.database import dispose_engine
 
 logger = get_logger(__name__)
 
@@ -43,8 +50,16 @@ class BotModule:
     def __init__(self, token: str):
         self.token = token
         self.bot = Bot(token=self.token, default=DefaultBotProperties(parse_mode="HTML"))
+        setup_rate_limiter(self.bot)
         self.dp = Dispatcher(storage=MemoryStorage())
 
+        # Повторные запросы страницы ленты, пока предыдущая ещё формируется, отбрасываются
+        self.dp.update.outer_middleware(SingleFlightMiddleware(FEED_REQUESTS, settings.FEED_DEBOUNCE_SECONDS))
+        # Параллельная обработка апдейтов, по порядку для каждого пользователя
+        self.dp.update.outer_middleware(UpdateOrderingMiddleware("lenta", settings.UPDATE_CONCURRENCY))
+        # Одна сессия БД на апдейт
+        self.dp.update.outer_middleware(DbSessionMiddleware())
+
         # 🆕 Middleware для логирования активности
         self.dp.message.middleware(ActivityMiddleware())
         self.dp.callback_query.middleware(ActivityMiddleware())
@@ -57,7 +72,14 @@ class BotModule:
 
     async def start(self):
         logger.info("Запуск поллинга Telegram‑бота.")
-        await self.dp.start_polling(self.bot)
+        try:
+            await self.dp.start_polling(self.bot)
+        finally:
+            # Дописываем в БД посты из очереди и накопленные счётчики постов
+            await post_ingestion.drain()
+            await counter_buffer.flush()
+            # Закрываем пул соединений этого event loop
+            await dispose_engine()
 
     async def process(self, data):
         logger.info(f"BotModule обрабатывает данные: {data}")
@@ -23,6 +23,6 @@ class ActivityMiddleware(BaseMiddleware):
 
     async def update_last_action(self, user_id: int) -> None:
         try:
-            post_cache_service.update_activity(user_id)  # ✅ сохраняем активность в post_cache
+            await post_cache_service.update_activity(user_id)  # ✅ сохраняем активность в SeenStore
         except Exception as e:
             logger.error(f"Ошибка при обновлении активности для пользователя {user_id}: {e}")
@@ -0,0 +1,38 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from typing import Callable, Dict, Any, Awaitable
+from core.logger import get_logger
+from core.database.database import get_async_session
+
+logger = get_logger(__name__)
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Одна сессия БД на апдейт.
+
+    Сессия передаётся обработчикам в data["session"]; сервисы используют её,
+    только если обработчик передал её явно (get_database(session)), иначе открывают свою.
+    Соединение из пула берётся только при первом запросе (AsyncSession ленивая);
+    перед сетевыми вызовами обработчики отдают его обратно (release_connection).
+    В конце апдейта — commit, при ошибке — rollback.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        session = get_async_session()
+        data["session"] = session
+        try:
+            result = await handler(event, data)
+            if session.in_transaction():
+                await session.commit()
+            return result
+        except Exception:
+            if session.in_transaction():
+                await session.rollback()
+            raise
+        finally:
+            await session.close()
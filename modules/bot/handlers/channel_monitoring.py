@@ -11,10 +11,11 @@ from sqlalchemy import text
 from core.logger import get_logger
 from modules.bot.services.channel_service import (
     process_bot_added_to_channel,
-    save_new_post,
     add_user_subscription,
     remove_user_subscription
 )
+from modules.bot.services.membership_cache import membership_cache
+from modules.bot.services.post_ingestion import post_ingestion
 from error_handler import handle_error
 from core.database import get_database
 
@@ -31,9 +32,11 @@ async def on_bot_added(event: types.ChatMemberUpdated) -> None:
         user_id = event.from_user.id
         status = event.new_chat_member.status
         if status in ["member", "administrator", "creator"]:
-            await add_user_subscription(user_id, event.chat.id)
+            # Добавить бота администратором может только администратор канала
+            await add_user_subscription(user_id, event.chat.id, status="administrator")
         elif status in ["left", "kicked"]:
             await remove_user_subscription(user_id, event.chat.id)
+            membership_cache.invalidate(event.chat.id)
 
             async for session in get_database():
                 await session.execute(text("DELETE FROM posts WHERE channel_id = :cid"), {"cid": event.chat.id})
@@ -47,20 +50,28 @@ async def on_bot_added(event: types.ChatMemberUpdated) -> None:
         logger.error(f"❌ Ошибка при регистрации канала {event.chat.id}: {e}")
 
 
+def extract_hashtags(message: types.Message) -> list[str]:
+    """
+    Возвращает хэштеги поста (из текста или подписи к медиа).
+    """
+    content = message.text or message.caption
+    entities = message.entities or message.caption_entities or []
+    if not content:
+        return []
+    return [entity.extract_from(content) for entity in entities if entity.type == "hashtag"]
+
+
 @router.channel_post()
 async def on_new_post(message: types.Message) -> None:
     try:
         logger.info(f"📨 Новый пост в канале {message.chat.id}, message_id={message.message_id}")
-        await save_new_post(
+        # Пост записывается пачкой вместе с другими (post_ingestion.py)
+        post_ingestion.add(
             channel_id=message.chat.id,
             message_id=message.message_id,
-            post_date=message.date.replace(tzinfo=None)
+            post_date=message.date.replace(tzinfo=None),
+            interests=extract_hashtags(message)
         )
-        logger.info(f"✅ Пост сохранён: {message.message_id}")
     except Exception as e:
         handle_error(e, "ChannelMonitoring", f"Ошибка сохранения поста {message.message_id}")
         logger.error(f"❌ Ошибка сохранения поста {message.message_id}: {e}")
-
-
-def register_handler(dp):
-    dp.include_router(router)
@@ -0,0 +1,31 @@
+"""
+chat_member.py
+
+Изменения участников каналов (апдейты chat_member приходят в каналах,
+где бот — администратор): подписки пользователей обновляются без опроса get_chat_member.
+"""
+
+from aiogram import Router, types
+from core.logger import get_logger
+from modules.bot.services.membership_service import member_status, record_memberships
+from error_handler import handle_error
+
+logger = get_logger(__name__)
+router = Router()
+
+@router.chat_member()
+async def on_chat_member(event: types.ChatMemberUpdated) -> None:
+    user = event.new_chat_member.user
+    if user.is_bot:
+        return
+    try:
+        status = member_status(event.new_chat_member)
+        await record_memberships([(user.id, event.chat.id, status)])
+        logger.info(f"👥 Пользователь {user.id} в канале {event.chat.id}: {status}")
+    except Exception as e:
+        handle_error(e, "ChatMember", f"Ошибка обновления участия {user.id} в {event.chat.id}")
+        logger.error(f"❌ Ошибка обновления участия {user.id} в канале {event.chat.id}: {e}")
+
+
+def register_handler(dp):
+    dp.include_router(router)
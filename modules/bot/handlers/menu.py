@@ -11,10 +11,12 @@ from aiogram import Bot
 from aiogram import Router, types, F
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from aiogram.filters import Command
+from sqlalchemy.ext.asyncio import AsyncSession
 from core.logger import get_logger
 from modules.bot.buttons import profile_button  # заменено с settings
 
 from modules.bot.services.user_service import register_user_from_message
+from modules.bot.services.unread_service import get_unread_count
 from modules.bot.handlers.feed import handle_feed_command  # Новая логика
 from error_handler import handle_error
 
@@ -54,7 +56,11 @@ async def start_menu_handler(message: types.Message) -> None:
 
     try:
         menu = get_main_menu()
-        await message.answer("Добро пожаловать! Выберите действие:", reply_markup=menu)
+        text = "Добро пожаловать! Выберите действие:"
+        unread = await get_unread_count(message.from_user.id)
+        if unread:
+            text = f"📡 Новых постов в ваших каналах: {unread}\n\n{text}"
+        await message.answer(text, reply_markup=menu)
         logger.info("Главное меню успешно отправлено пользователю.")
     except Exception as e:
         handle_error(e, "MenuHandler", "Ошибка при отправке главного меню пользователю")
@@ -62,12 +68,12 @@ async def start_menu_handler(message: types.Message) -> None:
         await message.answer("Произошла ошибка. Пожалуйста, попробуйте позже.")
 
 @router.message(F.text == "📢 Лента")
-async def handle_feed(message: types.Message) -> None:
+async def handle_feed(message: types.Message, session: AsyncSession) -> None:
     """
-    Обрабатывает кнопку '📢 Лента'.
+    Обрабатывает кнопку '📢 Лента' (сессия — из DbSessionMiddleware).
     """
     try:
-        await handle_feed_command(message)  # Вызываем новую логику
+        await handle_feed_command(message, session)  # Вызываем новую логику
     except Exception as e:
         handle_error(e, "MenuHandler", "Ошибка при обработке запроса 'Лента'")
         logger.error(f"Ошибка в обработчике handle_feed: {e}")
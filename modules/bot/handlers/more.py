@@ -2,16 +2,22 @@ from aiogram import Router, types, F
 from modules.bot.services.post_service import send_posts
 from core.logger import get_logger
 from error_handler import handle_error
+from modules.common.utils import safe_int
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = get_logger(__name__)
 router = Router()
 
-@router.callback_query(F.data == "more_posts")
-async def handle_more_posts_callback(callback: types.CallbackQuery):
+@router.callback_query(F.data.startswith("more_posts"))
+async def handle_more_posts_callback(callback: types.CallbackQuery, session: AsyncSession):
     """
     Обработка нажатия кнопки 'Ещё' для загрузки новых постов.
+    Формат callback_data: more_posts[:<cursor>], где cursor — id, с которого продолжается лента.
     """
     try:
+        _, _, cursor_str = callback.data.partition(":")
+        cursor = safe_int(cursor_str) or None
+
         await callback.answer("Загружаю ещё посты...")
 
         # Удаляем сообщение с кнопкой "Ещё"
@@ -21,7 +27,10 @@ async def handle_more_posts_callback(callback: types.CallbackQuery):
             logger.warning(f"Не удалось удалить сообщение кнопки 'Ещё': {e}")
 
         # Запускаем загрузку следующих постов
-        await send_posts(callback.message, posts_per_page=10)
+        await send_posts(
+            callback.message, posts_per_page=10, cursor=cursor, session=session,
+            user_id=callback.from_user.id, from_prefetch=True
+        )
 
         logger.info(f"🔄 Пользователь {callback.from_user.id} нажал 'Ещё'")
 
@@ -1,17 +1,18 @@
 from aiogram import Router, types, F
 from core.logger import get_logger
 from error_handler import handle_error
-from modules.bot.services.post_service import update_post_activity, build_inline_buttons
-from core.database import get_database
+from modules.bot.services.post_service import update_post_activity
+from modules.bot.services.post_delivery import update_post_keyboard
 from core.database.models import Post
-from sqlalchemy.future import select
+from core.database.database import release_connection
+from sqlalchemy.ext.asyncio import AsyncSession
 from modules.bot.services.post_cache_service import has_recent_reaction, add_recent_reaction
 
 logger = get_logger(__name__)
 router = Router()
 
 @router.callback_query(F.data.startswith("reaction:"))
-async def handle_reaction_callback(callback: types.CallbackQuery):
+async def handle_reaction_callback(callback: types.CallbackQuery, session: AsyncSession):
     """
     Обработка нажатия на inline-кнопки реакций:
     ❤️ (heart), 👍 (like), 👎 (dislike)
@@ -27,32 +28,25 @@ async def handle_reaction_callback(callback: types.CallbackQuery):
         post_id = int(post_id_str)
         user_id = callback.from_user.id
 
-        if has_recent_reaction(user_id, post_id):
+        if await has_recent_reaction(user_id, post_id):
             await callback.answer("⏳ Вы уже голосовали за этот пост недавно.")
             return
 
         if reaction_type in {"heart", "like", "dislike"}:
             await update_post_activity(post_id, reaction_type, user_id=user_id)
-            add_recent_reaction(user_id, post_id)
+            await add_recent_reaction(user_id, post_id)
 
-            async for session in get_database():
-                result = await session.execute(select(Post).where(Post.id == post_id))
-                post = result.scalars().first()
-                break
+            post = await session.get(Post, post_id)
+            # Дальше только запросы к Telegram — соединение возвращается в пул
+            await release_connection(session)
 
-            short_id = str(post.channel_id)[4:]
-            channel_link = f"https://t.me/c/{short_id}"
-            stats = (
-                f"⬆️ <a href='{channel_link}'>Перейти в канал</a>\n"
-                f"❤️ {post.reactions_count_heart}  "
-                f"👍 {post.reactions_count_like}  "
-                f"👎 {post.reactions_count_dislike}"
-            )
+            if not post:
+                await callback.answer("⚠️ Пост не найден.")
+                return
 
-            await callback.message.edit_text(
-                text=stats,
-                reply_markup=build_inline_buttons(post),
-                parse_mode="HTML"
+            # Обновляем счётчики только в кнопках этого поста (с учётом буфера счётчиков)
+            await callback.message.edit_reply_markup(
+                reply_markup=update_post_keyboard(callback.message.reply_markup, post)
             )
 
             await callback.answer("✅ Реакция учтена!")
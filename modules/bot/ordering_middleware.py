@@ -0,0 +1,126 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from contextlib import nullcontext
+from typing import Callable, Dict, Any, Awaitable
+import asyncio
+import time
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Middleware по имени диспетчера — для метрик мониторинга
+_registry: dict[str, "UpdateOrderingMiddleware"] = {}
+
+
+class _KeyQueue:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+def _update_key(data: Dict[str, Any]) -> int | None:
+    user = data.get("event_from_user")
+    if user is not None:
+        return user.id
+    chat = data.get("event_chat")
+    if chat is not None:
+        return chat.id
+    return None
+
+
+class UpdateOrderingMiddleware(BaseMiddleware):
+    """
+    Параллельная обработка апдейтов с сохранением порядка для одного пользователя.
+
+    Апдейты разных пользователей обрабатываются одновременно (не более concurrency),
+    апдейты одного пользователя (или чата, если пользователя нет) — строго по очереди.
+    Регистрируется первой outer-middleware на dp.update, до DbSessionMiddleware:
+    ожидающий апдейт не держит ни слот, ни сессию БД.
+    """
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._keys: dict[int, _KeyQueue] = {}
+        self.waiting = 0
+        self.running = 0
+        self.processed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        _registry[name] = self
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        key = _update_key(data)
+        queue = self._enter(key)
+        started = time.monotonic()
+        self.waiting += 1
+        waiting = True
+        try:
+            async with (queue.lock if queue else nullcontext()), self._semaphore:
+                self.waiting -= 1
+                waiting = False
+                self._record_wait(time.monotonic() - started)
+                self.running += 1
+                try:
+                    return await handler(event, data)
+                finally:
+                    self.running -= 1
+        finally:
+            if waiting:
+                self.waiting -= 1
+            self._leave(key, queue)
+
+    def _enter(self, key: int | None) -> _KeyQueue | None:
+        if key is None:
+            return None
+        queue = self._keys.get(key)
+        if queue is None:
+            queue = self._keys[key] = _KeyQueue()
+        queue.users += 1
+        return queue
+
+    def _leave(self, key: int | None, queue: _KeyQueue | None) -> None:
+        if queue is None:
+            return
+        queue.users -= 1
+        if queue.users == 0:
+            del self._keys[key]
+
+    def _record_wait(self, waited: float) -> None:
+        self.processed += 1
+        self._wait_total += waited
+        if waited > self._wait_max:
+            self._wait_max = waited
+        if waited > 5:
+            logger.warning(f"⏳ Апдейт ожидал обработки {waited:.1f} сек. ({self.name})")
+
+    def get_stats(self) -> dict:
+        """
+        Глубина очереди, число выполняющихся и пользователей с апдейтами в работе, время ожидания.
+        """
+        return {
+            "waiting": self.waiting,
+            "running": self.running,
+            "keys": len(self._keys),
+            "processed": self.processed,
+            "wait_avg": round(self._wait_total / self.processed, 4) if self.processed else 0.0,
+            "wait_max": round(self._wait_max, 4),
+        }
+
+
+def get_update_stats() -> dict:
+    """
+    Метрики очередей апдейтов по диспетчерам.
+    """
+    return {name: middleware.get_stats() for name, middleware in list(_registry.items())}
+
+
+__all__ = ["UpdateOrderingMiddleware", "get_update_stats"]
@@ -1,10 +1,18 @@
+import datetime
+
 from aiogram import types
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.logger import get_logger
 from core.database import get_database
 from modules.bot.utils.bot_instance import get_bot
-from core.database.models import User  # ✅ добавлено для обновления подписок
+from modules.bot.services.membership_cache import MEMBER_STATUSES, UNKNOWN, member_status
+from modules.bot.services.membership_service import (
+    ADMIN_STATUSES, check_memberships, get_stale_channel_ids, record_memberships
+)
+from modules.bot.services.interest_service import normalize_interests, tag_posts
+from modules.bot.services.unread_service import bump_unread_counts
 
 logger = get_logger(__name__)
 
@@ -21,11 +29,11 @@ async def process_bot_added_to_channel(event: types.ChatMemberUpdated):
     async for db in get_database():
         await db.execute(
             text("""
-                INSERT INTO channels (channel_id, channel_name, channel_link)
-                VALUES (:id, :name, :link)
-                ON CONFLICT (channel_id) DO NOTHING
+                INSERT INTO channels (channel_id, channel_name, channel_link, bot_status)
+                VALUES (:id, :name, :link, :bot_status)
+                ON CONFLICT (channel_id) DO UPDATE SET bot_status = EXCLUDED.bot_status
             """),
-            {"id": channel_id, "name": channel_name, "link": channel_link}
+            {"id": channel_id, "name": channel_name, "link": channel_link, "bot_status": member_status(event.new_chat_member)}
         )
         await db.commit()
         break
@@ -33,20 +41,92 @@ async def process_bot_added_to_channel(event: types.ChatMemberUpdated):
     logger.info(f"✅ Бот добавлен в канал: {channel_name} ({channel_link})")
 
 
-async def save_new_post(channel_id: int, message_id: int, post_date: str):
+async def save_posts(session: AsyncSession, posts: list[tuple[int, int, datetime.datetime, list[str]]]) -> list[int]:
     """
-    Сохраняет новый пост в базу данных.
+    Сохраняет пачку постов (channel_id, message_id, post_date, interests) в одной транзакции:
+    многострочный INSERT ... RETURNING, привязка к интересам, posts_count и last_activity_date
+    каналов, счётчики непрочитанных у подписчиков. Транзакцию фиксирует вызывающий код.
+
+    Returns:
+        list[int]: id новых постов (уже сохранённые ранее пропускаются)
     """
-    async for db in get_database():
-        await db.execute(
-            text("""
-                INSERT INTO posts (channel_id, message_id, date)
-                VALUES (:channel_id, :message_id, :post_date)
-                ON CONFLICT DO NOTHING
-            """),
-            {"channel_id": channel_id, "message_id": message_id, "post_date": post_date}
-        )
-        await db.commit()
+    if not posts:
+        return []
+    interests_by_key = {
+        (channel_id, message_id): normalize_interests(interests or [])
+        for channel_id, message_id, _, interests in posts
+    }
+    dates = {(channel_id, message_id): post_date for channel_id, message_id, post_date, _ in posts}
+    keys = list(interests_by_key)
+
+    result = await session.execute(
+        text("""
+            INSERT INTO posts (channel_id, message_id, date, interests)
+            SELECT v.channel_id, v.message_id, v.date, v.interests
+            FROM unnest(CAST(:channel_ids AS BIGINT[]), CAST(:message_ids AS INTEGER[]),
+                        CAST(:dates AS TIMESTAMP[]), CAST(:interests AS TEXT[]))
+                 AS v(channel_id, message_id, date, interests)
+            ON CONFLICT DO NOTHING
+            RETURNING id, channel_id, message_id
+        """),
+        {
+            "channel_ids": [channel_id for channel_id, _ in keys],
+            "message_ids": [message_id for _, message_id in keys],
+            "dates": [dates[key] for key in keys],
+            "interests": [",".join(interests_by_key[key]) or None for key in keys],
+        }
+    )
+    inserted = result.fetchall()
+    if not inserted:
+        return []
+
+    await tag_posts(
+        session,
+        [row.id for row in inserted],
+        [interests_by_key[(row.channel_id, row.message_id)] for row in inserted]
+    )
+
+    new_posts: dict[int, int] = {}
+    last_activity: dict[int, datetime.datetime] = {}
+    for row in inserted:
+        new_posts[row.channel_id] = new_posts.get(row.channel_id, 0) + 1
+        post_date = dates[(row.channel_id, row.message_id)]
+        last_activity[row.channel_id] = max(last_activity.get(row.channel_id, post_date), post_date)
+
+    channel_ids = list(new_posts)
+    await session.execute(
+        text("""
+            UPDATE channels c
+            SET posts_count = coalesce(c.posts_count, 0) + v.posts,
+                last_activity_date = greatest(c.last_activity_date, v.last_activity)
+            FROM unnest(CAST(:channel_ids AS BIGINT[]), CAST(:posts AS INTEGER[]), CAST(:last_activity AS TIMESTAMP[]))
+                 AS v(channel_id, posts, last_activity)
+            WHERE c.channel_id = v.channel_id
+        """),
+        {
+            "channel_ids": channel_ids,
+            "posts": [new_posts[channel_id] for channel_id in channel_ids],
+            "last_activity": [last_activity[channel_id] for channel_id in channel_ids],
+        }
+    )
+    await bump_unread_counts(session, new_posts)
+    return [row.id for row in inserted]
+
+
+async def save_new_post(
+    channel_id: int,
+    message_id: int,
+    post_date: datetime.datetime,
+    interests: list[str] | None = None,
+    session: AsyncSession | None = None,
+):
+    """
+    Сохраняет один пост сразу (поток channel_post идёт через post_ingestion — пачками).
+    """
+    async for db in get_database(session):
+        await save_posts(db, [(channel_id, message_id, post_date, interests or [])])
+        if session is None:
+            await db.commit()
         break
 
     logger.info(f"💾 Сохранён пост {message_id} из канала {channel_id} от {post_date}")
@@ -54,62 +134,57 @@ async def save_new_post(channel_id: int, message_id: int, post_date: str):
 
 # ✅ Новые функции
 
-async def add_user_subscription(user_id: int, channel_id: int):
+async def add_user_subscription(user_id: int, channel_id: int, status: str = "member"):
     """
     Добавляет канал в список подписок пользователя.
     """
-    async for db in get_database():
-        user = await db.get(User, user_id)
-        if user:
-            if not user.subscribed_channels:
-                user.subscribed_channels = []
-            if channel_id not in user.subscribed_channels:
-                user.subscribed_channels.append(channel_id)
-                await db.commit()
-                logger.info(f"➕ Канал {channel_id} добавлен в подписки пользователя {user_id}")
-        break
+    await record_memberships([(user_id, channel_id, status)])
+    logger.info(f"➕ Канал {channel_id} добавлен в подписки пользователя {user_id}")
 
 
 async def remove_user_subscription(user_id: int, channel_id: int):
     """
     Удаляет канал из списка подписок пользователя.
     """
-    async for db in get_database():
-        user = await db.get(User, user_id)
-        if user and user.subscribed_channels and channel_id in user.subscribed_channels:
-            user.subscribed_channels.remove(channel_id)
-            await db.commit()
-            logger.info(f"➖ Канал {channel_id} удалён из подписок пользователя {user_id}")
-        break
+    await record_memberships([(user_id, channel_id, "left")])
+    logger.info(f"➖ Канал {channel_id} удалён из подписок пользователя {user_id}")
 
 
 async def get_user_channels(user_id: int, bot):
     """
     Получает список каналов, на которые пользователь подписан и которыми управляет.
+
+    Статусы берутся из user_channel_subscriptions; каналы из get_stale_channel_ids проверяются
+    через membership_cache (get_chat_member — только при промахе кэша), результат сохраняется.
     """
     subscribed_channels = []
     managed_channels = []
 
     async for db in get_database():
-        result = await db.execute(text("SELECT channel_id, channel_name, channel_link FROM channels"))
+        result = await db.execute(
+            text("""
+                SELECT c.channel_id, c.channel_name, c.channel_link, m.role AS status
+                FROM channels c
+                LEFT JOIN user_channel_subscriptions m ON m.channel_id = c.channel_id AND m.user_id = :user_id
+            """),
+            {"user_id": user_id}
+        )
         channels = result.fetchall()
+        stale = await get_stale_channel_ids(user_id, db)
+        break
 
-        for channel in channels:
-            channel_id = channel.channel_id
-            try:
-                member = await bot.get_chat_member(chat_id=channel_id, user_id=user_id)
-                status = member.status
-
-                if status in ["member", "administrator", "creator"]:
-                    subscribed_channels.append(channel)
+    checked = await check_memberships(bot, [(user_id, channel_id) for channel_id in stale])
+    # Следующее открытие профиля не запрашивает эти пары повторно
+    await record_memberships(checked)
+    statuses = {channel_id: status for _, channel_id, status in checked if status != UNKNOWN}
 
-                if status in ["administrator", "creator"]:
-                    managed_channels.append(channel)
+    for channel in channels:
+        status = statuses.get(channel.channel_id, channel.status)
 
-            except Exception as e:
-                logger.warning(f"Не удалось получить статус пользователя {user_id} в канале {channel_id}: {e}")
-                continue
+        if status in MEMBER_STATUSES:
+            subscribed_channels.append(channel)
 
-        break
+        if status in ADMIN_STATUSES:
+            managed_channels.append(channel)
 
     return subscribed_channels, managed_channels
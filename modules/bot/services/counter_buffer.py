@@ -0,0 +1,131 @@
+"""
+counter_buffer.py
+
+Буфер счётчиков постов (просмотры, клики, реакции) с отложенной записью.
+
+Инкременты накапливаются в памяти по (пост, счётчик) и сбрасываются в БД
+одним многострочным UPDATE — раз в COUNTER_FLUSH_INTERVAL_MS миллисекунд
+или при накоплении COUNTER_FLUSH_MAX_EVENTS событий.
+Несброшенные дельты доступны через pending() для отображения актуальной статистики.
+"""
+
+import asyncio
+from collections import Counter, defaultdict
+
+from sqlalchemy import text
+
+from core.config import settings
+from core.database import get_database
+from core.logger import get_logger
+from error_handler import handle_error
+
+logger = get_logger(__name__)
+
+# Тип активности → колонка таблицы posts
+ACTION_COLUMNS = {
+    "view": "views_count",
+    "reaction": "reactions_count",
+    "click": "clicks_count",
+    "heart": "reactions_count_heart",
+    "like": "reactions_count_like",
+    "dislike": "reactions_count_dislike",
+}
+
+_COLUMNS = tuple(ACTION_COLUMNS.values())
+
+
+class PostCounterBuffer:
+    """
+    Агрегатор инкрементов счётчиков постов с периодическим сбросом в БД.
+    """
+
+    def __init__(self, flush_interval: float, max_events: int):
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self._pending: defaultdict[int, Counter] = defaultdict(Counter)
+        self._inflight: list[dict[int, Counter]] = []
+        self._events = 0
+        self._timer: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def increment(self, post_id: int, column: str, delta: int = 1) -> None:
+        """
+        Добавляет инкремент счётчика column для поста post_id.
+        """
+        if column not in _COLUMNS:
+            raise ValueError(f"Неизвестный счётчик: {column}")
+        self._pending[post_id][column] += delta
+        self._events += 1
+
+        if self._events >= self.max_events:
+            task = asyncio.create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    def pending(self, post_id: int) -> Counter:
+        """
+        Возвращает ещё не записанные в БД дельты счётчиков поста.
+        """
+        deltas = Counter()
+        for batch in self._inflight:
+            deltas.update(batch.get(post_id, {}))
+        deltas.update(self._pending.get(post_id, {}))
+        return deltas
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Записывает накопленные дельты одним UPDATE.
+        При ошибке дельты возвращаются в буфер и будут записаны при следующем сбросе.
+        """
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, defaultdict(Counter)
+        self._events = 0
+        self._inflight.append(batch)
+
+        post_ids = list(batch)
+        params = {"ids": post_ids}
+        for column in _COLUMNS:
+            params[column] = [batch[post_id][column] for post_id in post_ids]
+
+        assignments = ",\n                ".join(f"{c} = COALESCE(p.{c}, 0) + v.{c}" for c in _COLUMNS)
+        arrays = ", ".join(f"CAST(:{c} AS INTEGER[])" for c in _COLUMNS)
+        statement = text(f"""
+            UPDATE posts AS p
+            SET {assignments}
+            FROM unnest(CAST(:ids AS INTEGER[]), {arrays}) AS v(id, {", ".join(_COLUMNS)})
+            WHERE p.id = v.id
+        """)
+
+        try:
+            async for session in get_database():
+                await session.execute(statement, params)
+                await session.commit()
+                break
+            logger.debug(f"Счётчики сброшены для {len(post_ids)} постов.")
+        except Exception as e:
+            handle_error(e, "PostCounterBuffer", "Ошибка при сбросе счётчиков постов")
+            logger.error(f"Ошибка при сбросе счётчиков постов: {e}")
+            for post_id, deltas in batch.items():
+                self._pending[post_id].update(deltas)
+                self._events += len(deltas)
+            # Повтор по таймеру, даже если новых инкрементов не будет
+            if self._timer is None or self._timer.done() or self._timer is asyncio.current_task():
+                self._timer = asyncio.create_task(self._flush_later())
+        finally:
+            self._inflight.remove(batch)
+
+
+counter_buffer = PostCounterBuffer(
+    flush_interval=settings.COUNTER_FLUSH_INTERVAL_MS / 1000,
+    max_events=settings.COUNTER_FLUSH_MAX_EVENTS,
+)
+
+__all__ = ["ACTION_COLUMNS", "PostCounterBuffer", "counter_buffer"]
@@ -1,44 +1,62 @@
 from aiogram import types
-from core.database.models import Post
-from modules.bot.services.feed_service import generate_user_feed
-from modules.bot.services.post_cache_service import get_cached_post_ids, add_posts_to_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.database.database import release_connection
+from modules.bot.services.feed_service import generate_user_feed, get_feed_rows
+from modules.bot.services.post_cache_service import add_posts_to_cache, filter_unseen
+from modules.bot.services.prefetch_service import PrefetchedPage, page_prefetcher
+from modules.bot.services.post_delivery import deliver_page
+from modules.bot.services.post_service import delete_post_from_db
 from error_handler import handle_error
 import logging
 
-# ✅ Новый импорт для ограничения запросов
-from modules.bot.utils.rate_limiter import TelegramRateLimiter
-
 logger = logging.getLogger(__name__)
 
 user_last_feed = {}
 
-# ✅ Инициализация ограничителя запросов
-rate_limiter = TelegramRateLimiter()
-
-def build_inline_buttons(post: Post) -> types.InlineKeyboardMarkup:
-    return types.InlineKeyboardMarkup(inline_keyboard=[
-        [
-            types.InlineKeyboardButton(text="❤️", callback_data=f"reaction:{post.id}:heart"),
-            types.InlineKeyboardButton(text="👍", callback_data=f"reaction:{post.id}:like"),
-            types.InlineKeyboardButton(text="👎", callback_data=f"reaction:{post.id}:dislike"),
-            types.InlineKeyboardButton(text="💬 Комментировать", url=f"https://t.me/c/{str(post.channel_id)[4:]}/{post.message_id}")
-        ]
-    ])
-
 def more_feed_button() -> types.InlineKeyboardMarkup:
     return types.InlineKeyboardMarkup(inline_keyboard=[
         [types.InlineKeyboardButton(text="➕ Ещё", callback_data="more_feed_posts")]
     ])
 
-async def send_feed_posts(message: types.Message, posts_per_page: int = 10):
+async def prefetch_feed_page(user_id: int, posts_per_page: int) -> PrefetchedPage:
+    """
+    Следующая страница ленты (только id) — для кнопки «Ещё».
+    """
+    rows = await generate_user_feed(user_id, posts_per_page=posts_per_page)
+    return PrefetchedPage(post_ids=[row.id for row in rows])
+
+
+async def _take_prefetched(user_id: int, session: AsyncSession | None) -> list:
+    page = await page_prefetcher.take(user_id, "feed")
+    if page is None:
+        return []
+    # Посты могли быть показаны или удалены, пока страница лежала в кэше
+    unseen_ids = await filter_unseen(user_id, page.post_ids)
+    return await get_feed_rows(unseen_ids, session=session)
+
+
+async def send_feed_posts(
+    message: types.Message,
+    posts_per_page: int = 10,
+    session: AsyncSession | None = None,
+    user_id: int | None = None,
+    from_prefetch: bool = False,
+):
+    """
+    Отправляет страницу персональной ленты в чат сообщения.
+    user_id обязателен для сообщений бота (кнопка «Ещё»): у них from_user — сам бот.
+    from_prefetch — сначала взять предвыбранную страницу (prefetch_service.py).
+    """
     try:
-        user_id = message.from_user.id
-
-        all_posts = await generate_user_feed(user_id, posts_per_page=posts_per_page)
+        user_id = user_id or message.from_user.id
 
-        # Фильтрация: исключаем уже отправленные посты (кеш)
-        excluded_ids = set(get_cached_post_ids(user_id))
-        posts = [p for p in all_posts if p.id not in excluded_ids]
+        posts = await _take_prefetched(user_id, session) if from_prefetch else []
+        if not posts:
+            # Уже просмотренные посты исключаются в самом запросе ленты
+            posts = await generate_user_feed(user_id, posts_per_page=posts_per_page, session=session)
+        if session is not None:
+            # Соединение не должно простаивать в транзакции, пока посты отправляются
+            await release_connection(session)
 
         if not posts:
             await message.answer("Нет новых постов для ленты.")
@@ -46,41 +64,21 @@ async def send_feed_posts(message: types.Message, posts_per_page: int = 10):
 
         user_last_feed[user_id] = [p.id for p in posts]
 
-        for post in posts:
-            try:
-                await rate_limiter.throttle()
-                await message.bot.forward_message(
-                    chat_id=message.chat.id,
-                    from_chat_id=post.channel_id,
-                    message_id=post.message_id
-                )
-
-                short_id = str(post.channel_id)[4:]
-                channel_link = f"https://t.me/c/{short_id}"
-                stats = (
-                    f"⬆️ <a href='{channel_link}'>Перейти в канал</a>\n"
-                    f"❤️ {post.reactions_count_heart}  "
-                    f"👍 {post.reactions_count_like}  "
-                    f"👎 {post.reactions_count_dislike}"
-                )
-
-                await rate_limiter.throttle()
-                await message.bot.send_message(
-                    chat_id=message.chat.id,
-                    text=stats,
-                    reply_markup=build_inline_buttons(post),
-                    parse_mode="HTML"
-                )
-
-            except Exception as e:
-                logger.warning(f"Ошибка при показе поста {post.id}: {e}")
-                continue
-
-        add_posts_to_cache(user_id, [p.id for p in posts])
-
-        await rate_limiter.throttle()
+        delivered, missing = await deliver_page(message.bot, message.chat.id, posts)
+        for post in missing:
+            await delete_post_from_db(post.id)
+
+        if not delivered:
+            await message.answer("Нет новых постов для ленты.")
+            return
+
+        await add_posts_to_cache(user_id, [p.id for p in delivered])
+
         await message.answer("⬇️", reply_markup=more_feed_button())
 
+        # Следующая страница считается, пока пользователь смотрит текущую
+        page_prefetcher.schedule(user_id, "feed", lambda: prefetch_feed_page(user_id, posts_per_page))
+
     except Exception as e:
         handle_error(e, "FeedPostService", "Ошибка при отправке ленты")
         logger.error(f"Ошибка при отправке ленты: {e}")
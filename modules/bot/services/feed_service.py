@@ -2,86 +2,195 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from core.database import get_database
-from core.database.models import Post, Channel
+from core.database.models import Post, Channel, Interest, PostInterest
 from sqlalchemy.sql.expression import func
+from collections import defaultdict, deque
+from typing import Collection
+from modules.bot.services.post_cache_service import get_cached_post_ids
+from modules.bot.services.random_pool import random_pool
+from modules.bot.services.interest_service import normalize_interests
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def get_random_posts(limit: int = 1):
+async def get_random_posts(limit: int = 1, exclude: Collection[int] = ()):
     """
-    Возвращает случайные посты из базы.
+    Возвращает случайные посты из пула кандидатов (random_pool.py).
     """
+    post_ids = await random_pool.draw(limit, exclude)
+    if not post_ids:
+        return []
     async for session in get_database():
-        result = await session.execute(
-            select(Post)
-            .join(Channel, Post.channel_id == Channel.channel_id)
-            .where(Channel.channel_link.isnot(None))
-            .order_by(func.random())
-            .limit(limit)
-        )
+        result = await session.execute(select(Post).where(Post.id.in_(post_ids)))
         posts = result.scalars().all()
         break
     return posts
 
 async def get_posts_by_interest(interest: str, limit: int = 2):
     """
-    Возвращает посты по интересу.
+    Возвращает последние посты по интересу (индекс post_interests(interest_id, post_id)).
     """
+    names = normalize_interests([interest])
+    if not names:
+        return []
     async for session in get_database():
         result = await session.execute(
-            text("""
-                SELECT posts.*
-                FROM posts
-                JOIN channels ON posts.channel_id = channels.channel_id
-                WHERE posts.interests ILIKE :interest
-                AND channels.channel_link IS NOT NULL
-                ORDER BY posts.date DESC
-                LIMIT :limit
-            """),
-            {"interest": f"%{interest}%", "limit": limit}
+            select(Post)
+            .join(PostInterest, PostInterest.post_id == Post.id)
+            .join(Interest, Interest.interest_id == PostInterest.interest_id)
+            .join(Channel, Channel.channel_id == Post.channel_id)
+            .where(func.lower(Interest.interest_name) == names[0])
+            .where(Channel.channel_link.isnot(None))
+            .order_by(PostInterest.post_id.desc())
+            .limit(limit)
         )
-        posts = result.fetchall()
+        posts = result.scalars().all()
         break
-    return [Post(**dict(p)) for p in posts]
+    return posts
+
+# Лёгкие строки ленты: только поля, нужные для пересылки и статистики
+FEED_COLUMNS = """
+    posts.id, posts.channel_id, posts.message_id, posts.date,
+    posts.reactions_count_heart, posts.reactions_count_like, posts.reactions_count_dislike
+"""
+
+# Вся страница ленты одним запросом:
+# - квоты интересов считаются по схеме 2/1/2/1/... (интерес i получает
+#   interest_slots / N слотов плюс один из остатка);
+# - для каждого интереса — LATERAL-подзапрос по индексу post_interests(interest_id, post_id)
+#   с LIMIT по квоте (самые свежие посты — с наибольшим id);
+# - случайные посты (id заранее выбраны из random_pool) добавляются через UNION ALL;
+# - уже просмотренные посты исключаются в SQL.
+FEED_QUERY = text(f"""
+    WITH wanted AS (
+        SELECT i.interest_id, w.ord, cardinality(u.interests) AS total,
+               :interest_slots / cardinality(u.interests)
+               + CASE WHEN w.ord <= :interest_slots % cardinality(u.interests) THEN 1 ELSE 0 END AS quota
+        FROM users u
+        CROSS JOIN LATERAL unnest(u.interests) WITH ORDINALITY AS w(interest, ord)
+        JOIN interests i ON lower(i.interest_name) = lower(ltrim(btrim(w.interest), '#'))
+        WHERE u.user_id = :user_id
+    )
+    SELECT w.ord AS slot_group, w.total, p.*
+    FROM wanted w
+    CROSS JOIN LATERAL (
+        SELECT {FEED_COLUMNS}
+        FROM post_interests pi
+        JOIN posts ON posts.id = pi.post_id
+        JOIN channels ON posts.channel_id = channels.channel_id
+        WHERE pi.interest_id = w.interest_id
+          AND channels.channel_link IS NOT NULL
+          AND pi.post_id <> ALL(CAST(:seen AS INTEGER[]))
+        ORDER BY pi.post_id DESC
+        LIMIT w.quota
+    ) p
+    WHERE w.quota > 0
+    UNION ALL
+    SELECT 0, 0, {FEED_COLUMNS}
+    FROM posts
+    WHERE posts.id = ANY(CAST(:random_ids AS INTEGER[]))
+""")
+
+# Строки ленты по заранее выбранным id (предвыбранная страница, prefetch_service.py)
+FEED_ROWS_QUERY = text(f"""
+    SELECT {FEED_COLUMNS}
+    FROM posts
+    WHERE posts.id = ANY(CAST(:ids AS INTEGER[]))
+""")
+
 
-async def generate_user_feed(user_id: int, posts_per_page: int = 10):
+def _is_random_slot(position: int) -> bool:
+    # Схема 2/1/2/1/...: каждый третий слот — случайный пост
+    return position % 3 == 2
+
+
+def _interleave(rows, posts_per_page: int) -> list:
+    """
+    Раскладывает строки запроса по слотам 2/1/2/1/...
+    Пустые слоты добираются оставшимися постами (сначала случайными).
+    """
+    groups: dict[int, deque] = defaultdict(deque)
+    total = 0
+    for row in rows:
+        groups[row.slot_group].append(row)
+        if row.slot_group:
+            total = row.total
+
+    used = set()
+
+    def take(group: int):
+        queue = groups.get(group)
+        while queue:
+            row = queue.popleft()
+            if row.id not in used:
+                used.add(row.id)
+                return row
+        return None
+
+    feed = []
+    interest_slot = 0
+    for position in range(posts_per_page):
+        if _is_random_slot(position) or not total:
+            row = take(0)
+        else:
+            row = take(interest_slot % total + 1)
+            interest_slot += 1
+        if row is not None:
+            feed.append(row)
+
+    for group in sorted(groups):
+        while len(feed) < posts_per_page:
+            row = take(group)
+            if row is None:
+                break
+            feed.append(row)
+
+    return feed
+
+
+async def generate_user_feed(user_id: int, posts_per_page: int = 10, session: AsyncSession | None = None):
     """
     Генерирует ленту 2/1/2/1/... с учётом интересов и случайных постов.
     Если интересов нет — полностью случайная лента.
+    Вся страница выбирается одним запросом и возвращается лёгкими строками
+    (id, channel_id, message_id, date и счётчики реакций).
     """
     try:
-        async for session in get_database():
-            user_result = await session.execute(
-                text("SELECT interests FROM users WHERE user_id = :user_id"),
-                {"user_id": user_id}
+        interest_slots = sum(1 for pos in range(posts_per_page) if not _is_random_slot(pos))
+        seen = await get_cached_post_ids(user_id)
+        # Случайных берём на всю страницу: ими добираются пустые слоты интересов
+        random_ids = await random_pool.draw(posts_per_page, exclude=set(seen))
+
+        async for session in get_database(session):
+            result = await session.execute(
+                FEED_QUERY,
+                {
+                    "user_id": user_id,
+                    "interest_slots": interest_slots,
+                    "random_ids": random_ids,
+                    "seen": seen,
+                }
             )
-            user = user_result.fetchone()
+            rows = result.fetchall()
             break
 
-        # Если интересов нет — возвращаем случайные посты
-        if not user or not user[0]:
-            logger.warning(f"❗ У пользователя {user_id} нет интересов. Показываем случайную ленту.")
-            return await get_random_posts(limit=posts_per_page)
+        if not any(row.slot_group for row in rows):
+            logger.warning(f"❗ Для пользователя {user_id} нет постов по интересам. Показываем случайную ленту.")
 
-        interests = user[0]
-        feed = []
-        interest_index = 0
-
-        while len(feed) < posts_per_page:
-            # 2 поста по интересам
-            for _ in range(2):
-                if interest_index >= len(interests):
-                    interest_index = 0
-                posts = await get_posts_by_interest(interests[interest_index], limit=1)
-                feed.extend(posts)
-                interest_index += 1
-
-            # 1 случайный
-            feed.extend(await get_random_posts(limit=1))
-
-        return feed[:posts_per_page]
+        return _interleave(rows, posts_per_page)
 
     except Exception as e:
         logger.error(f"Ошибка при формировании ленты пользователя {user_id}: {e}")
         raise
+
+async def get_feed_rows(post_ids: list[int], session: AsyncSession | None = None) -> list:
+    """
+    Лёгкие строки ленты по id в заданном порядке (удалённые посты пропускаются).
+    """
+    if not post_ids:
+        return []
+    async for session in get_database(session):
+        result = await session.execute(FEED_ROWS_QUERY, {"ids": post_ids})
+        rows = {row.id: row for row in result}
+        break
+    return [rows[post_id] for post_id in post_ids if post_id in rows]
@@ -0,0 +1,67 @@
+"""
+interest_service.py
+
+Тегирование постов интересами через нормализованную связь post_interests.
+
+Имена интересов хранятся в нижнем регистре без ведущего '#'
+(уникальность — индекс по lower(interest_name)).
+"""
+
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_interests(names: Iterable[str]) -> list[str]:
+    """
+    Приводит имена интересов к нижнему регистру, убирает '#', пробелы и дубли (порядок сохраняется).
+    """
+    result = []
+    for name in names:
+        name = name.strip().lstrip("#").strip().lower()
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+async def tag_posts(session: AsyncSession, post_ids: list[int], interests: list[list[str]]) -> None:
+    """
+    Привязывает посты к интересам (создаёт недостающие интересы).
+    Транзакцию фиксирует вызывающий код.
+
+    Args:
+        session (AsyncSession): сессия БД
+        post_ids (list[int]): id постов
+        interests (list[list[str]]): нормализованные интересы для каждого поста
+    """
+    pairs = [(post_id, name) for post_id, names in zip(post_ids, interests) for name in names]
+    if not pairs:
+        return
+
+    await session.execute(
+        text("""
+            INSERT INTO interests (interest_name)
+            SELECT DISTINCT name FROM unnest(CAST(:names AS TEXT[])) AS name
+            ON CONFLICT ((lower(interest_name))) DO NOTHING
+        """),
+        {"names": list({name for _, name in pairs})}
+    )
+    await session.execute(
+        text("""
+            INSERT INTO post_interests (post_id, interest_id)
+            SELECT v.post_id, i.interest_id
+            FROM unnest(CAST(:post_ids AS INTEGER[]), CAST(:names AS TEXT[])) AS v(post_id, name)
+            JOIN interests i ON lower(i.interest_name) = v.name
+            ON CONFLICT DO NOTHING
+        """),
+        {"post_ids": [post_id for post_id, _ in pairs], "names": [name for _, name in pairs]}
+    )
+    logger.debug(f"🏷 Добавлено {len(pairs)} тегов для {len(post_ids)} постов.")
+
+
+__all__ = ["normalize_interests", "tag_posts"]
@@ -0,0 +1,149 @@
+"""
+membership_cache.py
+
+Кэш статусов участия (chat_id, user_id) → status для get_chat_member.
+
+- положительные статусы живут MEMBERSHIP_CACHE_TTL_SECONDS, отрицательные
+  (left, kicked, пользователь не найден) — MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS;
+- одновременные запросы одной пары одним ботом ждут один вызов API (в пределах event loop);
+- get_statuses проверяет пачку пар с ограничением параллельности;
+- обновления chat_member записываются в кэш (membership_service.record_memberships).
+
+«Неизвестно» (бот не видит участников канала) кэшируется только для того бота, который спрашивал.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import ChatMember
+
+from core.config import settings
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+MEMBER_STATUSES = ("member", "administrator", "creator")
+# Статус неизвестен (бот не видит участников канала)
+UNKNOWN = "unknown"
+
+
+def member_status(member: ChatMember) -> str:
+    """
+    Статус участника строкой; restricted сводится к member/left по is_member.
+    """
+    status = getattr(member.status, "value", member.status)
+    if status == "restricted":
+        return "member" if getattr(member, "is_member", False) else "left"
+    return status
+
+
+class MembershipCache:
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # (chat_id, user_id) → (status, expires_at, bot_id для UNKNOWN)
+        self._entries: "OrderedDict[tuple[int | str, int], tuple[str, float, int | None]]" = OrderedDict()
+        self._in_flight: dict[tuple[int, int, int | str, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def set(self, chat_id: int | str, user_id: int, status: str, bot_id: int | None = None) -> None:
+        ttl = self.ttl if status in MEMBER_STATUSES else self.negative_ttl
+        key = (chat_id, user_id)
+        self._entries[key] = (status, time.monotonic() + ttl, bot_id if status == UNKNOWN else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def peek(self, bot_id: int, chat_id: int | str, user_id: int) -> str | None:
+        entry = self._entries.get((chat_id, user_id))
+        if entry is None:
+            return None
+        status, expires_at, owner = entry
+        if expires_at < time.monotonic() or (owner is not None and owner != bot_id):
+            return None
+        return status
+
+    def invalidate(self, chat_id: int, user_id: int | None = None) -> None:
+        """
+        Сбрасывает статус пары или всех пользователей канала.
+        """
+        if user_id is not None:
+            self._entries.pop((chat_id, user_id), None)
+            return
+        # Копия ключей: кэш меняется и из потока профиль-бота
+        for key in [key for key in list(self._entries) if key[0] == chat_id]:
+            self._entries.pop(key, None)
+
+    async def _fetch(self, bot: Bot, chat_id: int | str, user_id: int) -> str | None:
+        try:
+            member = await bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+            status = member_status(member)
+        except TelegramBadRequest as e:
+            if "user not found" in str(e).lower():
+                status = "left"
+            else:
+                logger.debug(f"Статус {user_id} в {chat_id} недоступен: {e}")
+                status = UNKNOWN
+        except Exception as e:
+            # Сетевые ошибки и исчерпанные повторы после 429 не кэшируются
+            logger.warning(f"⚠️ Ошибка проверки {user_id} в {chat_id}: {e}")
+            return None
+        self.set(chat_id, user_id, status, bot.id)
+        return status
+
+    async def get_status(self, bot: Bot, chat_id: int | str, user_id: int) -> str | None:
+        """
+        Статус пользователя в чате (None — проверить не удалось).
+        chat_id может быть и @username, как PREMIUM_CHANNEL_ID.
+        """
+        status = self.peek(bot.id, chat_id, user_id)
+        if status is not None:
+            self.hits += 1
+            return status
+        self.misses += 1
+
+        key = (id(asyncio.get_running_loop()), bot.id, chat_id, user_id)
+        future = self._in_flight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._fetch(bot, chat_id, user_id))
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def get_statuses(self, bot: Bot, pairs: list[tuple[int, int]]) -> dict[tuple[int, int], str]:
+        """
+        Статусы пачки пар (chat_id, user_id); не более MEMBERSHIP_CHECK_CONCURRENCY запросов к API одновременно.
+        Пары, которые проверить не удалось, в результат не попадают.
+        """
+        semaphore = asyncio.Semaphore(settings.MEMBERSHIP_CHECK_CONCURRENCY)
+
+        async def lookup(chat_id: int, user_id: int) -> str | None:
+            status = self.peek(bot.id, chat_id, user_id)
+            if status is not None:
+                self.hits += 1
+                return status
+            async with semaphore:
+                return await self.get_status(bot, chat_id, user_id)
+
+        statuses = await asyncio.gather(*(lookup(chat_id, user_id) for chat_id, user_id in pairs))
+        return {pair: status for pair, status in zip(pairs, statuses) if status is not None}
+
+    def get_stats(self) -> dict:
+        return {"entries": len(self._entries), "in_flight": len(self._in_flight), "hits": self.hits, "misses": self.misses}
+
+
+membership_cache = MembershipCache(
+    settings.MEMBERSHIP_CACHE_TTL_SECONDS,
+    settings.MEMBERSHIP_CACHE_NEGATIVE_TTL_SECONDS,
+    settings.MEMBERSHIP_CACHE_MAX_ENTRIES,
+)
+
+
+__all__ = ["MEMBER_STATUSES", "UNKNOWN", "member_status", "MembershipCache", "membership_cache"]
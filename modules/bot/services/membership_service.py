@@ -0,0 +1,262 @@
+"""
+membership_service.py
+
+Участие пользователей в каналах.
+
+Основной источник — обновления chat_member: бот получает их в каналах, где он администратор
+(тип апдейта попадает в allowed_updates автоматически, так как на него есть обработчик).
+Подписки хранятся в одной таблице user_channel_subscriptions: роль (member, administrator,
+creator) и время последней проверки пары; при отписке пара удаляется.
+
+get_chat_member вызывается только для устаревших подписок (вступления и выходы приходят событиями)
+и для каналов, где бот не администратор и событий не получает (channels.bot_status):
+- фоновой сверкой reconcile_memberships (пачками, с ограничением параллельности, в полосе BULK);
+- при /start и открытии профиля — get_stale_channel_ids.
+Ответы API и статусы из chat_member попадают в общий кэш membership_cache.
+"""
+
+import datetime
+from typing import Iterable
+
+from aiogram import Bot
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.database import get_database
+from core.logger import get_logger
+from modules.bot.services.membership_cache import MEMBER_STATUSES, UNKNOWN, member_status, membership_cache
+from modules.bot.services.prefetch_service import page_prefetcher
+from modules.bot.utils.rate_limiter import outbound_priority, Lane
+
+logger = get_logger(__name__)
+
+ADMIN_STATUSES = ("administrator", "creator")
+
+# updated_at — время смены роли, checked_at — последней проверки
+_UPSERT_QUERY = text("""
+    INSERT INTO user_channel_subscriptions (user_id, channel_id, role, checked_at, updated_at)
+    SELECT v.user_id, v.channel_id, v.status, :now, :now
+    FROM unnest(CAST(:user_ids AS BIGINT[]), CAST(:channel_ids AS BIGINT[]), CAST(:statuses AS TEXT[]))
+         AS v(user_id, channel_id, status)
+    JOIN users u ON u.user_id = v.user_id
+    JOIN channels c ON c.channel_id = v.channel_id
+    WHERE v.status IN ('member', 'administrator', 'creator')
+    ON CONFLICT (user_id, channel_id) DO UPDATE
+    SET role = EXCLUDED.role,
+        checked_at = EXCLUDED.checked_at,
+        updated_at = CASE WHEN user_channel_subscriptions.role <> EXCLUDED.role
+                          THEN EXCLUDED.updated_at ELSE user_channel_subscriptions.updated_at END
+""")
+
+_DELETE_QUERY = text("""
+    DELETE FROM user_channel_subscriptions s
+    USING unnest(CAST(:user_ids AS BIGINT[]), CAST(:channel_ids AS BIGINT[]), CAST(:statuses AS TEXT[]))
+          AS v(user_id, channel_id, status)
+    WHERE s.user_id = v.user_id AND s.channel_id = v.channel_id
+      AND v.status NOT IN ('member', 'administrator', 'creator')
+""")
+
+# Сверка: пары, статус которых бот не видит, откладываются до следующего срока без смены роли
+_TOUCH_QUERY = text("""
+    UPDATE user_channel_subscriptions s
+    SET checked_at = :now
+    FROM unnest(CAST(:user_ids AS BIGINT[]), CAST(:channel_ids AS BIGINT[])) AS v(user_id, channel_id)
+    WHERE s.user_id = v.user_id AND s.channel_id = v.channel_id
+""")
+
+
+def _cutoff() -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(hours=settings.MEMBERSHIP_MAX_AGE_HOURS)
+
+
+async def record_memberships(
+    rows: Iterable[tuple[int, int, str]],
+    session: AsyncSession | None = None,
+) -> None:
+    """
+    Сохраняет статусы (user_id, channel_id, status) в user_channel_subscriptions: участник или
+    администратор — upsert роли и времени проверки, left/kicked — удаление пары.
+    UNKNOWN (бот не видит участников канала) пропускается: ни статус, ни время проверки не меняются.
+    Пары с незарегистрированными пользователями или каналами пропускаются.
+    С переданной сессией транзакцию фиксирует вызывающий код.
+    """
+    pairs = {(user_id, channel_id): status for user_id, channel_id, status in rows if status != UNKNOWN}
+    if not pairs:
+        return
+    for (user_id, channel_id), status in pairs.items():
+        membership_cache.set(channel_id, user_id, status)
+    params = {
+        "user_ids": [user_id for user_id, _ in pairs],
+        "channel_ids": [channel_id for _, channel_id in pairs],
+        "statuses": list(pairs.values()),
+        "now": datetime.datetime.utcnow(),
+    }
+
+    async for db in get_database(session):
+        await db.execute(_UPSERT_QUERY, params)
+        await db.execute(_DELETE_QUERY, params)
+        if session is None:
+            await db.commit()
+        break
+    # Предвыбранные страницы каналов посчитаны по прежним подпискам
+    for user_id in {user_id for user_id, _ in pairs}:
+        page_prefetcher.invalidate(user_id)
+    logger.debug(f"👥 Обновлено участие: {len(pairs)} пар.")
+
+
+async def get_subscribed_channel_ids(user_id: int, session: AsyncSession | None = None) -> list[int]:
+    """
+    Каналы, на которые подписан пользователь (по первичному ключу user_channel_subscriptions).
+    """
+    async for session in get_database(session):
+        result = await session.execute(
+            text("SELECT channel_id FROM user_channel_subscriptions WHERE user_id = :user_id"),
+            {"user_id": user_id}
+        )
+        channel_ids = list(result.scalars().all())
+        break
+    return channel_ids
+
+
+async def get_channel_subscriber_ids(channel_id: int, session: AsyncSession | None = None) -> list[int]:
+    """
+    Подписчики канала (по индексу channel_id, user_id) — для рассылок по новому посту и уведомлений.
+    """
+    async for session in get_database(session):
+        result = await session.execute(
+            text("SELECT user_id FROM user_channel_subscriptions WHERE channel_id = :channel_id"),
+            {"channel_id": channel_id}
+        )
+        user_ids = list(result.scalars().all())
+        break
+    return user_ids
+
+
+async def check_memberships(bot: Bot, pairs: list[tuple[int, int]]) -> list[tuple[int, int, str]]:
+    """
+    Проверяет пары (user_id, channel_id) через membership_cache: свежие статусы берутся из кэша,
+    остальные — get_chat_member, не более MEMBERSHIP_CHECK_CONCURRENCY запросов одновременно.
+    Пары, проверка которых не удалась из-за сети или лимитов, в результат не попадают.
+    """
+    statuses = await membership_cache.get_statuses(bot, [(channel_id, user_id) for user_id, channel_id in pairs])
+    return [(user_id, channel_id, status) for (channel_id, user_id), status in statuses.items()]
+
+
+async def get_stale_channel_ids(user_id: int, session: AsyncSession | None = None) -> list[int]:
+    """
+    Каналы, статус пользователя в которых нужно перепроверить: подписки без свежей проверки
+    (старше MEMBERSHIP_MAX_AGE_HOURS) и каналы, откуда не приходят апдейты chat_member
+    (бот не администратор или его статус ещё не известен).
+    """
+    async for session in get_database(session):
+        result = await session.execute(
+            text("""
+                SELECT c.channel_id
+                FROM channels c
+                LEFT JOIN user_channel_subscriptions s ON s.channel_id = c.channel_id AND s.user_id = :user_id
+                WHERE CASE WHEN s.user_id IS NOT NULL THEN s.checked_at IS NULL OR s.checked_at < :cutoff
+                           ELSE c.bot_status IS NULL OR c.bot_status NOT IN ('administrator', 'creator') END
+            """),
+            {"user_id": user_id, "cutoff": _cutoff()}
+        )
+        channel_ids = list(result.scalars().all())
+        break
+    return channel_ids
+
+
+async def refresh_user_memberships(user_id: int, bot: Bot) -> None:
+    """
+    Перепроверяет каналы пользователя из get_stale_channel_ids.
+    """
+    channel_ids = await get_stale_channel_ids(user_id)
+
+    if not channel_ids:
+        return
+    # Перепроверка по всем каналам не должна задерживать ответы другим пользователям
+    with outbound_priority(Lane.BACKGROUND):
+        rows = await check_memberships(bot, [(user_id, channel_id) for channel_id in channel_ids])
+    await record_memberships(rows)
+    logger.info(f"Перепроверено {len(rows)} каналов пользователя {user_id}.")
+
+
+async def _resolve_bot_statuses(bot: Bot) -> None:
+    """
+    Статус бота в каналах, добавленных до появления channels.bot_status (по запросу на канал).
+    """
+    async for session in get_database():
+        result = await session.execute(text("SELECT channel_id FROM channels WHERE bot_status IS NULL"))
+        channel_ids = result.scalars().all()
+        break
+    if not channel_ids:
+        return
+
+    with outbound_priority(Lane.BULK):
+        statuses = await membership_cache.get_statuses(bot, [(channel_id, bot.id) for channel_id in channel_ids])
+    if not statuses:
+        return
+    async for session in get_database():
+        await session.execute(
+            text("""
+                UPDATE channels c SET bot_status = v.status
+                FROM unnest(CAST(:channel_ids AS BIGINT[]), CAST(:statuses AS TEXT[])) AS v(channel_id, status)
+                WHERE c.channel_id = v.channel_id
+            """),
+            {"channel_ids": [channel_id for channel_id, _ in statuses], "statuses": list(statuses.values())}
+        )
+        await session.commit()
+        break
+    logger.info(f"Уточнён статус бота в {len(statuses)} каналах.")
+
+
+async def reconcile_memberships(bot: Bot) -> int:
+    """
+    Фоновая сверка: перепроверяет до MEMBERSHIP_RECONCILE_BATCH самых давних подписок
+    (отписки не хранятся и не перепроверяются) и уточняет статус бота в каналах, где он не известен.
+    Пары со статусом UNKNOWN только сдвигаются в конец очереди (checked_at), роль сохраняется.
+
+    Returns:
+        int: число проверенных пар
+    """
+    await _resolve_bot_statuses(bot)
+
+    async for session in get_database():
+        result = await session.execute(
+            text("""
+                SELECT user_id, channel_id
+                FROM user_channel_subscriptions
+                WHERE checked_at IS NULL OR checked_at < :cutoff
+                ORDER BY checked_at NULLS FIRST
+                LIMIT :limit
+            """),
+            {"cutoff": _cutoff(), "limit": settings.MEMBERSHIP_RECONCILE_BATCH}
+        )
+        pairs = [(row.user_id, row.channel_id) for row in result]
+        break
+
+    if not pairs:
+        return 0
+    with outbound_priority(Lane.BULK):
+        rows = await check_memberships(bot, pairs)
+    await record_memberships(rows)
+
+    unknown = [(user_id, channel_id) for user_id, channel_id, status in rows if status == UNKNOWN]
+    if unknown:
+        # Иначе эти пары возглавляли бы каждую следующую пачку сверки
+        async for session in get_database():
+            await session.execute(_TOUCH_QUERY, {
+                "user_ids": [user_id for user_id, _ in unknown],
+                "channel_ids": [channel_id for _, channel_id in unknown],
+                "now": datetime.datetime.utcnow(),
+            })
+            await session.commit()
+            break
+    logger.info(f"🔄 Сверка участия в каналах: проверено {len(rows)} из {len(pairs)} пар.")
+    return len(rows)
+
+
+__all__ = [
+    "MEMBER_STATUSES", "ADMIN_STATUSES", "UNKNOWN", "member_status", "record_memberships",
+    "get_subscribed_channel_ids", "get_channel_subscriber_ids", "get_stale_channel_ids",
+    "check_memberships", "refresh_user_memberships", "reconcile_memberships",
+]
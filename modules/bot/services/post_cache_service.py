@@ -1,105 +1,44 @@
-import os
-import json
-import time
-
-CACHE_DIR = "post_cache"
-CACHE_DURATION_SECONDS = 60 * 60  # 60 минут
+"""
+post_cache_service.py
 
-os.makedirs(CACHE_DIR, exist_ok=True)
+Кеш просмотренных постов и недавних реакций пользователя.
+Тонкий фасад над SeenStore (seen_store.py): данные хранятся в памяти процесса
+или в Redis, без файлового ввода-вывода.
+"""
 
-def _get_cache_path(user_id: int) -> str:
-    return os.path.join(CACHE_DIR, f"user_{user_id}.json")
-
-def load_cache(user_id: int) -> dict:
-    path = _get_cache_path(user_id)
-    if not os.path.exists(path):
-        return {"viewed": {}, "reactions": {}}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {"viewed": {}, "reactions": {}}
+import time
 
-def save_cache(user_id: int, cache: dict) -> None:
-    path = _get_cache_path(user_id)
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(cache, f)
-    except Exception as e:
-        print(f"[post_cache] Ошибка при сохранении: {e}")
+from modules.bot.services.seen_store import get_seen_store
 
-def get_cached_post_ids(user_id: int) -> list[int]:
-    cache = load_cache(user_id)
-    now = time.time()
-    recent = {
-        int(post_id): ts
-        for post_id, ts in cache.get("viewed", {}).items()
-        if now - ts <= CACHE_DURATION_SECONDS
-    }
-    return list(recent.keys())
+CACHE_DURATION_SECONDS = 60 * 60  # 60 минут (значение по умолчанию SEEN_STORE_TTL_SECONDS)
 
-def add_posts_to_cache(user_id: int, post_ids: list[int]) -> None:
-    cache = load_cache(user_id)
-    now = time.time()
-    viewed = cache.get("viewed", {})
-    for post_id in post_ids:
-        viewed[str(post_id)] = now
-    cache["viewed"] = viewed
-    save_cache(user_id, cache)
 
-def has_recent_reaction(user_id: int, post_id: int) -> bool:
-    cache = load_cache(user_id)
-    ts = cache.get("reactions", {}).get(str(post_id))
-    return ts and (time.time() - ts <= CACHE_DURATION_SECONDS)
+async def get_cached_post_ids(user_id: int) -> list[int]:
+    return await get_seen_store().get_viewed(user_id)
 
-def add_recent_reaction(user_id: int, post_id: int) -> None:
-    cache = load_cache(user_id)
-    reactions = cache.get("reactions", {})
-    reactions[str(post_id)] = int(time.time())
-    cache["reactions"] = reactions
-    save_cache(user_id, cache)
+async def filter_unseen(user_id: int, candidate_ids: list[int]) -> list[int]:
+    return await get_seen_store().filter_unseen(user_id, candidate_ids)
 
-def clean_cache():
-    now = time.time()
-    for filename in os.listdir(CACHE_DIR):
-        path = os.path.join(CACHE_DIR, filename)
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+async def add_posts_to_cache(user_id: int, post_ids: list[int]) -> None:
+    await get_seen_store().add_viewed(user_id, post_ids)
 
-            viewed = {
-                pid: ts for pid, ts in data.get("viewed", {}).items()
-                if now - ts <= CACHE_DURATION_SECONDS
-            }
-            reactions = {
-                pid: ts for pid, ts in data.get("reactions", {}).items()
-                if now - ts <= CACHE_DURATION_SECONDS
-            }
+async def has_recent_reaction(user_id: int, post_id: int) -> bool:
+    return await get_seen_store().has_reaction(user_id, post_id)
 
-            if not viewed and not reactions:
-                os.remove(path)
-            else:
-                with open(path, "w", encoding="utf-8") as f:
-                    json.dump({"viewed": viewed, "reactions": reactions}, f)
+async def add_recent_reaction(user_id: int, post_id: int) -> None:
+    await get_seen_store().add_reaction(user_id, post_id)
 
-        except Exception as e:
-            print(f"[post_cache] Ошибка при очистке файла {filename}: {e}")
+async def clean_cache() -> None:
+    await get_seen_store().cleanup()
 
-# ✅ Добавлено
-def update_activity(user_id: int) -> None:
+async def update_activity(user_id: int) -> None:
     """
     Обновляет активность пользователя, сохраняя timestamp в 'last_seen'.
     """
-    cache = load_cache(user_id)
-    cache["last_seen"] = int(time.time())
-    save_cache(user_id, cache)
+    await get_seen_store().set_meta(user_id, "last_seen", int(time.time()))
 
-# ✅ Новые функции кеша подписки
-def get_last_subscription_refresh(user_id: int) -> int | None:
-    cache = load_cache(user_id)
-    return cache.get("last_refresh")
+async def get_last_subscription_refresh(user_id: int) -> int | None:
+    return await get_seen_store().get_meta(user_id, "last_refresh")
 
-def set_last_subscription_refresh(user_id: int) -> None:
-    cache = load_cache(user_id)
-    cache["last_refresh"] = int(time.time())
-    save_cache(user_id, cache)
+async def set_last_subscription_refresh(user_id: int) -> None:
+    await get_seen_store().set_meta(user_id, "last_refresh", int(time.time()))
@@ -0,0 +1,262 @@
+"""
+post_delivery.py
+
+Доставка постов ленты пользователю — общий слой для send_posts и send_feed_posts.
+
+Основной режим — один вызов copy_message на пост: копия сообщения канала
+сразу несёт клавиатуру с реакциями (счётчики — в подписях кнопок),
+ссылкой на канал и кнопкой комментариев.
+Если канал запрещает копирование, используется прежняя схема:
+forward_message + отдельное сообщение с той же клавиатурой.
+
+Страница ленты доставляется пачками (deliver_page): посты группируются по каналу,
+группа из нескольких постов копируется одним copy_messages (до 100 id за вызов),
+после чего отправляется одно сообщение-клавиатура со строкой реакций на каждый пост.
+Если Telegram скопировал не все сообщения (часть удалена из канала) или пачка
+отклонена целиком, копии удаляются, и группа доставляется поштучно через deliver_post —
+так точно определяются удалённые посты.
+
+Реакции обновляют только клавиатуру сообщения (update_post_keyboard).
+"""
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramBadRequest
+from typing import Sequence
+
+from core.logger import get_logger
+from modules.bot.services.counter_buffer import counter_buffer
+
+logger = get_logger(__name__)
+
+# Результаты доставки поста
+DELIVERED = "delivered"
+MISSING = "missing"  # исходное сообщение удалено из канала
+FAILED = "failed"
+
+REACTIONS = (
+    ("heart", "❤️", "reactions_count_heart"),
+    ("like", "👍", "reactions_count_like"),
+    ("dislike", "👎", "reactions_count_dislike"),
+)
+
+_MISSING_ERRORS = ("message to copy not found", "message to forward not found")
+
+# Ограничение Bot API на число сообщений в copyMessages
+COPY_BATCH_LIMIT = 100
+
+
+def channel_link(channel_id: int) -> str:
+    return f"https://t.me/c/{str(channel_id)[4:]}"
+
+
+def post_counts(post) -> dict[str, int]:
+    """
+    Счётчики реакций поста с учётом ещё не записанных в БД инкрементов.
+    """
+    pending = counter_buffer.pending(post.id)
+    return {
+        reaction: (getattr(post, column, 0) or 0) + pending[column]
+        for reaction, _, column in REACTIONS
+    }
+
+
+def _reaction_buttons(post, label: str = "") -> list[types.InlineKeyboardButton]:
+    counts = post_counts(post)
+    return [
+        types.InlineKeyboardButton(
+            text=f"{label if i == 0 else ''}{emoji} {counts[reaction]}",
+            callback_data=f"reaction:{post.id}:{reaction}"
+        )
+        for i, (reaction, emoji, _) in enumerate(REACTIONS)
+    ]
+
+
+def build_post_rows(post) -> list[list[types.InlineKeyboardButton]]:
+    """
+    Строки клавиатуры одного поста: реакции со счётчиками, переход в канал и комментарии.
+    """
+    link = channel_link(post.channel_id)
+    return [
+        _reaction_buttons(post),
+        [
+            types.InlineKeyboardButton(text="⬆️ Перейти в канал", url=link),
+            types.InlineKeyboardButton(text="💬 Комментировать", url=f"{link}/{post.message_id}"),
+        ],
+    ]
+
+
+def build_post_keyboard(post) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=build_post_rows(post))
+
+
+def build_group_keyboard(posts: Sequence) -> types.InlineKeyboardMarkup:
+    """
+    Клавиатура для пачки постов одного канала: по строке на пост
+    (номер поста в пачке, реакции и комментарии) и общая кнопка перехода в канал.
+    """
+    rows = []
+    for number, post in enumerate(posts, start=1):
+        row = _reaction_buttons(post, label=f"{number}. ")
+        row.append(types.InlineKeyboardButton(
+            text="💬", url=f"{channel_link(post.channel_id)}/{post.message_id}"
+        ))
+        rows.append(row)
+    rows.append([types.InlineKeyboardButton(text="⬆️ Перейти в канал", url=channel_link(posts[0].channel_id))])
+    return types.InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def update_post_keyboard(markup: types.InlineKeyboardMarkup | None, post) -> types.InlineKeyboardMarkup:
+    """
+    Обновляет подписи кнопок реакций поста в существующей клавиатуре.
+    Остальные кнопки (в т.ч. других постов) не меняются.
+    """
+    if markup is None:
+        return build_post_keyboard(post)
+
+    counts = post_counts(post)
+    prefix = f"reaction:{post.id}:"
+    emojis = {reaction: emoji for reaction, emoji, _ in REACTIONS}
+    rows = []
+    for row in markup.inline_keyboard:
+        new_row = []
+        for button in row:
+            data = button.callback_data or ""
+            if data.startswith(prefix):
+                reaction = data[len(prefix):]
+                if reaction in counts:
+                    # Сохраняем префикс подписи (номер поста в пачке)
+                    emoji = emojis[reaction]
+                    label = button.text[:button.text.find(emoji)] if emoji in button.text else ""
+                    button = button.model_copy(update={"text": f"{label}{emoji} {counts[reaction]}"})
+            new_row.append(button)
+        rows.append(new_row)
+    return types.InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+async def _forward_with_stats(bot: Bot, chat_id: int, post) -> None:
+    await bot.forward_message(chat_id=chat_id, from_chat_id=post.channel_id, message_id=post.message_id)
+    await bot.send_message(
+        chat_id=chat_id,
+        text=f"⬆️ <a href='{channel_link(post.channel_id)}'>Перейти в канал</a>",
+        reply_markup=build_post_keyboard(post),
+        parse_mode="HTML"
+    )
+
+
+async def deliver_post(bot: Bot, chat_id: int, post) -> str:
+    """
+    Отправляет пост пользователю.
+
+    Returns:
+        str: DELIVERED, MISSING (сообщение удалено из канала) или FAILED
+    """
+    try:
+        try:
+            await bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=post.channel_id,
+                message_id=post.message_id,
+                reply_markup=build_post_keyboard(post)
+            )
+        except TelegramBadRequest as e:
+            if any(error in str(e).lower() for error in _MISSING_ERRORS):
+                raise
+            # Копирование запрещено (защищённый контент, служебное сообщение и т.п.)
+            logger.debug(f"Пост {post.id} нельзя скопировать ({e}), пересылаем.")
+            await _forward_with_stats(bot, chat_id, post)
+        return DELIVERED
+    except Exception as e:
+        logger.warning(f"⚠️ Ошибка при отправке поста {post.id}: {e}")
+        if any(error in str(e).lower() for error in _MISSING_ERRORS):
+            return MISSING
+        return FAILED
+
+
+def group_by_channel(posts: Sequence) -> list[list]:
+    """
+    Группирует посты страницы по каналу (в порядке первого появления канала),
+    внутри группы — по возрастанию message_id (требование copyMessages),
+    с разбиением на части не более COPY_BATCH_LIMIT.
+    """
+    groups: dict[int, list] = {}
+    for post in posts:
+        groups.setdefault(post.channel_id, []).append(post)
+    result = []
+    for group in groups.values():
+        group.sort(key=lambda p: p.message_id)
+        for start in range(0, len(group), COPY_BATCH_LIMIT):
+            result.append(group[start:start + COPY_BATCH_LIMIT])
+    return result
+
+
+async def _deliver_one_by_one(bot: Bot, chat_id: int, posts: Sequence) -> tuple[list, list]:
+    delivered, missing = [], []
+    for post in posts:
+        status = await deliver_post(bot, chat_id, post)
+        if status == DELIVERED:
+            delivered.append(post)
+        elif status == MISSING:
+            missing.append(post)
+    return delivered, missing
+
+
+async def _deliver_group(bot: Bot, chat_id: int, group: list) -> tuple[list, list]:
+    if len(group) == 1:
+        return await _deliver_one_by_one(bot, chat_id, group)
+
+    try:
+        copies = await bot.copy_messages(
+            chat_id=chat_id,
+            from_chat_id=group[0].channel_id,
+            message_ids=[post.message_id for post in group]
+        )
+    except TelegramBadRequest as e:
+        logger.debug(f"Пачка из канала {group[0].channel_id} не скопирована ({e}), отправляем поштучно.")
+        return await _deliver_one_by_one(bot, chat_id, group)
+
+    if len(copies) != len(group):
+        # Часть сообщений пропущена — какие именно, по ответу не понять
+        logger.debug(
+            f"Скопировано {len(copies)} из {len(group)} постов канала {group[0].channel_id}, отправляем поштучно."
+        )
+        if copies:
+            try:
+                await bot.delete_messages(chat_id=chat_id, message_ids=[copy.message_id for copy in copies])
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось удалить неполную пачку постов: {e}")
+        return await _deliver_one_by_one(bot, chat_id, group)
+
+    try:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=f"⬆️ Посты 1–{len(group)} из <a href='{channel_link(group[0].channel_id)}'>канала</a>",
+            reply_markup=build_group_keyboard(group),
+            parse_mode="HTML",
+            reply_parameters=types.ReplyParameters(message_id=copies[0].message_id, allow_sending_without_reply=True)
+        )
+    except Exception as e:
+        # Посты уже доставлены, без клавиатуры остаются только реакции
+        logger.warning(f"⚠️ Ошибка при отправке клавиатуры пачки постов: {e}")
+    return list(group), []
+
+
+async def deliver_page(bot: Bot, chat_id: int, posts: Sequence) -> tuple[list, list]:
+    """
+    Доставляет страницу ленты пачками по каналам.
+
+    Returns:
+        tuple[list, list]: доставленные посты и посты, удалённые из канала
+    """
+    delivered, missing = [], []
+    for group in group_by_channel(posts):
+        group_delivered, group_missing = await _deliver_group(bot, chat_id, group)
+        delivered.extend(group_delivered)
+        missing.extend(group_missing)
+    return delivered, missing
+
+
+__all__ = [
+    "DELIVERED", "MISSING", "FAILED", "COPY_BATCH_LIMIT",
+    "channel_link", "post_counts", "build_post_rows", "build_post_keyboard", "build_group_keyboard",
+    "update_post_keyboard", "deliver_post", "group_by_channel", "deliver_page",
+]
@@ -0,0 +1,208 @@
+"""
+post_ingestion.py
+
+Очередь сохранения новых постов каналов.
+
+Посты из апдейтов channel_post копятся в памяти и записываются пачкой
+(channel_service.save_posts) в одной транзакции — раз в POST_INGEST_FLUSH_INTERVAL_MS
+миллисекунд или при накоплении POST_INGEST_MAX_BATCH постов. При утренних всплесках
+публикаций это одна сессия на пачку вместо сессии и COMMIT на каждый пост.
+
+Ошибки записи:
+- посты неудавшейся пачки повторяются по одному (своя транзакция на пост),
+  так что ошибочная строка не задерживает остальные каналы;
+- повторы идут с экспоненциальной паузой (до _MAX_BACKOFF сек.), пост отбрасывается
+  после POST_INGEST_MAX_ATTEMPTS неудачных попыток;
+- очередь ограничена POST_INGEST_MAX_PENDING постами (при переполнении отбрасываются самые старые).
+При остановке бота очередь дописывается через drain().
+"""
+
+import asyncio
+import datetime
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from core.config import settings
+from core.database import get_database
+from core.logger import get_logger
+from error_handler import handle_error
+from modules.bot.services.channel_service import save_posts
+
+logger = get_logger(__name__)
+
+# Максимальная пауза между повторами после ошибок (сек.)
+_MAX_BACKOFF = 60.0
+
+# Ошибки, вызванные данными конкретного поста: остальные посты пачки сохраняются дальше
+_ROW_ERRORS = (IntegrityError, DataError)
+
+_Key = tuple[int, int]
+_Value = tuple[datetime.datetime, list[str]]
+
+
+class PostIngestionQueue:
+    """
+    Буфер новых постов с периодической записью в БД.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int, max_attempts: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        # (channel_id, message_id) → (дата, хэштеги); повтор апдейта не дублирует пост
+        self._pending: dict[_Key, _Value] = {}
+        # Число неудачных попыток сохранения поста
+        self._attempts: dict[_Key, int] = {}
+        # Подряд неудачных сбросов — для паузы перед повтором
+        self._failures = 0
+        self._timer: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.saved = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def add(self, channel_id: int, message_id: int, post_date: datetime.datetime, interests: list[str] | None = None) -> None:
+        """
+        Ставит пост в очередь на сохранение.
+        """
+        self._pending[(channel_id, message_id)] = (post_date, interests or [])
+        if len(self._pending) > self.max_pending:
+            self._drop(next(iter(self._pending)), "очередь переполнена")
+
+        # После ошибок сбросы идут только по таймеру с паузой
+        if len(self._pending) >= self.max_batch and not self._failures:
+            task = asyncio.create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later(self.flush_interval))
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self.flush()
+
+    async def _save(self, posts: dict[_Key, _Value]) -> int:
+        rows = [
+            (channel_id, message_id, post_date, interests)
+            for (channel_id, message_id), (post_date, interests) in posts.items()
+        ]
+        async for session in get_database():
+            post_ids = await save_posts(session, rows)
+            await session.commit()
+            break
+        for key in posts:
+            self._attempts.pop(key, None)
+        return len(post_ids)
+
+    async def flush(self) -> None:
+        """
+        Записывает накопленные посты: новые — одной транзакцией,
+        уже неудачные — по одному.
+        """
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        try:
+            await self._flush_batch(batch)
+        except asyncio.CancelledError:
+            # Остановка во время записи: несохранённое возвращается в очередь
+            for key, value in batch.items():
+                self._pending.setdefault(key, value)
+            raise
+
+    async def _flush_batch(self, batch: dict[_Key, _Value]) -> None:
+        fresh = {key: value for key, value in batch.items() if key not in self._attempts}
+        retried = [(key, value) for key, value in batch.items() if key in self._attempts]
+        saved = 0
+        failed: dict[_Key, _Value] = {}
+        untried: dict[_Key, _Value] = {}
+
+        if fresh:
+            try:
+                saved += await self._save(fresh)
+                self.batches += 1
+            except Exception as e:
+                handle_error(e, "PostIngestionQueue", "Ошибка при пакетном сохранении постов")
+                logger.error(f"Ошибка при пакетном сохранении {len(fresh)} постов: {e}")
+                failed.update(fresh)
+
+        for index, (key, value) in enumerate(retried):
+            try:
+                saved += await self._save({key: value})
+            except _ROW_ERRORS as e:
+                logger.warning(f"⚠️ Не удалось сохранить пост {key[1]} из канала {key[0]}: {e}")
+                failed[key] = value
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось сохранить пост {key[1]} из канала {key[0]}: {e}")
+                failed[key] = value
+                # Ошибка не в данных поста (например, БД недоступна) — остальные ждут следующего повтора
+                untried = dict(retried[index + 1:])
+                break
+
+        for key, value in failed.items():
+            self._count_failure(key, value)
+        for key, value in untried.items():
+            self._pending.setdefault(key, value)
+
+        self.saved += saved
+        if saved:
+            logger.info(f"💾 Сохранено постов: {saved} из {len(batch)} (каналов: {len({key[0] for key in batch})}).")
+
+        if failed or untried:
+            self._failures += 1
+            delay = min(self.flush_interval * 2 ** self._failures, _MAX_BACKOFF)
+            if self._timer is None or self._timer.done() or self._timer is asyncio.current_task():
+                self._timer = asyncio.create_task(self._flush_later(delay))
+        else:
+            self._failures = 0
+
+    def _count_failure(self, key: _Key, value: _Value) -> None:
+        attempts = self._attempts.get(key, 0) + 1
+        if attempts >= self.max_attempts:
+            self._drop(key, f"{attempts} неудачных попыток")
+            return
+        self._attempts[key] = attempts
+        self._pending.setdefault(key, value)
+
+    def _drop(self, key: _Key, reason: str) -> None:
+        self._pending.pop(key, None)
+        self._attempts.pop(key, None)
+        self.dropped += 1
+        logger.error(f"❌ Пост {key[1]} из канала {key[0]} не сохранён ({reason}).")
+
+    async def drain(self) -> None:
+        """
+        Дожидается начатых сбросов и записывает остаток очереди (при остановке).
+        Пауза после ошибок не ждётся: делается одна последняя попытка.
+        """
+        pending = list(self._tasks)
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+            pending.append(self._timer)
+        await asyncio.gather(*pending, return_exceptions=True)
+        await self.flush()
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        if self._pending:
+            logger.error(f"❌ При остановке не сохранено постов: {len(self._pending)}.")
+
+    def get_stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "saved": self.saved,
+            "batches": self.batches,
+            "retrying": len(self._attempts),
+            "dropped": self.dropped,
+        }
+
+
+post_ingestion = PostIngestionQueue(
+    flush_interval=settings.POST_INGEST_FLUSH_INTERVAL_MS / 1000,
+    max_batch=settings.POST_INGEST_MAX_BATCH,
+    max_attempts=settings.POST_INGEST_MAX_ATTEMPTS,
+    max_pending=settings.POST_INGEST_MAX_PENDING,
+)
+
+__all__ = ["PostIngestionQueue", "post_ingestion"]
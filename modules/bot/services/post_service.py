@@ -2,22 +2,27 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import delete
 from core.database import get_database
-from core.database.models import Post, User, Channel, PremiumUser
+from core.database.database import release_connection
+from core.database.models import Post
 from error_handler import handle_error
-from modules.bot.services.post_cache_service import get_cached_post_ids, add_posts_to_cache
+from modules.bot.services.post_cache_service import filter_unseen, add_posts_to_cache
+from modules.bot.services.quota_service import reserve_views
+from modules.bot.services.counter_buffer import ACTION_COLUMNS, counter_buffer
+from modules.bot.services.post_delivery import deliver_page
+from modules.bot.services.prefetch_service import PrefetchedPage, page_prefetcher
+from modules.bot.services.membership_service import get_subscribed_channel_ids
+from modules.bot.services.unread_service import mark_channels_read
 from aiogram import types
 
 import logging
 
-# ✅ Добавлен импорт ограничителя
-from modules.bot.utils.rate_limiter import TelegramRateLimiter
-
 logger = logging.getLogger(__name__)
 
 user_last_posts = {}
 
-# ✅ Инициализация ограничителя
-rate_limiter = TelegramRateLimiter()
+# Размер пачки кандидатов относительно размера страницы и максимум пачек на страницу
+PAGE_SCAN_FACTOR = 3
+MAX_SCAN_BATCHES = 3
 
 async def delete_post_from_db(post_id: int):
     async for session in get_database():
@@ -31,29 +36,13 @@ async def update_post_activity(post_id: int, action_type: str, user_id: int | No
             logger.info(f"📩 Пользователь {user_id} активировал пост {post_id}. Догружаем ещё.")
             user_last_posts[user_id] = []
 
-        async for session in get_database():
-            post_result = await session.execute(select(Post).where(Post.id == post_id))
-            post = post_result.scalars().first()
-
-            if not post:
-                logger.warning(f"Пост с ID {post_id} не найден.")
-                break
+        column = ACTION_COLUMNS.get(action_type)
+        if column is None:
+            logger.warning(f"Неизвестный тип активности '{action_type}' для поста {post_id}.")
+            return
 
-            if action_type == "view":
-                post.views_count += 1
-            elif action_type == "reaction":
-                post.reactions_count += 1
-            elif action_type == "click":
-                post.clicks_count += 1
-            elif action_type == "heart":
-                post.reactions_count_heart += 1
-            elif action_type == "like":
-                post.reactions_count_like += 1
-            elif action_type == "dislike":
-                post.reactions_count_dislike += 1
-
-            await session.commit()
-            break
+        # Инкремент копится в буфере и записывается в БД пачкой
+        counter_buffer.increment(post_id, column)
 
     except Exception as e:
         handle_error(e, "PostService", f"Ошибка при обновлении активности для поста {post_id}")
@@ -74,115 +63,147 @@ async def get_next_posts(last_post_id: int | None = None, limit: int = 50):
         break
     return posts
 
-def build_inline_buttons(post: Post) -> types.InlineKeyboardMarkup:
+def more_button(cursor: int | None = None) -> types.InlineKeyboardMarkup:
+    callback_data = f"more_posts:{cursor}" if cursor else "more_posts"
     return types.InlineKeyboardMarkup(inline_keyboard=[
-        [
-            types.InlineKeyboardButton(text="❤️", callback_data=f"reaction:{post.id}:heart"),
-            types.InlineKeyboardButton(text="👍", callback_data=f"reaction:{post.id}:like"),
-            types.InlineKeyboardButton(text="👎", callback_data=f"reaction:{post.id}:dislike"),
-            types.InlineKeyboardButton(text="💬 Комментировать", url=f"https://t.me/c/{str(post.channel_id)[4:]}/{post.message_id}")
-        ]
+        [types.InlineKeyboardButton(text="➕ Ещё", callback_data=callback_data)]
     ])
 
-def more_button() -> types.InlineKeyboardMarkup:
-    return types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="➕ Ещё", callback_data="more_posts")]
-    ])
-
-async def send_posts(message, posts_per_page: int = 10, context: str = "feed"):
+async def _grant(session: AsyncSession, candidates: list, limit: int, context: str) -> list:
+    if context == "feed":
+        return await reserve_views(session, candidates, limit=limit)
+    return candidates[:limit]
+
+async def prefetch_channel_page(
+    user_id: int, channel_ids: list[int], cursor: int | None, posts_per_page: int
+) -> PrefetchedPage:
+    """
+    Кандидаты следующей страницы (id непросмотренных постов с id < cursor) без резервирования показов.
+    """
+    batch_size = posts_per_page * PAGE_SCAN_FACTOR
+    post_ids = []
+    scan_cursor = cursor
+    exhausted = False
+    async for session in get_database():
+        for _ in range(MAX_SCAN_BATCHES):
+            query = select(Post.id).where(Post.channel_id.in_(channel_ids))
+            if scan_cursor:
+                query = query.where(Post.id < scan_cursor)
+            result = await session.execute(query.order_by(Post.id.desc()).limit(batch_size))
+            batch_ids = result.scalars().all()
+            exhausted = len(batch_ids) < batch_size
+            if not batch_ids:
+                break
+            post_ids.extend(await filter_unseen(user_id, list(batch_ids)))
+            scan_cursor = batch_ids[-1]
+            if len(post_ids) >= posts_per_page or exhausted:
+                break
+        break
+    return PrefetchedPage(post_ids=post_ids, cursor=cursor, next_cursor=scan_cursor, exhausted=exhausted)
+
+async def send_posts(
+    message,
+    posts_per_page: int = 10,
+    context: str = "feed",
+    cursor: int | None = None,
+    session: AsyncSession | None = None,
+    user_id: int | None = None,
+    from_prefetch: bool = False,
+):
+    """
+    Отправляет страницу постов из каналов, на которые подписан пользователь.
+    user_id обязателен для сообщений бота (кнопка «Ещё»): у них from_user — сам бот.
+    from_prefetch — сначала взять предвыбранных кандидатов страницы (prefetch_service.py).
+
+    Пагинация по ключу: страница берётся из постов с id < cursor (от новых к старым),
+    а id последнего просмотренного кандидата передаётся в callback_data кнопки «Ещё».
+    Доставленная первая страница (cursor не задан) сбрасывает счётчик непрочитанных.
+    """
     try:
-        user_id = message.from_user.id
+        user_id = user_id or message.from_user.id
 
-        async for session in get_database():
-            user = await session.get(User, user_id)
-            logger.info(f"DEBUG: user.subscribed_channels = {user.subscribed_channels}")
-            if not user or not user.subscribed_channels:
-                await rate_limiter.throttle()
+        async for session in get_database(session):
+            channel_ids = await get_subscribed_channel_ids(user_id, session)
+            if not channel_ids:
+                await release_connection(session)
                 await message.answer("Вы не подписаны ни на один канал.")
                 return
 
-            result = await session.execute(
-                select(Post).where(Post.channel_id.in_(user.subscribed_channels)).order_by(Post.id.desc()).limit(300)
-            )
-            all_posts = result.scalars().all()
-            break
+            batch_size = posts_per_page * PAGE_SCAN_FACTOR
+            posts_to_send = []
+            next_cursor = cursor
+            exhausted = False
+
+            page = await page_prefetcher.take(user_id, "channels", cursor) if from_prefetch else None
+            if page is not None:
+                # Предвыбранные кандидаты: остаётся отфильтровать показанные и зарезервировать показы
+                unseen_ids = set(await filter_unseen(user_id, page.post_ids))
+                result = await session.execute(
+                    select(Post).where(Post.id.in_(unseen_ids)).order_by(Post.id.desc())
+                )
+                granted = await _grant(session, result.scalars().all(), posts_per_page, context)
+                posts_to_send.extend(granted)
+                if len(posts_to_send) >= posts_per_page:
+                    next_cursor = granted[-1].id
+                else:
+                    next_cursor = page.next_cursor
+                    exhausted = page.exhausted
+
+            for _ in range(MAX_SCAN_BATCHES):
+                if len(posts_to_send) >= posts_per_page or exhausted:
+                    break
+                query = select(Post).where(Post.channel_id.in_(channel_ids))
+                if next_cursor:
+                    query = query.where(Post.id < next_cursor)
+                result = await session.execute(query.order_by(Post.id.desc()).limit(batch_size))
+                batch = result.scalars().all()
+                if len(batch) < batch_size:
+                    exhausted = True
+                if not batch:
+                    break
 
-        excluded_ids = set(get_cached_post_ids(user_id))
-        candidate_posts = [p for p in all_posts if p.id not in excluded_ids][:posts_per_page]
+                posts_by_id = {p.id: p for p in batch}
+                unseen_ids = await filter_unseen(user_id, list(posts_by_id))
+                candidate_posts = [posts_by_id[post_id] for post_id in unseen_ids]
 
-        if not candidate_posts:
-            await message.answer("Нет новых постов для отображения.")
-            return
+                # Показы резервируются для всей страницы за один проход
+                granted = await _grant(session, candidate_posts, posts_per_page - len(posts_to_send), context)
+                posts_to_send.extend(granted)
 
-        posts_to_show = []
-        async for session in get_database():
-            for post in candidate_posts:
-                if len(posts_to_show) >= posts_per_page:
+                if len(posts_to_send) >= posts_per_page:
+                    # Кандидаты после последнего выданного поста остаются на следующую страницу
+                    next_cursor = granted[-1].id
+                    exhausted = False
                     break
+                next_cursor = batch[-1].id
+            # Резервирование показов фиксируется, соединение возвращается в пул до отправки постов
+            await release_connection(session)
+            break
 
-                allow_post = True
-
-                if context == "feed":
-                    channel = await session.get(Channel, post.channel_id)
-                    if channel and channel.monthly_views_left > 0:
-                        channel.monthly_views_left -= 1
-                    else:
-                        allow_post = False
-                        if channel and channel.admin_user_ids:
-                            for admin_id in channel.admin_user_ids:
-                                premium_admin = await session.get(PremiumUser, admin_id)
-                                if premium_admin:
-                                    if premium_admin.premium_views > 0:
-                                        premium_admin.premium_views -= 1
-                                        allow_post = True
-                                        break
-                                    elif premium_admin.referral_bonus_views > 0:
-                                        premium_admin.referral_bonus_views -= 1
-                                        allow_post = True
-                                        break
-                    await session.commit()
-
-                if not allow_post:
-                    logger.info(f"🚫 Пост {post.id} не показан — нет лимитов.")
-                    continue
-
-                try:
-                    await rate_limiter.throttle()
-                    await message.bot.forward_message(
-                        chat_id=message.chat.id,
-                        from_chat_id=post.channel_id,
-                        message_id=post.message_id
-                    )
-
-                    short_id = str(post.channel_id)[4:]
-                    channel_link = f"https://t.me/c/{short_id}"
-                    stats = (
-                        f"⬆️ <a href='{channel_link}'>Перейти в канал</a>\n"
-                        f"❤️ {post.reactions_count_heart}  "
-                        f"👍 {post.reactions_count_like}  "
-                        f"👎 {post.reactions_count_dislike}"
-                    )
-
-                    await rate_limiter.throttle()
-                    await message.bot.send_message(
-                        chat_id=message.chat.id,
-                        text=stats,
-                        reply_markup=build_inline_buttons(post),
-                        parse_mode="HTML"
-                    )
-
-                    posts_to_show.append(post)
-
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка при отправке поста {post.id}: {e}")
-                    if "message to forward not found" in str(e):
-                        await delete_post_from_db(post.id)
-                    continue
+        if not posts_to_send:
+            if exhausted:
+                await message.answer("Нет новых постов для отображения.")
+            else:
+                await message.answer("Нет новых постов в этой части ленты.", reply_markup=more_button(next_cursor))
+            return
+
+        posts_to_show, missing = await deliver_page(message.bot, message.chat.id, posts_to_send)
+        for post in missing:
+            await delete_post_from_db(post.id)
 
         if posts_to_show:
-            add_posts_to_cache(user_id, [p.id for p in posts_to_show])
-            await rate_limiter.throttle()
-            await message.answer("⬇️", reply_markup=more_button())
+            await add_posts_to_cache(user_id, [p.id for p in posts_to_show])
+            if cursor is None:
+                # Прочитано всё до самого нового доставленного поста (своя короткая транзакция)
+                await mark_channels_read(user_id, max(p.id for p in posts_to_show))
+            await message.answer("⬇️", reply_markup=more_button(None if exhausted else next_cursor))
+
+        if not exhausted:
+            # Следующая страница считается, пока пользователь смотрит текущую
+            page_prefetcher.schedule(
+                user_id, "channels",
+                lambda: prefetch_channel_page(user_id, channel_ids, next_cursor, posts_per_page)
+            )
 
     except Exception as e:
         logger.warning(f"⚠️ Ошибка при загрузке ленты: {e}")
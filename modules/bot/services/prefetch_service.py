@@ -0,0 +1,119 @@
+"""
+prefetch_service.py
+
+Предвыборка следующей страницы ленты.
+
+После отправки страницы (send_feed_posts / send_posts) в фоне вычисляется следующая:
+только id постов-кандидатов, без резервирования показов. Страница хранится в памяти
+процесса с коротким TTL (на пользователя и вид ленты). Кнопки «➕ Ещё» сначала берут
+страницу из кэша — показы резервируются уже при отправке, — и лишь при промахе
+считают её заново. Если предвыборка ещё идёт, «Ещё» дожидается её, а не запускает вторую.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from core.config import settings
+from core.logger import get_logger
+from modules.bot.utils.rate_limiter import outbound_priority, Lane
+
+logger = get_logger(__name__)
+
+# Сколько «Ещё» ждёт незавершённую предвыборку, прежде чем считать страницу само
+_WAIT_TIMEOUT = 5.0
+
+
+@dataclass
+class PrefetchedPage:
+    post_ids: list[int]
+    # Курсор, с которого начинается страница, и продолжение после просмотренных кандидатов
+    cursor: int | None = None
+    next_cursor: int | None = None
+    exhausted: bool = False
+    expires_at: float = field(default=0.0)
+
+
+class PagePrefetcher:
+    """
+    Кэш предвычисленных страниц: ключ — (user_id, вид ленты), LRU с ограничением размера.
+    """
+
+    def __init__(self, ttl: float, max_users: int):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._pages: "OrderedDict[tuple[int, str], PrefetchedPage]" = OrderedDict()
+        self._tasks: dict[tuple[int, str], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def schedule(
+        self,
+        user_id: int,
+        kind: str,
+        compute: Callable[[], Awaitable[PrefetchedPage | None]],
+    ) -> None:
+        """
+        Запускает вычисление следующей страницы в фоне (предыдущая предвыборка отменяется).
+        """
+        key = (user_id, kind)
+        self._pages.pop(key, None)
+        previous = self._tasks.pop(key, None)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        task = asyncio.create_task(self._run(key, compute))
+        self._tasks[key] = task
+        task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+
+    async def _run(self, key: tuple[int, str], compute: Callable[[], Awaitable[PrefetchedPage | None]]) -> None:
+        try:
+            # Запросы к Telegram из предвыборки не опережают ответы пользователям
+            with outbound_priority(Lane.BACKGROUND):
+                page = await compute()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка предвыборки страницы {key}: {e}")
+            return
+        if not page or not page.post_ids:
+            return
+        page.expires_at = time.monotonic() + self.ttl
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_users:
+            self._pages.popitem(last=False)
+
+    async def take(self, user_id: int, kind: str, cursor: int | None = None) -> PrefetchedPage | None:
+        """
+        Забирает предвычисленную страницу, если она не устарела и начинается с cursor.
+        """
+        key = (user_id, kind)
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            await asyncio.wait({task}, timeout=_WAIT_TIMEOUT)
+
+        page = self._pages.pop(key, None)
+        if page is None or page.expires_at < time.monotonic() or page.cursor != cursor:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return page
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Сбрасывает страницы пользователя: вызывается при смене подписок (record_memberships) и интересов.
+        """
+        # Вызывается и из потока профиль-бота — обходим копию ключей
+        for key in [key for key in list(self._pages) if key[0] == user_id]:
+            self._pages.pop(key, None)
+
+    def get_stats(self) -> dict:
+        return {"pages": len(self._pages), "in_flight": len(self._tasks), "hits": self.hits, "misses": self.misses}
+
+
+page_prefetcher = PagePrefetcher(settings.PREFETCH_TTL_SECONDS, settings.PREFETCH_MAX_USERS)
+
+
+__all__ = ["PrefetchedPage", "PagePrefetcher", "page_prefetcher"]
@@ -0,0 +1,168 @@
+"""
+quota_service.py
+
+Резервирование показов для страницы ленты.
+
+Порядок списания для каждого поста (как и раньше):
+1. monthly_views_left канала;
+2. если лимит канала исчерпан — premium_views первого администратора канала,
+   у которого они есть, затем его referral_bonus_views.
+
+Вся страница обрабатывается за постоянное число запросов:
+- SELECT ... FOR UPDATE по всем каналам страницы (один запрос);
+- SELECT ... FOR UPDATE по премиум-администраторам (только если нужен фолбэк);
+- по одному UPDATE ... FROM unnest(...) на таблицу.
+Транзакцию фиксирует вызывающий код — сразу после резервирования, до отправки постов
+(release_connection), чтобы блокировки строк не держались во время сетевых вызовов.
+Блокировка строк исключает потерю обновлений при одновременных запросах.
+"""
+
+from collections import Counter
+from typing import Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def _lock_channels(session: AsyncSession, channel_ids: list[int]) -> dict[int, dict]:
+    result = await session.execute(
+        text("""
+            SELECT channel_id, monthly_views_left, admin_user_ids
+            FROM channels
+            WHERE channel_id = ANY(:ids)
+            ORDER BY channel_id
+            FOR UPDATE
+        """),
+        {"ids": channel_ids}
+    )
+    return {
+        row.channel_id: {
+            "left": row.monthly_views_left or 0,
+            "admins": list(row.admin_user_ids or []),
+        }
+        for row in result
+    }
+
+
+async def _lock_premium(session: AsyncSession, admin_ids: list[int]) -> dict[int, dict]:
+    result = await session.execute(
+        text("""
+            SELECT user_id, premium_views, referral_bonus_views
+            FROM premium_users
+            WHERE user_id = ANY(:ids)
+            ORDER BY user_id
+            FOR UPDATE
+        """),
+        {"ids": admin_ids}
+    )
+    return {
+        row.user_id: {
+            "premium": row.premium_views or 0,
+            "referral": row.referral_bonus_views or 0,
+        }
+        for row in result
+    }
+
+
+async def reserve_views(session: AsyncSession, posts: Sequence, limit: int) -> list:
+    """
+    Резервирует показы для постов по порядку, пока не наберётся limit разрешённых.
+
+    Args:
+        session (AsyncSession): сессия БД (транзакцию фиксирует вызывающий код)
+        posts (Sequence): посты-кандидаты (нужны атрибуты id и channel_id)
+        limit (int): максимальное количество постов на странице
+
+    Returns:
+        list: посты, для которых показ зарезервирован, в исходном порядке
+    """
+    if not posts or limit <= 0:
+        return []
+
+    demand = Counter(post.channel_id for post in posts)
+    channels = await _lock_channels(session, list(demand))
+
+    # Премиум-администраторы нужны только каналам, которым не хватит собственного лимита
+    admin_ids = {
+        admin_id
+        for channel_id, channel in channels.items()
+        if channel["left"] < demand[channel_id]
+        for admin_id in channel["admins"]
+    }
+    premium = await _lock_premium(session, sorted(admin_ids)) if admin_ids else {}
+
+    used_channel: Counter = Counter()
+    used_premium: Counter = Counter()
+    used_referral: Counter = Counter()
+    allowed = []
+
+    for post in posts:
+        if len(allowed) >= limit:
+            break
+
+        channel = channels.get(post.channel_id)
+        if channel is None:
+            logger.info(f"🚫 Пост {post.id} не показан — канал {post.channel_id} не найден.")
+            continue
+
+        if channel["left"] > 0:
+            channel["left"] -= 1
+            used_channel[post.channel_id] += 1
+            allowed.append(post)
+            continue
+
+        for admin_id in channel["admins"]:
+            account = premium.get(admin_id)
+            if not account:
+                continue
+            if account["premium"] > 0:
+                account["premium"] -= 1
+                used_premium[admin_id] += 1
+                allowed.append(post)
+                break
+            if account["referral"] > 0:
+                account["referral"] -= 1
+                used_referral[admin_id] += 1
+                allowed.append(post)
+                break
+        else:
+            logger.info(f"🚫 Пост {post.id} не показан — нет лимитов.")
+
+    if used_channel:
+        await session.execute(
+            text("""
+                UPDATE channels AS c
+                SET monthly_views_left = c.monthly_views_left - v.used
+                FROM unnest(CAST(:ids AS BIGINT[]), CAST(:used AS INTEGER[])) AS v(channel_id, used)
+                WHERE c.channel_id = v.channel_id
+            """),
+            {"ids": list(used_channel), "used": list(used_channel.values())}
+        )
+
+    premium_ids = sorted(set(used_premium) | set(used_referral))
+    if premium_ids:
+        await session.execute(
+            text("""
+                UPDATE premium_users AS p
+                SET premium_views = p.premium_views - v.premium,
+                    referral_bonus_views = p.referral_bonus_views - v.referral
+                FROM unnest(
+                    CAST(:ids AS BIGINT[]), CAST(:premium AS INTEGER[]), CAST(:referral AS INTEGER[])
+                ) AS v(user_id, premium, referral)
+                WHERE p.user_id = v.user_id
+            """),
+            {
+                "ids": premium_ids,
+                "premium": [used_premium[i] for i in premium_ids],
+                "referral": [used_referral[i] for i in premium_ids],
+            }
+        )
+
+    return allowed
+
+
+__all__ = ["reserve_views"]
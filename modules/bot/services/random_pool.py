@@ -0,0 +1,125 @@
+"""
+random_pool.py
+
+Общий пул кандидатов для случайных слотов ленты.
+
+Вместо ORDER BY random() по всей таблице posts на каждый запрос ленты
+в памяти держится массив id последних подходящих постов:
+- канал имеет ссылку (channel_link IS NOT NULL);
+- у канала остались показы или есть премиум-администратор с показами;
+- пост входит в RANDOM_POOL_SIZE самых свежих.
+
+Пул перестраивается не чаще раза в RANDOM_POOL_REFRESH_SECONDS (лениво, при обращении).
+Выборка из пула — случайные индексы с исключением просмотренных пользователем постов.
+"""
+
+import asyncio
+import random
+import time
+from array import array
+from typing import Collection
+
+from sqlalchemy import text
+
+from core.config import settings
+from core.database import get_database
+from core.logger import get_logger
+from error_handler import handle_error
+
+logger = get_logger(__name__)
+
+# Во сколько раз больше попыток, чем нужно постов (на случай просмотренных)
+_DRAW_ATTEMPTS_FACTOR = 8
+
+POOL_QUERY = text("""
+    SELECT p.id
+    FROM posts p
+    JOIN channels c ON p.channel_id = c.channel_id
+    WHERE c.channel_link IS NOT NULL
+      AND (
+          c.monthly_views_left > 0
+          OR EXISTS (
+              SELECT 1
+              FROM premium_users pu
+              WHERE pu.user_id = ANY(c.admin_user_ids)
+                AND (pu.premium_views > 0 OR pu.referral_bonus_views > 0)
+          )
+      )
+    ORDER BY p.id DESC
+    LIMIT :size
+""")
+
+
+class RandomPostPool:
+    """
+    Периодически обновляемый пул id постов для случайной выдачи.
+    """
+
+    def __init__(self, size: int, refresh_seconds: int):
+        self.size = size
+        self.refresh_seconds = refresh_seconds
+        self._ids = array("I")
+        self._refreshed_at: float | None = None
+        self._lock: asyncio.Lock | None = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _is_stale(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds
+
+    async def refresh(self) -> None:
+        """
+        Перестраивает пул одним запросом к БД.
+        При ошибке остаётся прежний пул.
+        """
+        try:
+            async for session in get_database():
+                result = await session.execute(POOL_QUERY, {"size": self.size})
+                self._ids = array("I", result.scalars().all())
+                break
+            logger.debug(f"[random_pool] Пул обновлён: {len(self._ids)} постов.")
+        except Exception as e:
+            handle_error(e, "RandomPostPool", "Ошибка при обновлении пула случайных постов")
+            logger.error(f"[random_pool] Ошибка при обновлении пула: {e}")
+        finally:
+            # Следующая попытка — не раньше чем через refresh_seconds, даже после ошибки
+            self._refreshed_at = time.monotonic()
+
+    async def ensure_fresh(self) -> None:
+        if not self._is_stale():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._is_stale():
+                await self.refresh()
+
+    async def draw(self, k: int, exclude: Collection[int] = ()) -> list[int]:
+        """
+        Возвращает до k случайных различных id из пула, исключая exclude.
+        """
+        await self.ensure_fresh()
+        ids = self._ids
+        if k <= 0 or not ids:
+            return []
+
+        picked: list[int] = []
+        chosen = set()
+        for _ in range(k * _DRAW_ATTEMPTS_FACTOR):
+            post_id = ids[random.randrange(len(ids))]
+            if post_id in chosen or post_id in exclude:
+                continue
+            chosen.add(post_id)
+            picked.append(post_id)
+            if len(picked) >= k:
+                break
+        return picked
+
+
+random_pool = RandomPostPool(
+    size=settings.RANDOM_POOL_SIZE,
+    refresh_seconds=settings.RANDOM_POOL_REFRESH_SECONDS,
+)
+
+__all__ = ["RandomPostPool", "random_pool"]
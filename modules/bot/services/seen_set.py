@@ -0,0 +1,90 @@
+"""
+seen_set.py
+
+Компактное множество просмотренных постов одного пользователя.
+
+Идентификаторы хранятся в отсортированном array('I'), время добавления —
+в параллельном array('I') (секунды). Запись занимает 8 байт вместо сотни с лишним
+у словаря строковых ключей с float-значениями.
+
+Массовая фильтрация кандидатов (filter_unseen) выполняется цепочкой
+map/compress над bisect — без Python-байткода на каждый элемент.
+"""
+
+from array import array
+from bisect import bisect_left
+from itertools import compress, repeat
+from operator import getitem, le, ne
+from typing import Iterable
+
+_MAX_ID = 0xFFFFFFFF
+
+
+class SeenSet:
+    """
+    Отсортированное множество id постов с временем добавления.
+    """
+
+    __slots__ = ("_ids", "_ts", "_oldest")
+
+    def __init__(self):
+        self._ids = array("I")
+        self._ts = array("I")
+        self._oldest = _MAX_ID
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, post_id: int) -> bool:
+        i = bisect_left(self._ids, post_id)
+        return i < len(self._ids) and self._ids[i] == post_id
+
+    def ids(self) -> list[int]:
+        return self._ids.tolist()
+
+    def add(self, post_ids: Iterable[int], now: float) -> None:
+        """
+        Добавляет id (или обновляет время уже существующих).
+        """
+        ts = int(now)
+        for post_id in post_ids:
+            i = bisect_left(self._ids, post_id)
+            if i < len(self._ids) and self._ids[i] == post_id:
+                self._ts[i] = ts
+            else:
+                self._ids.insert(i, post_id)
+                self._ts.insert(i, ts)
+        self._oldest = min(self._oldest, ts)
+
+    def expire(self, threshold: float) -> None:
+        """
+        Удаляет записи, добавленные раньше threshold.
+        Массивы перестраиваются только если есть что удалять.
+        """
+        if self._oldest >= threshold:
+            return
+        keep = list(map(le, repeat(int(threshold)), self._ts))
+        self._ids = array("I", compress(self._ids, keep))
+        self._ts = array("I", compress(self._ts, keep))
+        self._oldest = min(self._ts) if self._ts else _MAX_ID
+
+    def unseen_mask(self, candidate_ids: list[int]) -> list[bool]:
+        """
+        Для каждого кандидата возвращает True, если его нет во множестве.
+        """
+        if not self._ids:
+            return [True] * len(candidate_ids)
+        padded = self._ids + array("I", (_MAX_ID,))
+        positions = map(bisect_left, repeat(self._ids), candidate_ids)
+        found = map(getitem, repeat(padded), positions)
+        return list(map(ne, found, candidate_ids))
+
+    def filter_unseen(self, candidate_ids: Iterable[int]) -> list[int]:
+        """
+        Возвращает кандидатов, которых нет во множестве, сохраняя их порядок.
+        """
+        candidates = list(candidate_ids)
+        return list(compress(candidates, self.unseen_mask(candidates)))
+
+
+__all__ = ["SeenSet"]
@@ -0,0 +1,281 @@
+"""
+seen_store.py
+
+Хранилище состояния «что пользователь уже видел»:
+- просмотренные посты (для исключения повторов в ленте)
+- недавние реакции (защита от повторного голосования)
+- служебные отметки пользователя (last_seen, last_refresh и т.п.)
+
+Бэкенды:
+- MemorySeenStore — в памяти процесса, LRU по пользователям + TTL по записям,
+  просмотры и реакции хранятся компактно в SeenSet (seen_set.py)
+- RedisSeenStore — sorted set на пользователя (score = timestamp), истечение через
+  ZREMRANGEBYSCORE и TTL ключа
+
+Выбор бэкенда — настройка SEEN_STORE_BACKEND ("memory" / "redis").
+"""
+
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+from core.config import settings
+from core.logger import get_logger
+from core.redis import get_redis_client
+from modules.bot.services.seen_set import SeenSet
+
+logger = get_logger(__name__)
+
+
+class SeenStore:
+    """
+    Базовый интерфейс хранилища просмотров и реакций.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl = ttl_seconds
+
+    async def get_viewed(self, user_id: int) -> list[int]:
+        raise NotImplementedError
+
+    async def add_viewed(self, user_id: int, post_ids: Iterable[int]) -> None:
+        raise NotImplementedError
+
+    async def filter_unseen(self, user_id: int, candidate_ids: Iterable[int]) -> list[int]:
+        """
+        Возвращает кандидатов, которых пользователь ещё не видел, в исходном порядке.
+        """
+        viewed = set(await self.get_viewed(user_id))
+        return [post_id for post_id in candidate_ids if post_id not in viewed]
+
+    async def has_reaction(self, user_id: int, post_id: int) -> bool:
+        raise NotImplementedError
+
+    async def add_reaction(self, user_id: int, post_id: int) -> None:
+        raise NotImplementedError
+
+    async def get_meta(self, user_id: int, field: str) -> int | None:
+        raise NotImplementedError
+
+    async def set_meta(self, user_id: int, field: str, value: int) -> None:
+        raise NotImplementedError
+
+    async def cleanup(self) -> None:
+        """
+        Периодическая очистка устаревших данных (если бэкенду это нужно).
+        """
+        return None
+
+
+class _UserEntry:
+    """
+    Данные одного пользователя в MemorySeenStore.
+    """
+
+    __slots__ = ("viewed", "reactions", "meta", "touched")
+
+    def __init__(self):
+        self.viewed = SeenSet()
+        self.reactions = SeenSet()
+        self.meta: dict[str, int] = {}
+        self.touched = time.time()
+
+
+class MemorySeenStore(SeenStore):
+    """
+    Хранилище в памяти процесса: LRU по пользователям, TTL по записям.
+    """
+
+    def __init__(self, ttl_seconds: int, max_users: int = 100_000):
+        super().__init__(ttl_seconds)
+        self.max_users = max_users
+        self._users: OrderedDict[int, _UserEntry] = OrderedDict()
+
+    def _entry(self, user_id: int, create: bool = True) -> _UserEntry | None:
+        entry = self._users.get(user_id)
+        if entry is None:
+            if not create:
+                return None
+            entry = _UserEntry()
+            self._users[user_id] = entry
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        entry.touched = time.time()
+        return entry
+
+    async def get_viewed(self, user_id: int) -> list[int]:
+        entry = self._entry(user_id, create=False)
+        if entry is None:
+            return []
+        entry.viewed.expire(time.time() - self.ttl)
+        return entry.viewed.ids()
+
+    async def add_viewed(self, user_id: int, post_ids: Iterable[int]) -> None:
+        entry = self._entry(user_id)
+        now = time.time()
+        entry.viewed.expire(now - self.ttl)
+        entry.viewed.add(post_ids, now)
+
+    async def filter_unseen(self, user_id: int, candidate_ids: Iterable[int]) -> list[int]:
+        entry = self._entry(user_id, create=False)
+        if entry is None:
+            return list(candidate_ids)
+        entry.viewed.expire(time.time() - self.ttl)
+        return entry.viewed.filter_unseen(candidate_ids)
+
+    async def has_reaction(self, user_id: int, post_id: int) -> bool:
+        entry = self._entry(user_id, create=False)
+        if entry is None:
+            return False
+        entry.reactions.expire(time.time() - self.ttl)
+        return post_id in entry.reactions
+
+    async def add_reaction(self, user_id: int, post_id: int) -> None:
+        entry = self._entry(user_id)
+        now = time.time()
+        entry.reactions.expire(now - self.ttl)
+        entry.reactions.add((post_id,), now)
+
+    async def get_meta(self, user_id: int, field: str) -> int | None:
+        entry = self._entry(user_id, create=False)
+        return entry.meta.get(field) if entry else None
+
+    async def set_meta(self, user_id: int, field: str, value: int) -> None:
+        self._entry(user_id).meta[field] = value
+
+    async def cleanup(self) -> None:
+        """
+        Удаляет пользователей, неактивных дольше TTL (с начала LRU-очереди).
+        """
+        threshold = time.time() - self.ttl
+        removed = 0
+        while self._users:
+            user_id, entry = next(iter(self._users.items()))
+            if entry.touched >= threshold:
+                break
+            self._users.popitem(last=False)
+            removed += 1
+        if removed:
+            logger.debug(f"[seen_store] Удалено {removed} неактивных пользователей из памяти.")
+
+
+class RedisSeenStore(SeenStore):
+    """
+    Хранилище в Redis: sorted set на пользователя (score = timestamp).
+    Устаревшие записи удаляются ZREMRANGEBYSCORE при чтении, ключи истекают по TTL.
+    """
+
+    def __init__(self, ttl_seconds: int, prefix: str = "seen"):
+        super().__init__(ttl_seconds)
+        self.prefix = prefix
+
+    def _key(self, user_id: int, kind: str) -> str:
+        return f"{self.prefix}:{user_id}:{kind}"
+
+    async def get_viewed(self, user_id: int) -> list[int]:
+        key = self._key(user_id, "viewed")
+        try:
+            client = await get_redis_client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(key, "-inf", time.time() - self.ttl)
+                pipe.zrange(key, 0, -1)
+                _, members = await pipe.execute()
+            return [int(m) for m in members]
+        except Exception as e:
+            logger.error(f"[seen_store] Ошибка чтения просмотров пользователя {user_id}: {e}")
+            return []
+
+    async def add_viewed(self, user_id: int, post_ids: Iterable[int]) -> None:
+        now = time.time()
+        mapping = {str(post_id): now for post_id in post_ids}
+        if not mapping:
+            return
+        key = self._key(user_id, "viewed")
+        try:
+            client = await get_redis_client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zadd(key, mapping)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"[seen_store] Ошибка сохранения просмотров пользователя {user_id}: {e}")
+
+    async def filter_unseen(self, user_id: int, candidate_ids: Iterable[int]) -> list[int]:
+        candidates = list(candidate_ids)
+        if not candidates:
+            return []
+        threshold = time.time() - self.ttl
+        try:
+            client = await get_redis_client()
+            scores = await client.zmscore(self._key(user_id, "viewed"), [str(c) for c in candidates])
+        except Exception as e:
+            logger.error(f"[seen_store] Ошибка фильтрации просмотров пользователя {user_id}: {e}")
+            return candidates
+        return [c for c, ts in zip(candidates, scores) if ts is None or ts < threshold]
+
+    async def has_reaction(self, user_id: int, post_id: int) -> bool:
+        try:
+            client = await get_redis_client()
+            ts = await client.zscore(self._key(user_id, "reactions"), str(post_id))
+            return ts is not None and time.time() - ts <= self.ttl
+        except Exception as e:
+            logger.error(f"[seen_store] Ошибка чтения реакций пользователя {user_id}: {e}")
+            return False
+
+    async def add_reaction(self, user_id: int, post_id: int) -> None:
+        key = self._key(user_id, "reactions")
+        now = time.time()
+        try:
+            client = await get_redis_client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(key, "-inf", now - self.ttl)
+                pipe.zadd(key, {str(post_id): now})
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"[seen_store] Ошибка сохранения реакции пользователя {user_id}: {e}")
+
+    async def get_meta(self, user_id: int, field: str) -> int | None:
+        try:
+            client = await get_redis_client()
+            value = await client.hget(self._key(user_id, "meta"), field)
+            return int(value) if value is not None else None
+        except Exception as e:
+            logger.error(f"[seen_store] Ошибка чтения '{field}' пользователя {user_id}: {e}")
+            return None
+
+    async def set_meta(self, user_id: int, field: str, value: int) -> None:
+        key = self._key(user_id, "meta")
+        try:
+            client = await get_redis_client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, field, value)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"[seen_store] Ошибка сохранения '{field}' пользователя {user_id}: {e}")
+
+
+_store: SeenStore | None = None
+
+
+def get_seen_store() -> SeenStore:
+    """
+    Возвращает глобальное хранилище согласно настройке SEEN_STORE_BACKEND.
+    """
+    global _store
+    if _store is None:
+        backend = settings.SEEN_STORE_BACKEND.lower()
+        if backend == "redis":
+            _store = RedisSeenStore(settings.SEEN_STORE_TTL_SECONDS)
+        else:
+            if backend != "memory":
+                logger.warning(f"[seen_store] Неизвестный бэкенд '{backend}', используется memory.")
+            _store = MemorySeenStore(settings.SEEN_STORE_TTL_SECONDS, settings.SEEN_STORE_MAX_USERS)
+        logger.info(f"[seen_store] Используется бэкенд: {type(_store).__name__}")
+    return _store
+
+
+__all__ = ["SeenStore", "MemorySeenStore", "RedisSeenStore", "get_seen_store"]
@@ -8,6 +8,7 @@ settings_service.py
 """
 
 from core.logger import get_logger
+from modules.bot.services.prefetch_service import page_prefetcher
 from core.database import get_database
 from core.database.crud import user_crud
 
@@ -46,6 +47,7 @@ async def update_user_interests(user_id: int, tags: str) -> bool:
     async for db in get_database():
         await user_crud.update(db, user_id, {"interest_tags": tags})
         logger.info(f"Интересы пользователя {user_id} обновлены: {tags}")
+        page_prefetcher.invalidate(user_id)
         return True
     return False
 
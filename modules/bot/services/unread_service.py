@@ -0,0 +1,80 @@
+"""
+unread_service.py
+
+Счётчики непрочитанных постов из каналов пользователя (user_state).
+
+- при сохранении постов счётчики всех подписчиков канала увеличиваются одним
+  INSERT ... SELECT по user_channel_subscriptions (индекс channel_id, user_id);
+- при открытии «📡 Каналы Новости» с начала ленты счётчик сбрасывается,
+  а last_read_post_id сдвигается на самый новый показанный пост;
+- главное меню читает одну строку user_state, не просматривая посты.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_database
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+_BUMP_QUERY = text("""
+    INSERT INTO user_state (user_id, last_read_post_id, unread_posts_count)
+    SELECT s.user_id, 0, sum(v.posts)
+    FROM unnest(CAST(:channel_ids AS BIGINT[]), CAST(:counts AS INTEGER[])) AS v(channel_id, posts)
+    JOIN user_channel_subscriptions s ON s.channel_id = v.channel_id
+    GROUP BY s.user_id
+    ON CONFLICT (user_id) DO UPDATE
+    SET unread_posts_count = coalesce(user_state.unread_posts_count, 0) + EXCLUDED.unread_posts_count
+""")
+
+_MARK_READ_QUERY = text("""
+    INSERT INTO user_state (user_id, last_read_post_id, unread_posts_count)
+    SELECT u.user_id, :post_id, 0 FROM users u WHERE u.user_id = :user_id
+    ON CONFLICT (user_id) DO UPDATE
+    SET unread_posts_count = 0,
+        last_read_post_id = greatest(coalesce(user_state.last_read_post_id, 0), EXCLUDED.last_read_post_id)
+""")
+
+
+async def bump_unread_counts(session: AsyncSession, new_posts: dict[int, int]) -> None:
+    """
+    Увеличивает счётчики подписчиков каналов: new_posts — channel_id → число новых постов.
+    Выполняется в транзакции вызывающего (без commit).
+    """
+    new_posts = {channel_id: count for channel_id, count in new_posts.items() if count > 0}
+    if not new_posts:
+        return
+    await session.execute(
+        _BUMP_QUERY,
+        {"channel_ids": list(new_posts), "counts": list(new_posts.values())}
+    )
+
+
+async def mark_channels_read(user_id: int, post_id: int | None = None, session: AsyncSession | None = None) -> None:
+    """
+    Сбрасывает счётчик непрочитанных; post_id — самый новый показанный пост.
+    С переданной сессией транзакцию фиксирует вызывающий код.
+    """
+    async for db in get_database(session):
+        await db.execute(_MARK_READ_QUERY, {"user_id": user_id, "post_id": post_id or 0})
+        if session is None:
+            await db.commit()
+        break
+
+
+async def get_unread_count(user_id: int, session: AsyncSession | None = None) -> int:
+    """
+    Число непрочитанных постов из каналов пользователя.
+    """
+    async for db in get_database(session):
+        result = await db.execute(
+            text("SELECT unread_posts_count FROM user_state WHERE user_id = :user_id"),
+            {"user_id": user_id}
+        )
+        count = result.scalar()
+        break
+    return count or 0
+
+
+__all__ = ["bump_unread_counts", "mark_channels_read", "get_unread_count"]
@@ -14,15 +14,17 @@ import random
 from aiogram import types
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.logger import get_logger
+from modules.bot.services.prefetch_service import page_prefetcher
 from core.database import get_database
 from core.database.crud import user_crud
 from core.database.models import User
 
 logger = get_logger(__name__)
 
-async def register_user_from_message(message: types.Message) -> None:
+async def register_user_from_message(message: types.Message, session: AsyncSession | None = None) -> None:
     """
     Регистрирует пользователя по сообщению. Если уже существует — обновляет данные.
     """
@@ -37,26 +39,30 @@ async def register_user_from_message(message: types.Message) -> None:
         'interests': []  # Массив интересов
     }
 
-    async for db in get_database():
+    # С переданной сессией транзакцией управляет её владелец: здесь только savepoint и flush
+    async for db in get_database(session):
         try:
-            await user_crud.create(db, user_data)
-            logger.debug(f"Пользователь {message.from_user.id} добавлен в БД.")
-        except IntegrityError:
-            await db.rollback()
-            logger.debug(f"Пользователь {message.from_user.id} уже существует, обновляем.")
-            update_data = {
-                'username': user_data["username"],
-                'first_name': user_data["first_name"],
-                'last_name': user_data["last_name"],
-                'language_code': user_data["language_code"]
-            }
-            await user_crud.update(db, message.from_user.id, update_data)
+            try:
+                async with db.begin_nested():
+                    await user_crud.create(db, user_data, commit=False)
+                logger.debug(f"Пользователь {message.from_user.id} добавлен в БД.")
+            except IntegrityError:
+                logger.debug(f"Пользователь {message.from_user.id} уже существует, обновляем.")
+                update_data = {
+                    'username': user_data["username"],
+                    'first_name': user_data["first_name"],
+                    'last_name': user_data["last_name"],
+                    'language_code': user_data["language_code"]
+                }
+                await user_crud.update(db, message.from_user.id, update_data, commit=False)
+            if session is None:
+                await db.commit()
         except Exception as e:
             logger.error(f"Ошибка регистрации пользователя {message.from_user.id}: {e}")
         finally:
             break
 
-async def update_user_activity(message: types.Message) -> None:
+async def update_user_activity(message: types.Message, session: AsyncSession | None = None) -> None:
     """
     Обновляет поле last_active у пользователя в базе.
     """
@@ -65,8 +71,8 @@ async def update_user_activity(message: types.Message) -> None:
         current_time = time.time()
         current_datetime = datetime.datetime.fromtimestamp(current_time)
 
-        async for db in get_database():
-            await user_crud.update(db, user_id, {"last_active": current_datetime})
+        async for db in get_database(session):
+            await user_crud.update(db, user_id, {"last_active": current_datetime}, commit=session is None)
             logger.debug(f"last_active обновлён для {user_id}")
             break
     except Exception as e:
@@ -90,4 +96,5 @@ async def update_user_interests(user_id: int) -> None:
         user.interests = random.sample(new_interests, 10)
         await session.commit()
         logger.debug(f"Интересы пользователя {user_id} обновлены: {user.interests}")
+        page_prefetcher.invalidate(user_id)
         break
@@ -0,0 +1,99 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from typing import Callable, Dict, Any, Awaitable
+import time
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Порог, после которого из истории удаляются устаревшие запросы
+_PRUNE_THRESHOLD = 4096
+
+
+def _is_feed_request(update: Update) -> bool:
+    if update.message is not None:
+        return update.message.text == "📢 Лента"
+    if update.callback_query is not None:
+        return update.callback_query.data == "more_feed_posts"
+    return False
+
+
+def _is_channels_request(update: Update) -> bool:
+    if update.message is not None:
+        return update.message.text == "📡 Каналы Новости"
+    if update.callback_query is not None:
+        return (update.callback_query.data or "").startswith("more_posts")
+    return False
+
+
+# Запросы страниц ленты: имя → условие на апдейт
+FEED_REQUESTS: dict[str, Callable[[Update], bool]] = {
+    "feed": _is_feed_request,
+    "channels": _is_channels_request,
+}
+
+
+class SingleFlightMiddleware(BaseMiddleware):
+    """
+    Один запрос страницы ленты на пользователя.
+
+    Пока для пользователя формируется страница (лента или каналы), повторные такие же
+    запросы отбрасываются: на нажатие inline-кнопки сразу отвечается callback.answer,
+    повторное сообщение игнорируется. Запрос в течение debounce секунд после начала
+    предыдущего тоже отбрасывается — серия нажатий даёт одну страницу.
+    Регистрируется outer-middleware на dp.update раньше UpdateOrderingMiddleware,
+    иначе повторы дожидались бы своей очереди и выполнялись целиком.
+    """
+
+    def __init__(self, requests: dict[str, Callable[[Update], bool]], debounce: float):
+        self.requests = requests
+        self.debounce = debounce
+        self._in_flight: set[tuple[int, str]] = set()
+        self._started: dict[tuple[int, str], float] = {}
+        self.dropped = 0
+
+    def _match(self, update: Update) -> str | None:
+        for name, matches in self.requests.items():
+            if matches(update):
+                return name
+        return None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        name = self._match(event) if user is not None and isinstance(event, Update) else None
+        if name is None:
+            return await handler(event, data)
+
+        key = (user.id, name)
+        now = time.monotonic()
+        if key in self._in_flight or now - self._started.get(key, float("-inf")) < self.debounce:
+            self.dropped += 1
+            logger.debug(f"Повторный запрос '{name}' от пользователя {user.id} отброшен.")
+            if event.callback_query is not None:
+                try:
+                    await event.callback_query.answer("⏳ Уже загружаю...")
+                except Exception as e:
+                    logger.warning(f"Не удалось ответить на повторное нажатие: {e}")
+            return None
+
+        self._in_flight.add(key)
+        self._started[key] = now
+        if len(self._started) > _PRUNE_THRESHOLD:
+            self._prune(now)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
+
+    def _prune(self, now: float) -> None:
+        for key, started in list(self._started.items()):
+            if now - started >= self.debounce and key not in self._in_flight:
+                del self._started[key]
+
+
+__all__ = ["FEED_REQUESTS", "SingleFlightMiddleware"]
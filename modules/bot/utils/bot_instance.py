@@ -1,6 +1,7 @@
 from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from core import get_settings
+from modules.bot.utils.rate_limiter import setup_rate_limiter
 
 _bot_instance: Bot | None = None
 
@@ -12,4 +13,5 @@ def get_bot() -> Bot:
             token=settings.BOT_TOKEN,
             default=DefaultBotProperties(parse_mode="HTML")
         )
+        setup_rate_limiter(_bot_instance)
     return _bot_instance
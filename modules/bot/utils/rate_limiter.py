@@ -1,45 +1,436 @@
-# modules/bot/utils/rate_limiter.py
-
 """
 Модуль ограничения частоты запросов к Telegram API.
 
-Обеспечивает соблюдение лимита в 29 запросов в секунду на одного бота,
-чтобы избежать ошибок 429 (Too Many Requests).
+Один общий ограничитель на процесс (rate_limiter), подключаемый к сессии бота
+как request middleware (setup_rate_limiter) — любой вызов bot.* учитывается
+автоматически, без ручных throttle() в сервисах.
+
+Лимиты (token bucket, настройки TELEGRAM_*):
+- глобальный бюджет на бота (TELEGRAM_GLOBAL_RPS);
+- личный чат — TELEGRAM_CHAT_RPS сообщений в секунду с запасом TELEGRAM_CHAT_BURST;
+- группа / канал — TELEGRAM_GROUP_PER_MINUTE сообщений в минуту.
+Лимиты чата применяются только к отправке (send*/forward*/copy*).
+
+При ответе 429 (TelegramRetryAfter) на retry_after приостанавливается только
+затронутый bucket, после чего запрос повторяется.
+
+Глобальный бюджет бота распределяется по полосам приоритета (Lane):
+- INTERACTIVE — ответы пользователю (по умолчанию);
+- BACKGROUND — фоновые задачи для конкретного пользователя (предвыборка страниц ленты,
+  перепроверка его подписок при /start и открытии профиля);
+- BULK — массовые рассылки и обходы (уведомления админам, синхронизация подписок).
+Полоса задаётся контекстом: with outbound_priority(Lane.BULK): ...
+Ожидающие запросы «стареют» (TELEGRAM_LANE_AGING_SECONDS), поэтому низкие полосы не голодают.
 """
 
 import asyncio
+import threading
 import time
 import logging  # ✅ Добавлен логгер
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Методы, на которые распространяется лимит отдельного чата
+_CHAT_LIMITED_PREFIXES = ("send", "forward", "copy")
+
+# Как часто удалять простаивающие bucket'ы чатов (в резервированиях)
+_CLEANUP_EVERY = 1000
+
+# Период проверки, что таймер выдачи слотов жив (сек.)
+_WATCHDOG_SECONDS = 1.0
+
+
+class TokenBucket:
+    """
+    Token bucket в форме виртуального расписания (GCRA):
+    хранит теоретическое время следующего запроса, без фоновых задач и блокировок.
+    """
+
+    __slots__ = ("interval", "tolerance", "tat")
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (max(burst, 1) - 1)
+        self.tat = 0.0
+
+    def reserve(self, at: float) -> float:
+        """
+        Резервирует слот не раньше момента at и возвращает задержку относительно at.
+        """
+        tat = max(self.tat, at)
+        delay = max(0.0, tat - self.tolerance - at)
+        self.tat = tat + self.interval
+        return delay
+
+    def postpone(self, seconds: float) -> None:
+        """
+        Сдвигает резерв на seconds (запрос ушёл позже, чем позволял этот bucket).
+        """
+        self.tat += seconds
+
+    def pause(self, until: float) -> None:
+        """
+        Запрещает запросы до момента until.
+        """
+        self.tat = max(self.tat, until + self.tolerance)
+
+    def available_in(self, now: float) -> float:
+        """
+        Через сколько секунд можно будет зарезервировать слот (без резервирования).
+        """
+        return max(0.0, max(self.tat, now) - self.tolerance - now)
+
+    def is_idle(self, now: float) -> bool:
+        return self.tat <= now
+
+
+class Lane(IntEnum):
+    """
+    Полосы приоритета исходящих запросов (меньше — важнее).
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    BULK = 2
+
+
+_current_lane: ContextVar[Lane] = ContextVar("outbound_lane", default=Lane.INTERACTIVE)
+
+
+@contextmanager
+def outbound_priority(lane: Lane):
+    """
+    Задаёт полосу приоритета для всех запросов к Telegram внутри блока
+    (и задач, созданных внутри него).
+    """
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "enqueued_at")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, enqueued_at: float):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.enqueued_at = enqueued_at
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class LaneScheduler:
+    """
+    Очередь запросов к глобальному bucket'у бота с полосами приоритета.
+
+    Слот выдаётся ожидающему с наименьшим значением lane - ожидание / aging,
+    т.е. долго ждущий BULK-запрос со временем обгоняет свежие INTERACTIVE.
+    Выдача запускается таймером (call_later) в event loop, который последним
+    поставил запрос в очередь; ожидающих из других потоков будят через call_soon_threadsafe.
+    """
+
+    def __init__(self, bucket: TokenBucket, lock: threading.Lock, aging_seconds: float):
+        self.bucket = bucket
+        self.aging_seconds = aging_seconds
+        self._lock = lock
+        self._queues: dict[Lane, deque[_Waiter]] = {lane: deque() for lane in Lane}
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_loop: asyncio.AbstractEventLoop | None = None
+        self._stats = {lane: {"granted": 0, "wait_total": 0.0, "wait_max": 0.0} for lane in Lane}
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues.values())
+
+    def _record(self, lane: Lane, waited: float) -> None:
+        stats = self._stats[lane]
+        stats["granted"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+
+    def _pop_next(self, now: float) -> tuple[_Waiter | None, Lane | None]:
+        best, best_lane, best_score = None, None, None
+        for lane, queue in self._queues.items():
+            while queue and queue[0].future.done():
+                queue.popleft()  # отменённые ожидания
+            if not queue:
+                continue
+            score = lane - (now - queue[0].enqueued_at) / self.aging_seconds
+            if best_score is None or score < best_score:
+                best, best_lane, best_score = queue[0], lane, score
+        if best is not None:
+            self._queues[best_lane].popleft()
+        return best, best_lane
+
+    def _schedule(self, now: float) -> None:
+        # Вызывается под блокировкой из работающего event loop
+        if self._timer is not None and not self._timer.cancelled() and not self._timer_loop.is_closed():
+            return
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(self.bucket.available_in(now), self._dispatch)
+        self._timer_loop = loop
+
+    def _dispatch(self) -> None:
+        with self._lock:
+            self._timer = None
+            now = time.monotonic()
+            while self.bucket.available_in(now) == 0:
+                waiter, lane = self._pop_next(now)
+                if waiter is None:
+                    break
+                self.bucket.reserve(now)
+                self._record(lane, now - waiter.enqueued_at)
+                if waiter.loop is self._timer_loop or waiter.loop is asyncio.get_running_loop():
+                    _wake(waiter.future)
+                else:
+                    try:
+                        waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                    except RuntimeError:
+                        pass  # event loop ожидающего уже закрыт
+            if self._has_waiters():
+                self._schedule(now)
+
+    async def acquire(self, lane: Lane) -> float:
+        """
+        Ожидает глобальный слот в полосе lane и возвращает время ожидания.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            now = time.monotonic()
+            if not self._has_waiters() and self.bucket.available_in(now) == 0:
+                self.bucket.reserve(now)
+                self._record(lane, 0.0)
+                return 0.0
+            waiter = _Waiter(loop, now)
+            self._queues[lane].append(waiter)
+            self._schedule(now)
+        try:
+            while True:
+                done, _ = await asyncio.wait((waiter.future,), timeout=_WATCHDOG_SECONDS)
+                if done:
+                    break
+                # Таймер выдачи мог остаться в закрытом event loop другого потока — перезапускаем здесь
+                with self._lock:
+                    self._schedule(time.monotonic())
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._queues[lane]:
+                    self._queues[lane].remove(waiter)
+            raise
+        return time.monotonic() - waiter.enqueued_at
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                lane.name.lower(): {
+                    "queued": len(self._queues[lane]),
+                    "granted": stats["granted"],
+                    "wait_avg": round(stats["wait_total"] / stats["granted"], 4) if stats["granted"] else 0.0,
+                    "wait_max": round(stats["wait_max"], 4),
+                }
+                for lane, stats in self._stats.items()
+            }
+
+
 class TelegramRateLimiter:
     """
-    Класс для ограничения количества запросов в секунду.
+    Общий ограничитель запросов: глобальный bucket на бота + bucket на чат.
 
     Использование:
-        rate_limiter = TelegramRateLimiter()
-        await rate_limiter.throttle()
-        await bot.send_message(...)
+        setup_rate_limiter(bot)        # один раз для каждого экземпляра Bot
+        await bot.send_message(...)    # ожидание лимитов — внутри middleware
     """
 
-    def __init__(self, max_rps: int = 29):
+    def __init__(
+        self,
+        global_rps: float = 30,
+        chat_rps: float = 1,
+        chat_burst: int = 20,
+        group_per_minute: int = 20,
+        group_burst: int = 3,
+        lane_aging_seconds: float = 5,
+    ):
+        self.global_rps = global_rps
+        self.chat_rps = chat_rps
+        self.chat_burst = chat_burst
+        self.group_rate = group_per_minute / 60
+        self.group_burst = group_burst
+        self.lane_aging_seconds = lane_aging_seconds
+        self._global: dict[int, LaneScheduler] = {}
+        self._chats: dict[tuple[int, int], TokenBucket] = {}
+        self._reservations = 0
+        # Ограничитель используется ботами из разных потоков (у каждого свой event loop)
+        self._lock = threading.Lock()
+
+    def set_global_rps(self, global_rps: float) -> None:
+        """
+        Меняет глобальный бюджет на бота, в том числе для уже созданных bucket'ов
+        (воркеры делят TELEGRAM_GLOBAL_RPS между процессами).
         """
-        Инициализация ограничителя.
+        with self._lock:
+            self.global_rps = global_rps
+            for scheduler in self._global.values():
+                bucket = TokenBucket(global_rps, burst=int(global_rps))
+                bucket.tat = scheduler.bucket.tat
+                scheduler.bucket = bucket
+
+    def _scheduler(self, bot_id: int) -> LaneScheduler:
+        scheduler = self._global.get(bot_id)
+        if scheduler is None:
+            with self._lock:
+                scheduler = self._global.get(bot_id)
+                if scheduler is None:
+                    bucket = TokenBucket(self.global_rps, burst=int(self.global_rps))
+                    scheduler = self._global[bot_id] = LaneScheduler(bucket, self._lock, self.lane_aging_seconds)
+        return scheduler
 
-        :param max_rps: Максимальное количество запросов в секунду.
+    def _chat_bucket(self, bot_id: int, chat_id: int) -> TokenBucket:
+        key = (bot_id, chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, burst=self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rps, burst=self.chat_burst)
+            self._chats[key] = bucket
+        return bucket
+
+    def _cleanup(self, now: float) -> None:
+        idle = [key for key, bucket in self._chats.items() if bucket.is_idle(now)]
+        for key in idle:
+            del self._chats[key]
+
+    def reserve_chat(self, bot_id: int, chat_id: int) -> float:
+        """
+        Резервирует слот в bucket'е чата и возвращает необходимую задержку.
         """
-        self._interval = 1.0 / max_rps
-        self._last_time = time.monotonic()
+        with self._lock:
+            now = time.monotonic()
+            self._reservations += 1
+            if self._reservations % _CLEANUP_EVERY == 0:
+                self._cleanup(now)
+            return self._chat_bucket(bot_id, chat_id).reserve(now)
 
-    async def throttle(self):
+    async def acquire(self, bot_id: int, chat_id: int | None = None, lane: Lane | None = None) -> None:
         """
-        Пауза между запросами, чтобы не превысить лимит.
+        Ожидает, пока запрос можно будет отправить.
+        Глобальный слот запрашивается только после ожидания лимита чата:
+        запросы, ждущие свой чат, не задерживают остальные чаты.
+        """
+        lane = _current_lane.get() if lane is None else lane
+        delay = 0.0
+        if chat_id is not None:
+            chat_delay = self.reserve_chat(bot_id, chat_id)
+            if chat_delay > 0:
+                await asyncio.sleep(chat_delay)
+            delay += chat_delay
+        global_delay = await self._scheduler(bot_id).acquire(lane)
+        if global_delay and chat_id is not None:
+            # Переносим задержку на bucket чата, чтобы интервал между его сообщениями сохранился
+            with self._lock:
+                self._chat_bucket(bot_id, chat_id).postpone(global_delay)
+        delay += global_delay
+        if delay > 1:
+            logger.warning(f"⚠️ Лимит запросов: ожидание {delay:.2f} сек. (чат {chat_id}, {lane.name})")
+
+    def get_stats(self) -> dict:
         """
-        now = time.monotonic()
-        wait_time = self._interval - (now - self._last_time)
-        if wait_time > 0:
-            if wait_time < self._interval * 0.2:  # менее 20% запаса
-                logger.warning(f"⚠️ Почти превышен лимит запросов! Ждём {wait_time:.4f} сек.")
-            await asyncio.sleep(wait_time)
-        self._last_time = time.monotonic()
+        Метрики полос по каждому боту: глубина очереди, выдано слотов, среднее и максимальное ожидание.
+        """
+        return {bot_id: scheduler.get_stats() for bot_id, scheduler in list(self._global.items())}
+
+    def pause(self, bot_id: int, chat_id: int | None, seconds: float) -> None:
+        """
+        Приостанавливает bucket чата (или глобальный bucket бота) на seconds.
+        """
+        scheduler = self._scheduler(bot_id)
+        with self._lock:
+            until = time.monotonic() + seconds
+            if chat_id is None:
+                scheduler.bucket.pause(until)
+            else:
+                self._chat_bucket(bot_id, chat_id).pause(until)
+
+
+def _limited_chat_id(method: TelegramMethod) -> int | None:
+    """
+    Возвращает числовой chat_id, если метод подпадает под лимит отдельного чата.
+    """
+    if not method.__api_method__.lower().startswith(_CHAT_LIMITED_PREFIXES):
+        return None
+    chat_id = getattr(method, "chat_id", None)
+    if isinstance(chat_id, int):
+        return chat_id
+    if isinstance(chat_id, str) and chat_id.lstrip("-").isdigit():
+        return int(chat_id)
+    # @username канала — отдельный bucket не заводим, действует глобальный
+    return None
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Request middleware сессии бота: ожидание лимитов и повтор после 429.
+    """
+
+    def __init__(self, limiter: TelegramRateLimiter, max_retries: int = 3):
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = _limited_chat_id(method)
+        attempt = 0
+        while True:
+            await self.limiter.acquire(bot.id, chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.limiter.pause(bot.id, chat_id, e.retry_after)
+                logger.warning(
+                    f"⏳ 429 от Telegram ({method.__api_method__}, чат {chat_id}): "
+                    f"пауза {e.retry_after} сек., попытка {attempt}/{self.max_retries}"
+                )
+                if attempt >= self.max_retries:
+                    raise
+
+
+rate_limiter = TelegramRateLimiter(
+    global_rps=settings.TELEGRAM_GLOBAL_RPS,
+    chat_rps=settings.TELEGRAM_CHAT_RPS,
+    chat_burst=settings.TELEGRAM_CHAT_BURST,
+    group_per_minute=settings.TELEGRAM_GROUP_PER_MINUTE,
+    lane_aging_seconds=settings.TELEGRAM_LANE_AGING_SECONDS,
+)
+
+
+def setup_rate_limiter(bot: Bot) -> Bot:
+    """
+    Подключает общий ограничитель к сессии бота (повторный вызов ничего не делает).
+    """
+    if not any(isinstance(m, RateLimitMiddleware) for m in bot.session.middleware):
+        bot.session.middleware(RateLimitMiddleware(rate_limiter, settings.TELEGRAM_MAX_RETRIES))
+    return bot
+
+
+__all__ = ["TokenBucket", "Lane", "outbound_priority", "LaneScheduler", "TelegramRateLimiter", "RateLimitMiddleware", "rate_limiter", "setup_rate_limiter"]
@@ -1,11 +1,17 @@
 import asyncio
 import threading
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from modules.profile import router
 from core.logger import get_logger
 from modules.profile.config import TELEGRAM_PROFILE_TOKEN
+from modules.bot.utils.rate_limiter import setup_rate_limiter
+from modules.bot.db_middleware import DbSessionMiddleware
+from modules.bot.ordering_middleware import UpdateOrderingMiddleware
+from core.config import settings
+from core.database.database import dispose_engine
 
 from aiogram.client.default import DefaultBotProperties  # ✅ добавлено
 
@@ -13,25 +19,46 @@ logger = get_logger(__name__)
 
 
 def register(core_manager):
+    if getattr(core_manager, "headless", False):
+        # В headless-режиме профиль-бот запускается сервером в общем event loop
+        logger.info("✅ Бот 'Профиль' будет запущен в общем event loop (headless).")
+        return
     thread = threading.Thread(target=start_profile_bot, daemon=True)
     thread.start()
     logger.info("✅ Бот 'Профиль' запущен в отдельном потоке.")
 
 
-def start_profile_bot():
-    asyncio.set_event_loop(asyncio.new_event_loop())
-    loop = asyncio.get_event_loop()
+def create_profile_bot(session: BaseSession | None = None) -> tuple[Bot, Dispatcher]:
+    """
+    Создаёт бота и диспетчер 'Профиль'.
 
-    storage = MemoryStorage()
+    Args:
+        session (BaseSession | None): HTTP-сессия, общая с другими ботами (headless-режим)
+    """
     bot = Bot(  # ✅ обновлено
         token=TELEGRAM_PROFILE_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode="HTML")
     )
-    dp = Dispatcher(storage=storage)
+    setup_rate_limiter(bot)
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(UpdateOrderingMiddleware("profile", settings.UPDATE_CONCURRENCY))
+    dp.update.outer_middleware(DbSessionMiddleware())
     dp.include_router(router.router)
+    return bot, dp
+
+
+def start_profile_bot():
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    loop = asyncio.get_event_loop()
+
+    bot, dp = create_profile_bot()
 
     try:
         logger.info("🚀 Профиль-бот: запуск поллинга")
         loop.run_until_complete(dp.start_polling(bot))
     except Exception as e:
         logger.exception(f"❌ Ошибка запуска бота 'Профиль': {e}")
+    finally:
+        loop.run_until_complete(dispose_engine())
+        loop.close()
@@ -16,7 +16,7 @@ async def handle_start(message: types.Message):
     async for session in get_database():
         user = await session.get(User, user_id)
         if not user:
-            user = User(user_id=user_id, username=username, subscribed_channels=[], referrals_count=0)
+            user = User(user_id=user_id, username=username, referrals_count=0)
             session.add(user)
             await session.commit()
 
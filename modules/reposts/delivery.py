@@ -17,6 +17,7 @@ from core.database.crud import get_user, update_user
 from error_handler import handle_error  # Импортируем централизованный обработчик ошибок
 
 from modules.reposts.message_builder import build_post_text, build_post_buttons
+from modules.bot.utils.rate_limiter import outbound_priority, Lane
 
 logger = get_logger()
 
@@ -86,9 +87,10 @@ async def send_reposts(user_id: int, posts: List[dict]) -> List[bool]:
     """
     logger.info(f"Начало отправки {len(posts)} постов пользователю {user_id}")
     results = []
-    for post in posts:
-        result = await send_repost(user_id, post)
-        results.append(result)
+    with outbound_priority(Lane.BULK):
+        for post in posts:
+            result = await send_repost(user_id, post)
+            results.append(result)
     logger.info(f"Завершена отправка постов пользователю {user_id}")
     return results
 
@@ -3,11 +3,17 @@
 Регистрирует модули, запускает бот-поллинг в отдельном потоке и GUI в главном потоке.
 При этом все асинхронные операции с базой данных выполняются в рамках event loop,
 созданного в потоке бот-поллинга.
+
+С флагом --headless GUI не запускается: оба бота, планировщик и мониторинг
+работают в одном event loop (см. central_core/server.py).
+С флагом --workers N апдейты обрабатываются в N процессах-воркерах (см. central_core/workers.py),
+с флагом --webhook — принимаются через webhook (см. central_core/webhook.py).
 """
 
 import sys
 import os
 import importlib
+import argparse
 import threading
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
@@ -15,6 +21,15 @@ from concurrent.futures import ThreadPoolExecutor
 # Добавление корневой директории проекта в sys.path
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
+# Режимы запуска: GUI (по умолчанию), headless-сервер, сервер с процессами-воркерами
+_parser = argparse.ArgumentParser(description="Бот-2")
+_parser.add_argument("--headless", action="store_true", help="запуск без GUI, все боты в одном event loop")
+_parser.add_argument("--webhook", action="store_true", help="приём апдейтов через webhook вместо long polling")
+_parser.add_argument("--workers", type=int, default=0, help="число процессов-воркеров для обработки апдейтов")
+_parser.add_argument("--worker", type=int, default=None, help="номер шарда (процесс-воркер, запускается сервером)")
+ARGS, _ = _parser.parse_known_args()
+HEADLESS = ARGS.headless or ARGS.webhook or ARGS.workers > 0
+
 # Загрузка настроек и логгера с обработкой ошибок
 try:
     from core.config import settings
@@ -30,7 +45,7 @@ except Exception as e:
 # Инициализация центрального ядра
 try:
     from central_core.core_manager import initialize_core
-    core_manager = initialize_core()
+    core_manager = initialize_core(headless=HEADLESS)
     logger.info("Центральное ядро успешно инициализировано.")
 except Exception as e:
     logger.error(f"Ошибка инициализации центрального ядра: {e}")
@@ -67,6 +82,22 @@ def start_bot_polling():
         logger.error(f"Ошибка при запуске бота: {e}")
 
 if __name__ == '__main__':
+    if ARGS.worker is not None:
+        from central_core.workers import run_worker
+        try:
+            run_worker(core_manager, ARGS.worker, ARGS.workers)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if HEADLESS:
+        from central_core.server import run_server
+        try:
+            run_server(core_manager, workers=ARGS.workers, webhook=ARGS.webhook)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
     # Запуск бота в отдельном потоке.
     bot_thread = threading.Thread(target=start_bot_polling, daemon=True)
     bot_thread.start()
@@ -0,0 +1,91 @@
+"""
+Заглушки для локальных тестов режимов воркеров и webhook (без Redis и Telegram).
+"""
+
+import asyncio
+import json
+
+
+class FakePipeline:
+    def __init__(self, client: "FakeRedis"):
+        self.client = client
+        self.commands = []
+
+    def xadd(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+    async def execute(self):
+        return [await self.client.xadd(*args, **kwargs) for args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """
+    Минимальный Redis в памяти: ключи с SET NX, потоки и одна группа потребителей.
+    """
+
+    def __init__(self):
+        self.kv = {}
+        self.streams: dict[str, list[tuple[str, dict]]] = {}
+        self.delivered: set[str] = set()
+        self.acked: list[str] = []
+        self._seq = 0
+
+    async def exists(self, key):
+        return key in self.kv
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.kv:
+            return None
+        self.kv[key] = value
+        return True
+
+    async def delete(self, key):
+        self.kv.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def xadd(self, stream, fields, maxlen=None, approximate=True):
+        self._seq += 1
+        entry_id = f"{self._seq}-0"
+        self.streams.setdefault(stream, []).append((entry_id, {k: str(v) for k, v in fields.items()}))
+        return entry_id
+
+    async def xgroup_create(self, *args, **kwargs):
+        return True
+
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        (stream, last_id), = streams.items()
+        if last_id != ">":
+            # pending этого потребителя: в тестах воркер стартует без истории
+            return []
+        entries = [entry for entry in self.streams.get(stream, []) if entry[0] not in self.delivered][:count]
+        if not entries:
+            await asyncio.sleep(0.01)
+            return []
+        self.delivered.update(entry_id for entry_id, _ in entries)
+        return [[stream, entries]]
+
+    async def xack(self, stream, group, *entry_ids):
+        self.acked.extend(entry_ids)
+        return len(entry_ids)
+
+
+def message_update(update_id: int, user_id: int, text: str = "test") -> dict:
+    """
+    Апдейт с текстовым сообщением пользователя user_id (в формате Bot API).
+    """
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def message_update_json(update_id: int, user_id: int, text: str = "test") -> str:
+    return json.dumps(message_update(update_id, user_id, text))
@@ -0,0 +1,91 @@
+"""
+Локальные тесты webhook-режима (central_core/webhook.py): записанные апдейты отправляются
+POST-запросом прямо в ASGI-приложение, без сети и Telegram.
+"""
+
+import asyncio
+import json
+
+from central_core.webhook import SECRET_HEADER, WebhookServer
+from core.config import settings
+from tests.fakes import message_update
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.updates = []
+
+    async def feed_update(self, bot, update):
+        self.updates.append(update)
+
+
+async def _post(app, path: str, body: dict, headers: dict | None = None) -> int:
+    """
+    Один POST-запрос к ASGI-приложению; возвращает код ответа.
+    """
+    messages = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")]
+                   + [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return next(message["status"] for message in sent if message["type"] == "http.response.start")
+
+
+def _server() -> tuple[WebhookServer, RecordingDispatcher]:
+    dp = RecordingDispatcher()
+    server = WebhookServer({"lenta": (None, dp)})
+    server.secrets["lenta"] = "secret"
+    return server, dp
+
+
+def test_update_with_valid_secret_is_accepted():
+    server, dp = _server()
+
+    async def run():
+        status = await _post(
+            server.app, f"{settings.WEBHOOK_PATH}/lenta", message_update(1, 10), {SECRET_HEADER: "secret"}
+        )
+        # Обработка идёт фоновой задачей после ответа
+        await asyncio.gather(*server._background)
+        return status
+
+    assert asyncio.run(run()) == 200
+    assert [update.update_id for update in dp.updates] == [1]
+
+
+def test_bad_secret_is_rejected():
+    server, dp = _server()
+    status = asyncio.run(_post(
+        server.app, f"{settings.WEBHOOK_PATH}/lenta", message_update(1, 10), {SECRET_HEADER: "wrong"}
+    ))
+    assert status == 403
+    assert asyncio.run(_post(server.app, f"{settings.WEBHOOK_PATH}/lenta", message_update(1, 10))) == 403
+    assert dp.updates == []
+
+
+def test_unknown_path_is_not_found():
+    server, dp = _server()
+    headers = {SECRET_HEADER: "secret"}
+    assert asyncio.run(_post(server.app, f"{settings.WEBHOOK_PATH}/profile", message_update(1, 10), headers)) == 404
+    assert asyncio.run(_post(server.app, "/other/lenta", message_update(1, 10), headers)) == 404
+    assert dp.updates == []
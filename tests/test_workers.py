@@ -0,0 +1,131 @@
+"""
+Локальные тесты режима воркеров (central_core/workers.py) с Redis в памяти.
+"""
+
+import asyncio
+
+import pytest
+from aiogram.types import Update
+
+from central_core import workers
+from core.config import settings
+from tests.fakes import FakeRedis, message_update, message_update_json
+
+
+class RecordingDispatcher:
+    """
+    Диспетчер, который запоминает порядок апдейтов; fail — update_id, на которых обработчик падает.
+    """
+
+    def __init__(self, slow_users=(), fail=None):
+        self.slow_users = set(slow_users)
+        self.fail = dict(fail or {})
+        self.handled: list[tuple[int, int]] = []
+
+    async def feed_update(self, bot, update: Update):
+        user_id = update.message.from_user.id
+        if user_id in self.slow_users:
+            await asyncio.sleep(0.2)
+        if self.fail.get(update.update_id, 0) > 0:
+            self.fail[update.update_id] -= 1
+            raise RuntimeError("handler failed")
+        self.handled.append((user_id, update.update_id))
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = FakeRedis()
+
+    async def get_client():
+        return client
+
+    async def no_pause(stop_event, seconds):
+        await asyncio.sleep(0)
+
+    monkeypatch.setattr(workers, "get_redis_client", get_client)
+    monkeypatch.setattr(workers, "_pause", no_pause)
+    return client
+
+
+async def _consume(dp, until, timeout=5.0):
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(workers.consume_shard(None, dp, "lenta", 0, stop_event))
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not until() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    stop_event.set()
+    await task
+
+
+def test_updates_are_sharded_by_user():
+    async def run():
+        client = FakeRedis()
+        updates = [Update.model_validate(message_update(n, user_id)) for n, user_id in enumerate([10, 11, 12, 13, 10])]
+        await workers.publish_updates(client, "lenta", updates, workers=2)
+        return client
+
+    client = asyncio.run(run())
+    shard0 = [entry[1]["update"] for entry in client.streams[workers.stream_name("lenta", 0)]]
+    shard1 = [entry[1]["update"] for entry in client.streams[workers.stream_name("lenta", 1)]]
+    assert [Update.model_validate_json(raw).message.from_user.id for raw in shard0] == [10, 12, 10]
+    assert [Update.model_validate_json(raw).message.from_user.id for raw in shard1] == [11, 13]
+
+
+def test_duplicate_update_is_processed_once(redis):
+    dp = RecordingDispatcher()
+
+    async def run():
+        stream = workers.stream_name("lenta", 0)
+        for update_id in (1, 2, 1):
+            await redis.xadd(stream, {"update": message_update_json(update_id, 10)})
+        await _consume(dp, lambda: len(redis.acked) == 3)
+
+    asyncio.run(run())
+    assert dp.handled == [(10, 1), (10, 2)]
+    assert redis.acked == ["1-0", "2-0", "3-0"]
+
+
+def test_users_are_processed_concurrently_in_order(redis):
+    dp = RecordingDispatcher(slow_users=[10])
+
+    async def run():
+        stream = workers.stream_name("lenta", 0)
+        for update_id, user_id in enumerate([10, 11, 10, 11]):
+            await redis.xadd(stream, {"update": message_update_json(update_id, user_id)})
+        await _consume(dp, lambda: len(redis.acked) == 4)
+
+    asyncio.run(run())
+    # Медленный пользователь не задерживает другого, его апдейты идут по порядку
+    assert dp.handled[:2] == [(11, 1), (11, 3)]
+    assert [update_id for user_id, update_id in dp.handled if user_id == 10] == [0, 2]
+    assert redis.acked == ["1-0", "2-0", "3-0", "4-0"]
+
+
+def test_failed_update_is_retried_before_next_update_of_user(redis):
+    dp = RecordingDispatcher(fail={1: 1})
+
+    async def run():
+        stream = workers.stream_name("lenta", 0)
+        for update_id in (1, 2):
+            await redis.xadd(stream, {"update": message_update_json(update_id, 10)})
+        await _consume(dp, lambda: len(redis.acked) == 2)
+
+    asyncio.run(run())
+    assert dp.handled == [(10, 1), (10, 2)]
+    assert f"{settings.UPDATE_STREAM_PREFIX}:lenta:dead" not in redis.streams
+
+
+def test_update_goes_to_dead_stream_after_max_attempts(redis):
+    dp = RecordingDispatcher(fail={1: settings.UPDATE_MAX_ATTEMPTS})
+
+    async def run():
+        stream = workers.stream_name("lenta", 0)
+        for update_id in (1, 2):
+            await redis.xadd(stream, {"update": message_update_json(update_id, 10)})
+        await _consume(dp, lambda: len(redis.acked) == 2)
+
+    asyncio.run(run())
+    assert dp.handled == [(10, 2)]
+    dead = redis.streams[f"{settings.UPDATE_STREAM_PREFIX}:lenta:dead"]
+    assert Update.model_validate_json(dead[0][1]["update"]).update_id == 1
+    assert not any(key.startswith(f"{settings.UPDATE_STREAM_PREFIX}:claim:") for key in redis.kv)